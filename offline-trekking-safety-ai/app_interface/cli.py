@@ -3,12 +3,32 @@ Simple CLI to test risk predictions.
 
 Prompts for segment features (or uses defaults) and prints predicted risk level
 plus Explainable AI (XAI) reasoning in human-readable terms.
+With --route, scores a whole GPX / GeoJSON track segment by segment instead.
+With --input, reads feature rows (CSV with a header row, or JSON lines) from a
+file or stdin and streams one JSON prediction per line to stdout.
+--daemon sends the work to a running app_interface/daemon.py (model already
+loaded) and falls back to in-process scoring when none is running.
+NumPy, the model and sklearn are imported only when they are needed, so the
+CLI itself starts in tens of milliseconds.
 Run from project root:
     python app_interface/cli.py
+    python app_interface/cli.py --route maps/my_trek.gpx --weather-severity 4
+    python app_interface/cli.py --input segments.csv --output predictions.jsonl
+    cat segments.jsonl | python app_interface/cli.py --input - --daemon
+    python app_interface/cli.py --input segments.csv --profile cli.pstats
+    python app_interface/cli.py --input segments.csv --validation flag
+Feature values outside config/schema.py FEATURE_RANGES are clipped into range
+by default (--validation clip); reject stops with the offending rows, flag
+scores them as given and lists the problems under "schema_violations".
 """
 
+import argparse
+import csv
+import itertools
+import json
 import sys
 import os
+import operator
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
@@ -16,6 +36,26 @@ sys.path.insert(0, PROJECT_ROOT)
 from config.schema import FEATURE_COLUMNS, FEATURE_RANGES
 
 
+# Explanation rules: (feature, comparison, threshold, default if missing, reason text).
+# Shared by explain_risk (one dict) and explain_risk_batch (whole columns).
+EXPLANATION_RULES = [
+    # Steep terrain: slope > 25 degrees is a common threshold for increased fall risk
+    ("slope_angle", ">", 25, 0, "Steep slope increases fall risk"),
+    # Severe weather: schema is 1-5; 4 or 5 (or invalid >= 6) treated as severe
+    ("weather_severity", ">=", 4, 0, "Severe weather increases danger"),
+    # Low visibility makes it harder to see obstacles and path
+    ("visibility_km", "<", 4, 20, "Low visibility reduces path safety"),
+    # Narrow path leaves less room for error and passing
+    ("path_width_m", "<", 1.5, 5, "Narrow trail increases risk"),
+    # High difficulty rating means the trail demands more experience
+    ("trail_difficulty", ">=", 4, 0, "Difficult trail requires higher skill level"),
+]
+
+_COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt}
+
+SAFE_REASON = "Route conditions are generally safe."
+
+
 def explain_risk(features: dict) -> list:
     """
     Generate rule-based explanations for why a route may be risky.
@@ -23,24 +63,35 @@ def explain_risk(features: dict) -> list:
     Returns a list of explanation strings; empty if no major risk factors.
     """
     reasons = []
-    # Steep terrain: slope > 25 degrees is a common threshold for increased fall risk
-    if features.get("slope_angle", 0) > 25:
-        reasons.append("Steep slope increases fall risk")
-    # Severe weather: schema is 1-5; 4 or 5 (or invalid >= 6) treated as severe
-    if features.get("weather_severity", 0) >= 4:
-        reasons.append("Severe weather increases danger")
-    # Low visibility makes it harder to see obstacles and path
-    if features.get("visibility_km", 20) < 4:
-        reasons.append("Low visibility reduces path safety")
-    # Narrow path leaves less room for error and passing
-    if features.get("path_width_m", 5) < 1.5:
-        reasons.append("Narrow trail increases risk")
-    # High difficulty rating means the trail demands more experience
-    if features.get("trail_difficulty", 0) >= 4:
-        reasons.append("Difficult trail requires higher skill level")
+    for name, op, threshold, default, text in EXPLANATION_RULES:
+        if _COMPARISONS[op](features.get(name, default), threshold):
+            reasons.append(text)
     return reasons
 
 
+def explain_risk_batch(X, feats=FEATURE_COLUMNS) -> list:
+    """
+    Vectorised explain_risk for a (n_rows, n_features) array in `feats` order.
+    Each rule is one NumPy comparison over its column; rows are then grouped
+    by which rules fired, so each distinct reason list is built only once.
+    Returns one list of explanation strings per row (lists may be shared).
+    """
+    import numpy as np
+
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    codes = np.zeros(len(X), dtype=np.int64)
+    for bit, (name, op, threshold, _default, _text) in enumerate(EXPLANATION_RULES):
+        codes |= _COMPARISONS[op](X[:, feats.index(name)], threshold).astype(np.int64) << bit
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    by_code = [
+        [rule[4] for bit, rule in enumerate(EXPLANATION_RULES) if code >> bit & 1]
+        for code in unique_codes.tolist()
+    ]
+    return [by_code[i] for i in inverse.ravel().tolist()]
+
+
 def parse_float(s: str, default: float) -> float:
     try:
         return float(s.strip()) if s.strip() else default
@@ -55,7 +106,203 @@ def parse_int(s: str, default: int) -> int:
         return default
 
 
+def print_model_missing(e: Exception) -> None:
+    print(f"\nError: {e}")
+    print("Run: python scripts/generate_dataset.py")
+    print("Then: python training/train_model.py")
+
+
+def route_main(args) -> None:
+    """Score a track file and print its risk profile."""
+    from config.validation import SchemaValidationError, get_validator
+    from geo.route_ingest import iter_route_risk, iter_track_points, RouteProfile
+
+    conditions = {
+        "weather_severity": args.weather_severity,
+        "trail_difficulty": args.trail_difficulty,
+        "path_width_m": args.path_width,
+        "visibility_km": args.visibility,
+    }
+    # The track gives slope and altitude change (clipped to the schema); check the rest
+    try:
+        checked, report = get_validator(list(conditions)).validate([list(conditions.values())], args.validation)
+    except SchemaValidationError as e:
+        sys.exit(f"Error: route conditions: {e}")
+    if not report.ok:
+        action = "clipped" if args.validation == "clip" else "used as given"
+        print(f"Warning: route conditions {action}: {report.summary()}")
+    conditions = dict(zip(conditions, checked[0].tolist()))
+    profile = RouteProfile()
+    try:
+        for seg in iter_route_risk(iter_track_points(args.route), conditions, args.segment_length):
+            profile.add(seg)
+            if args.segments:
+                print(f"  {seg['start_m']:>9.0f} m  {seg['risk_level']:<14} "
+                      f"slope {seg['slope_angle']:>5.1f}  alt {seg['altitude_change']:>+7.1f}")
+    except FileNotFoundError as e:
+        print_model_missing(e)
+        sys.exit(1)
+    summary = profile.summary()
+    print("\n-----------------------------------")
+    print(f"Route: {args.route}")
+    print(f"Segments: {summary['segments']}  Distance: {summary['distance_m'] / 1000:.2f} km  "
+          f"Ascent: {summary['ascent_m']:.0f} m  Descent: {summary['descent_m']:.0f} m")
+    print(f"Overall Risk Level: {summary['overall_risk_level']}")
+    for level, dist in summary["distance_by_level_m"].items():
+        print(f"  {level}: {summary['count_by_level'][level]} segments, {dist / 1000:.2f} km")
+    riskiest = summary["riskiest_segment"]
+    if riskiest:
+        print(f"Riskiest segment starts at {riskiest['start_m']:.0f} m ({riskiest['risk_level']}):")
+        for r in riskiest["reasons"] or [SAFE_REASON]:
+            print(f"- {r}")
+    print("-----------------------------------")
+
+
+# --- Streaming mode (--input) ---
+
+def score_rows(rows: list, validation: str = None) -> list:
+    """
+    Score feature rows (lists in FEATURE_COLUMNS order) with one batch call.
+    Returns one {"risk_level", "confidence", "reasons"} dict per row.
+    validation: None or a config/validation.py mode; rows the mode rejects
+    raise SchemaValidationError, and in flag mode bad rows get "schema_violations".
+    """
+    import numpy as np
+    from prediction.explain import predict_explain_batch
+
+    X = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    report = None
+    if validation:
+        from config.validation import validate_features
+        X, report = validate_features(X, validation)
+    labels, proba, classes, reasons = predict_explain_batch(X)
+    results = []
+    for i, label in enumerate(labels.tolist()):
+        results.append({
+            "risk_level": str(label),
+            "confidence": dict(zip(classes, proba[i].tolist())) if proba is not None else None,
+            "reasons": reasons[i] or [SAFE_REASON],
+        })
+        if validation == "flag" and report.invalid[i]:
+            results[-1]["schema_violations"] = report.row_problems(i)
+    return results
+
+
+def make_scorer(use_daemon: bool, validation: str = None):
+    """rows -> results callable: the warm daemon if asked for and running, else in-process."""
+    if use_daemon:
+        from app_interface.daemon import DaemonClient, DaemonUnavailable
+        try:
+            client = DaemonClient()
+            return lambda rows: client.score(rows, validation)
+        except DaemonUnavailable as e:
+            print(f"note: {e}; scoring in-process", file=sys.stderr)
+    return lambda rows: score_rows(rows, validation)
+
+
+def iter_input_rows(stream):
+    """
+    Yield feature rows (lists of floats in FEATURE_COLUMNS order) from CSV with
+    a header row or from JSON lines; the format is taken from the first line.
+    Raises ValueError naming the line of a missing or non-numeric value.
+    """
+    lines = enumerate(stream, 1)
+    first = next(((n, line) for n, line in lines if line.strip()), None)
+    if first is None:
+        return
+    if first[1].lstrip().startswith("{"):
+        records = ((n, json.loads(line)) for n, line in itertools.chain([first], lines) if line.strip())
+    else:
+        header = next(csv.reader([first[1]]))
+        records = ((n, dict(zip(header, values))) for n, line in lines for values in csv.reader([line]) if values)
+    for n, record in records:
+        try:
+            yield [float(record[k]) for k in FEATURE_COLUMNS]
+        except KeyError as e:
+            raise ValueError(f"line {n}: missing feature column {e.args[0]}") from None
+        except (TypeError, ValueError):
+            raise ValueError(f"line {n}: feature values must be numbers") from None
+
+
+def stream_main(args) -> None:
+    """Score rows from --input in chunks and write JSON lines to --output."""
+    score = make_scorer(args.daemon, args.validation)
+    src = sys.stdin if args.input == "-" else open(args.input, newline="")
+    dst = sys.stdout if args.output in (None, "-") else open(args.output, "w")
+    chunk = []
+    done = 0
+
+    def flush():
+        nonlocal done
+        try:
+            results = score(chunk)
+        except ValueError as e:
+            raise ValueError(f"input rows {done + 1}-{done + len(chunk)}: {e}") from None
+        for result in results:
+            dst.write(json.dumps(result) + "\n")
+        dst.flush()
+        done += len(chunk)
+        chunk.clear()
+
+    try:
+        for row in iter_input_rows(src):
+            chunk.append(row)
+            if len(chunk) >= args.chunk_size:
+                flush()
+        if chunk:
+            flush()
+    except FileNotFoundError as e:
+        print_model_missing(e)
+        sys.exit(1)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Offline Trekking Safety AI - risk prediction CLI")
+    parser.add_argument("--route", help="GPX or GeoJSON track to score segment by segment")
+    parser.add_argument("--segment-length", type=float, default=200.0, help="segment length in meters")
+    parser.add_argument("--segments", action="store_true", help="print every segment")
+    parser.add_argument("--weather-severity", type=int, default=2)
+    parser.add_argument("--trail-difficulty", type=int, default=2)
+    parser.add_argument("--path-width", type=float, default=2.0)
+    parser.add_argument("--visibility", type=float, default=8.0)
+    parser.add_argument("--input", help="CSV or JSON-lines feature rows to score ('-' for stdin)")
+    parser.add_argument("--output", help="where to write JSON-lines predictions (default stdout)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="rows per model call with --input")
+    parser.add_argument("--daemon", action="store_true",
+                        help="use a running app_interface/daemon.py if there is one")
+    parser.add_argument("--validation", choices=("reject", "clip", "flag"), default="clip",
+                        help="feature values outside the schema: clip into range (default), "
+                             "reject, or flag them in the output")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="profile this run: cProfile dump to PATH, or sampled "
+                             "collapsed stacks if PATH ends in .collapsed / .folded")
+    args = parser.parse_args()
+    if args.profile:
+        # Imported only when asked for (pstats and cProfile cost ~20 ms)
+        from prediction.profiling import profile_to
+        with profile_to(args.profile):
+            run(args)
+    else:
+        run(args)
+
+
+def run(args):
+    if args.route:
+        route_main(args)
+    elif args.input:
+        stream_main(args)
+    else:
+        interactive(args.daemon, args.validation)
+
+
+def interactive(use_daemon: bool = False, validation: str = "clip"):
     print("--- Offline Trekking Safety AI - Risk Prediction ---")
     print("Enter segment features (or press Enter for default).\n")
     # Default: moderate segment
@@ -78,28 +325,27 @@ def main():
         else:
             features[col] = parse_float(raw, d)
     try:
-        from prediction.predictor import predict_risk
-        risk, confidence = predict_risk(features)
-        # --- XAI: explain why this risk level was predicted ---
-        reasons = explain_risk(features)
-        print("\n-----------------------------------")
-        print(f"Predicted Risk Level: {risk}")
-        if confidence:
-            print("Confidence:")
-            for level, prob in confidence.items():
-                print(f"  {level}: {prob:.2f}")
-        print("\nReasoning:")
-        if reasons:
-            for r in reasons:
-                print(f"- {r}")
-        else:
-            print("- Route conditions are generally safe.")
-        print("-----------------------------------")
+        # --- XAI: the result carries the reasons for its risk level ---
+        result = make_scorer(use_daemon, validation)([[features[k] for k in FEATURE_COLUMNS]])[0]
     except FileNotFoundError as e:
-        print(f"\nError: {e}")
-        print("Run: python scripts/generate_dataset.py")
-        print("Then: python training/train_model.py")
+        print_model_missing(e)
         sys.exit(1)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"Error: {e}")
+    print("\n-----------------------------------")
+    print(f"Predicted Risk Level: {result['risk_level']}")
+    if result["confidence"]:
+        print("Confidence:")
+        for level, prob in result["confidence"].items():
+            print(f"  {level}: {prob:.2f}")
+    print("\nReasoning:")
+    for r in result["reasons"]:
+        print(f"- {r}")
+    if result.get("schema_violations"):
+        print("\nOutside the feature schema (scored as given):")
+        for v in result["schema_violations"]:
+            print(f"- {v}")
+    print("-----------------------------------")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+"""
+Warm prediction daemon for the CLI (offline).
+
+Keeps the model resident in one long-lived process and answers CLI
+invocations over a local Unix socket, so `cli.py --daemon` pays neither the
+NumPy import nor the model load. Protocol: one JSON object per line each way,
+several requests per connection:
+    {"op": "score", "rows": [[slope_angle, ..., visibility_km], ...]}
+        -> {"results": [{"risk_level", "confidence", "reasons"}, ...]}
+    {"op": "ping"}      -> {"ok": true, "pid", "model_version"}
+    {"op": "shutdown"}  -> {"ok": true}, then the daemon exits
+Errors come back as {"error": message}. Rows are in FEATURE_COLUMNS order.
+The socket is created with owner-only permissions; the model is still
+reloaded when model/risk_model.pkl changes (prediction.registry).
+
+The client side (DaemonClient) uses only the standard library, so importing
+this module keeps CLI startup fast.
+
+Run from project root:
+    python app_interface/daemon.py            # serve until Ctrl+C
+    python app_interface/daemon.py --ping
+    python app_interface/daemon.py --stop
+Socket path: $TREK_DAEMON_SOCKET, else trek-safety-<uid>.sock in
+$XDG_RUNTIME_DIR (or $TMPDIR, /tmp).
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+class DaemonUnavailable(OSError):
+    """No daemon is listening on the socket (or it went away)."""
+
+
+def default_socket_path() -> str:
+    if os.environ.get("TREK_DAEMON_SOCKET"):
+        return os.environ["TREK_DAEMON_SOCKET"]
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(base, f"trek-safety-{os.getuid()}.sock")
+
+
+# --- Client ---
+
+class DaemonClient:
+    """One connection to the daemon; raises DaemonUnavailable if none is running."""
+
+    def __init__(self, socket_path: str = None, timeout: float = 30.0):
+        self.socket_path = socket_path or default_socket_path()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise DaemonUnavailable(f"no daemon at {self.socket_path} ({e.strerror or e})") from None
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    def request(self, message: dict) -> dict:
+        """Send one request and return its reply; error replies raise RuntimeError."""
+        self._file.write(json.dumps(message).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise DaemonUnavailable(f"daemon at {self.socket_path} closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def score(self, rows: list, validation: str = None) -> list:
+        return self.request({"op": "score", "rows": rows, "validation": validation})["results"]
+
+    def ping(self) -> dict:
+        return self.request({"op": "ping"})
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# --- Server ---
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            reply, stop = self.server.answer(line)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if stop:
+                # shutdown() waits for serve_forever, so it cannot run on this thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class PredictionDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        old_umask = os.umask(0o177)  # socket file readable/writable by the owner only
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def answer(self, line: bytes) -> tuple:
+        """(reply dict, whether to shut down) for one request line."""
+        from app_interface.cli import score_rows
+        from prediction.registry import get_registry
+
+        try:
+            message = json.loads(line)
+            op = message.get("op", "score")
+            if op == "score":
+                return {"results": score_rows(message["rows"], message.get("validation"))}, False
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid(), "model_version": get_registry().get().version}, False
+            if op == "shutdown":
+                return {"ok": True}, True
+            return {"error": f"unknown op {op!r}"}, False
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}, False
+
+
+def serve(socket_path: str = None) -> None:
+    """Load the model, then answer requests until Ctrl+C or a shutdown request."""
+    from prediction.registry import get_registry
+
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path):
+        try:
+            DaemonClient(socket_path, timeout=2.0).close()
+        except DaemonUnavailable:
+            os.unlink(socket_path)  # left behind by a daemon that did not exit cleanly
+        else:
+            sys.exit(f"A daemon is already listening on {socket_path}")
+    loaded = get_registry().get()
+    with PredictionDaemon(socket_path) as server:
+        print(f"Model {loaded.version} loaded; listening on {socket_path} (pid {os.getpid()})", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+    print("Daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm prediction daemon for app_interface/cli.py --daemon")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: $TREK_DAEMON_SOCKET or a per-user path)")
+    parser.add_argument("--ping", action="store_true", help="check whether a daemon is running")
+    parser.add_argument("--stop", action="store_true", help="ask a running daemon to exit")
+    args = parser.parse_args()
+    if args.ping or args.stop:
+        try:
+            with DaemonClient(args.socket) as client:
+                reply = client.request({"op": "shutdown"}) if args.stop else client.ping()
+        except DaemonUnavailable as e:
+            sys.exit(str(e))
+        print(json.dumps(reply))
+        return
+    try:
+        serve(args.socket)
+    except FileNotFoundError as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
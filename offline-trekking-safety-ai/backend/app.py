@@ -1,14 +1,31 @@
 """
 Trek Safety AI - FastAPI backend.
 
-Serves the trained risk model via POST /predict and POST /predict-by-location.
+Serves the trained risk model via POST /predict, POST /predict/batch,
+POST /predict-by-location, POST /predict-by-coordinates (offline segment
+index under maps/) and POST /predict-route (GPX / GeoJSON track); live
+trekker telemetry streams over WebSocket /ws/telemetry/{session_id}.
+Model work runs on a bounded inference executor (backend/executor.py);
+when it is saturated requests get 429, and slow calls time out with 504.
 Run from project root: uvicorn backend.app:app --reload
+Several workers sharing one model copy: python prediction/compiled.py --mapped,
+then uvicorn backend.app:app --workers 4
+Profiling without a redeploy (only when TREK_PROFILE_TOKEN is set): send
+`X-Trek-Profile: <token>` (or arm the next N requests), or start the stack sampler for N seconds, then read the merged
+profile from GET /debug/profile (backend/instrumentation.py, prediction/profiling.py).
+Feature values are checked against config/schema.py FEATURE_RANGES in one
+vectorised pass per batch (config/validation.py); TREK_VALIDATION picks the
+mode: clip (default), reject (422) or flag (schema_violations on the result).
 """
 
-import hashlib
+import asyncio
+import json
 import os
 import sys
-from typing import List
+import tempfile
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
 import numpy as np
 
@@ -16,17 +33,233 @@ import numpy as np
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Import existing prediction and explanation logic (no model retrain)
-from config.schema import FEATURE_RANGES
-from prediction.predictor import predict_risk
+from config.schema import FEATURE_COLUMNS
+from config.validation import VALIDATION_MODES, SchemaValidationError, get_validator
+from prediction.registry import get_registry
+from prediction.cache import LRUCache
+from prediction import metrics, profiling
 from app_interface.cli import explain_risk
+from backend.batching import MicroBatcher
+from backend.executor import ExecutorClosed, InferenceExecutor, QueueFull
+from backend.instrumentation import (
+    PREDICTIONS_TOTAL,
+    ProfilingMiddleware,
+    RequestMetricsMiddleware,
+    RequestProfiler,
+)
+from backend.telemetry import LocationLog, TelemetryHub, default_log_path
+from backend.inference import (
+    SAFE_REASON,
+    normalize_location,
+    score_features,
+    score_location,
+    score_matrix,
+    warm_worker,
+)
+from geo.route_ingest import (
+    DEFAULT_CONDITIONS,
+    DEFAULT_SEGMENT_LENGTH_M,
+    RouteProfile,
+    iter_geojson_points,
+    iter_gpx_points,
+    iter_route_batches,
+    scored_segments,
+)
+from geo.spatial_index import DEFAULT_MAX_DISTANCE_M, MAX_DISTANCE_LIMIT_M, get_segment_index
+
+# Batches at least this large are streamed back as NDJSON (one result per line)
+NDJSON_MIN_ROWS = 1000
+NDJSON_CHUNK_ROWS = 500
+# Uploaded tracks stay in memory up to this size, then spill to a temp file
+ROUTE_SPOOL_BYTES = 4 * 1024 * 1024
+# /predict-by-location cache; entries are keyed on (location, model version)
+LOCATION_CACHE_SIZE = int(os.environ.get("TREK_LOCATION_CACHE_SIZE", "4096"))
+LOCATION_CACHE_TTL = float(os.environ["TREK_LOCATION_CACHE_TTL"]) if os.environ.get("TREK_LOCATION_CACHE_TTL") else None
+# Optional file of known locations (one per line) to pre-compute at startup
+WARMUP_LOCATIONS_FILE = os.environ.get(
+    "TREK_WARMUP_LOCATIONS", os.path.join(PROJECT_ROOT, "maps", "known_locations.txt")
+)
+
+# Inference executor: thread or process pool, workers, wait queue, per-request timeout
+EXECUTOR_KIND = os.environ.get("TREK_EXECUTOR", "thread")
+EXECUTOR_WORKERS = int(os.environ.get("TREK_EXECUTOR_WORKERS", "0")) or None
+EXECUTOR_QUEUE = int(os.environ.get("TREK_EXECUTOR_QUEUE", "64"))
+REQUEST_TIMEOUT_S = float(os.environ.get("TREK_REQUEST_TIMEOUT", "10"))
+DRAIN_TIMEOUT_S = float(os.environ.get("TREK_DRAIN_TIMEOUT", "30"))
+# Micro-batching of single-row /predict calls (TREK_BATCH_MAX_ROWS=1 disables it)
+BATCH_MAX_ROWS = int(os.environ.get("TREK_BATCH_MAX_ROWS", "64"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("TREK_BATCH_MAX_WAIT_MS", "2"))
+# Telemetry: rescoring rate per session, idle expiry, last-known-location log
+TELEMETRY_MIN_INTERVAL_S = float(os.environ.get("TREK_TELEMETRY_MIN_INTERVAL", "1.0"))
+TELEMETRY_IDLE_TIMEOUT_S = float(os.environ.get("TREK_TELEMETRY_IDLE_TIMEOUT", "3600"))
+TELEMETRY_LOG = os.environ.get("TREK_TELEMETRY_LOG") or default_log_path()
+# How often the server re-checks model/risk_model.pkl off the event loop
+MODEL_CHECK_INTERVAL_S = 1.0
+# Profiling endpoints and X-Trek-Profile header: off unless TREK_PROFILE_TOKEN is
+# set, and then both need that token as the X-Trek-Profile value (call stacks are
+# internal, and cProfile / the sampler slow the server). TREK_PROFILING=0 forces off.
+PROFILE_TOKEN = os.environ.get("TREK_PROFILE_TOKEN") or None
+PROFILING_ENABLED = PROFILE_TOKEN is not None and (
+    os.environ.get("TREK_PROFILING", "1").lower() not in ("0", "false", "off", "no")
+)
+# Upper bound for one sampler run
+PROFILE_MAX_SECONDS = 600
+# Upper bound for POST /debug/profile/requests?count
+PROFILE_MAX_REQUESTS = 1000
+# Schema validation of request features: clip / reject / flag (config/validation.py)
+VALIDATION_MODE = os.environ.get("TREK_VALIDATION", "clip")
+if VALIDATION_MODE not in VALIDATION_MODES:
+    raise ValueError(f"TREK_VALIDATION must be one of {', '.join(VALIDATION_MODES)}, got {VALIDATION_MODE!r}")
+
+location_cache = LRUCache(maxsize=LOCATION_CACHE_SIZE, ttl=LOCATION_CACHE_TTL)
+get_registry().add_listener(location_cache.clear)
+metrics.register("location_cache", location_cache.stats)
+metrics.register("model", get_registry().stats)
+validator = get_validator(FEATURE_COLUMNS)
+metrics.register("validation", validator.stats)
+
+executor = InferenceExecutor(
+    kind=EXECUTOR_KIND,
+    workers=EXECUTOR_WORKERS,
+    max_queue=EXECUTOR_QUEUE,
+    timeout=REQUEST_TIMEOUT_S,
+    initializer=warm_worker if EXECUTOR_KIND == "process" else None,
+)
+metrics.register("executor", executor.stats)
+
+request_profiler = RequestProfiler(profiling.store, token=PROFILE_TOKEN)
+if PROFILING_ENABLED:
+    metrics.register("profiling", lambda: {
+        **request_profiler.stats(), **profiling.store.stats(), "sampler": profiling.sampler.stats(),
+    })
+
+
+async def _execute(fn, *args):
+    """executor.run(fn, *args), under cProfile on the worker if this request is profiled."""
+    if not profiling.is_profiled():
+        return await executor.run(fn, *args)
+    result, stats = await executor.run(profiling.profiled_call, fn, *args)
+    profiling.store.add(stats)
+    return result
+
+
+def _flag_results(results: list, report, rows) -> list:
+    """Attach schema_violations to the results of flagged rows (flag mode)."""
+    for result, i in zip(results, rows):
+        if report.invalid[i]:
+            result["schema_violations"] = report.row_problems(i)
+    return results
+
+
+async def _score_rows(X: np.ndarray) -> list:
+    """
+    One validation pass and one executor call for a whole micro-batch; one
+    response dict per row, or a SchemaValidationError for rows the mode rejects.
+    """
+    X, report = validator.validate_rows(X, VALIDATION_MODE, copy=False)
+    if report.ok:
+        labels, proba, classes, reasons = await _execute(score_matrix, X)
+        return list(_batch_results(labels, proba, classes, reasons))
+    keep = np.flatnonzero(~report.rejected)
+    results = [None] * len(X)
+    if len(keep):
+        labels, proba, classes, reasons = await _execute(score_matrix, X[keep])
+        scored = list(_batch_results(labels, proba, classes, reasons))
+        if VALIDATION_MODE == "flag":
+            _flag_results(scored, report, keep)
+        for i, result in zip(keep.tolist(), scored):
+            results[i] = result
+    for i in np.flatnonzero(report.rejected).tolist():
+        results[i] = SchemaValidationError("; ".join(report.row_problems(i)), report)
+    return results
+
+
+async def _score_row(row: list) -> dict:
+    """_score_rows for a single row, without the micro-batcher."""
+    (result,) = await _score_rows(np.array([row], dtype=np.float64))
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+batcher = MicroBatcher(
+    _score_rows,
+    max_rows=BATCH_MAX_ROWS,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_pending=executor.capacity * BATCH_MAX_ROWS,
+    max_concurrent=executor.workers,
+)
+metrics.register("batcher", batcher.stats)
+
+
+async def _score_telemetry_row(row: list) -> dict:
+    return await asyncio.wait_for(batcher.submit(row), executor.timeout)
+
 
-app = FastAPI(title="Trek Safety AI", description="Predict trekking risk from route features or location")
+telemetry = TelemetryHub(
+    _score_telemetry_row,
+    log=LocationLog(TELEMETRY_LOG),
+    min_interval_s=TELEMETRY_MIN_INTERVAL_S,
+    idle_timeout_s=TELEMETRY_IDLE_TIMEOUT_S,
+)
+metrics.register("telemetry", telemetry.stats)
+
+
+async def _watch_model():
+    """Keep the registry current (and caches invalidated) without blocking handlers."""
+    while True:
+        await asyncio.sleep(MODEL_CHECK_INTERVAL_S)
+        try:
+            await run_in_threadpool(get_registry().get)
+        except FileNotFoundError:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model once at startup; requests share it via the registry.
+    # Without a model the server still starts and /predict answers 503.
+    try:
+        get_registry().get()
+        warm_location_cache(WARMUP_LOCATIONS_FILE)
+    except FileNotFoundError:
+        pass
+    # Memory-map the segment index if one has been built (geo/spatial_index.py)
+    try:
+        get_segment_index()
+    except FileNotFoundError:
+        pass
+    executor.start()
+    batcher.start()
+    telemetry.start()
+    watcher = asyncio.create_task(_watch_model())
+    yield
+    # Graceful drain: refuse new work (503), let in-flight requests finish
+    watcher.cancel()
+    await telemetry.stop()
+    await batcher.stop()
+    await executor.drain(DRAIN_TIMEOUT_S)
+    profiling.sampler.stop()
+
+
+app = FastAPI(
+    title="Trek Safety AI",
+    description="Predict trekking risk from route features or location",
+    lifespan=lifespan,
+)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+if metrics.ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
 
 # Allow frontend (e.g. file:// or http://localhost:5500) to call this API
 app.add_middleware(
@@ -57,32 +290,30 @@ class PredictResponse(BaseModel):
     risk_level: str
     confidence: dict
     reasons: List[str]
+    # Only in TREK_VALIDATION=flag mode, for rows outside the feature schema
+    schema_violations: Optional[List[str]] = None
 
 
-def _features_from_location(location: str) -> dict:
-    """
-    Derive route features from a location string (offline, deterministic).
-    Same location always yields the same features so risk is consistent.
-    Uses hash of location to seed RNG and sample within schema ranges.
-    """
-    raw = (location or "").strip() or "Unknown"
-    seed = int(hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12], 16)
-    rng = np.random.default_rng(seed)
+class PredictByCoordinatesRequest(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    max_distance_m: float = Field(DEFAULT_MAX_DISTANCE_M, gt=0, le=MAX_DISTANCE_LIMIT_M)
 
-    def sample(name: str) -> float:
-        lo, hi = FEATURE_RANGES[name]
-        if isinstance(lo, int) and isinstance(hi, int):
-            return float(rng.integers(lo, hi + 1))
-        return float(rng.uniform(lo, hi))
 
-    return {
-        "slope_angle": sample("slope_angle"),
-        "altitude_change": sample("altitude_change"),
-        "weather_severity": int(sample("weather_severity")),
-        "trail_difficulty": int(sample("trail_difficulty")),
-        "path_width_m": sample("path_width_m"),
-        "visibility_km": sample("visibility_km"),
-    }
+class PredictByCoordinatesResponse(PredictResponse):
+    distance_m: float
+    segment: dict
+
+
+class PredictBatchRequest(BaseModel):
+    """Either a list of segments or a dict of equal-length feature columns."""
+    segments: Optional[List[PredictRequest]] = None
+    columns: Optional[Dict[str, List[float]]] = None
+
+
+class PredictBatchResponse(BaseModel):
+    count: int
+    results: List[PredictResponse]
 
 
 # Serve frontend so one server can run both API and website (open http://127.0.0.1:8000/app/)
@@ -94,38 +325,229 @@ if os.path.isdir(FRONTEND_DIR):
 @app.get("/")
 def root():
     """Health check. Web UI: /app/ """
-    return {"service": "Trek Safety AI", "docs": "/docs", "predict": "POST /predict", "predict_by_location": "POST /predict-by-location", "app": "/app/"}
+    return {"service": "Trek Safety AI", "docs": "/docs", "predict": "POST /predict", "predict_batch": "POST /predict/batch", "predict_by_location": "POST /predict-by-location", "predict_by_coordinates": "POST /predict-by-coordinates", "predict_route": "POST /predict-route", "telemetry": "WS /ws/telemetry/{session_id}", "model_info": "GET /model-info", "metrics": "GET /metrics", "profile": "GET /debug/profile", "app": "/app/"}
+
+
+@app.get("/model-info")
+def model_info():
+    """Version (content hash), load time and reload count of the served model."""
+    try:
+        return get_registry().info()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def warm_location_cache(path: str) -> int:
+    """Pre-compute predictions for the locations listed in path (if it exists)."""
+    if not path or not os.path.isfile(path):
+        return 0
+    version = get_registry().get().version
+    count = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            location = line.strip()
+            if location and not location.startswith("#"):
+                key = normalize_location(location)
+                location_cache.put((key, version), score_location(key))
+                count += 1
+    return count
+
+
+async def _model_call(awaitable):
+    """Await model work, mapping overload and failures to HTTP errors."""
+    try:
+        return await awaitable
+    except HTTPException:
+        raise
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except ExecutorClosed as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Prediction timed out after {executor.timeout:g} s")
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _run_model(fn, *args):
+    """Run fn(*args) on the inference executor."""
+    return await _model_call(_execute(fn, *args))
+
+
+async def _score_or_none(features: dict):
+    """score_features on the executor, or None when there is no model to score with."""
+    try:
+        return await _execute(score_features, features)
+    except FileNotFoundError:
+        return None
+
+
+def _respond(model_cls, data: dict, endpoint: str) -> Response:
+    """Validate and serialise a response model (timed as the 'serialize' stage)."""
+    with metrics.stage_timer("serialize"):
+        body = model_cls(**data).model_dump_json(exclude_none=True)
+    if metrics.ENABLED and "risk_level" in data:
+        PREDICTIONS_TOTAL.inc((endpoint, data["risk_level"]))
+    return Response(body, media_type="application/json")
+
+
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """
+    Stage timers, request and prediction counters, model-load, cache, executor
+    and batcher stats in Prometheus text format (?format=json: component stats as JSON).
+    """
+    if format == "json":
+        return metrics.collect()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# --- Profiling (admin) ---
+
+def _profiling_status() -> dict:
+    return {"requests": request_profiler.stats(), "cprofile": profiling.store.stats(),
+            "sampler": profiling.sampler.stats()}
+
+
+def _check_profiling(request: Request) -> None:
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set TREK_PROFILE_TOKEN to enable it)")
+    if not request_profiler.authorized(request.headers.get("x-trek-profile")):
+        raise HTTPException(status_code=403, detail="X-Trek-Profile must carry the profiling token")
+
+
+@app.get("/debug/profile")
+def get_profile(request: Request, format: str = "text", sort: str = "cumulative", limit: int = 40):
+    """
+    Merged profile: format=text (pstats report of the profiled requests,
+    `limit` functions by `sort`), pstats (the same as a .pstats file for
+    python -m pstats / snakeviz) or collapsed (sampler stacks for
+    flamegraph.pl / speedscope).
+    """
+    _check_profiling(request)
+    if format == "collapsed":
+        if not profiling.sampler.samples:
+            raise HTTPException(status_code=404, detail="No samples; start one with POST /debug/profile/sampler")
+        return PlainTextResponse(profiling.sampler.collapsed())
+    if format not in ("text", "pstats"):
+        raise HTTPException(status_code=422, detail="format must be 'text', 'pstats' or 'collapsed'")
+    if profiling.store.empty():
+        raise HTTPException(
+            status_code=404,
+            detail="No profiled requests; send X-Trek-Profile or POST /debug/profile/requests",
+        )
+    if format == "pstats":
+        return Response(profiling.store.dump(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": 'attachment; filename="trek.pstats"'})
+    try:
+        return PlainTextResponse(profiling.store.text(sort, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/debug/profile/requests")
+def profile_requests(request: Request, count: int = 10):
+    """Profile the next `count` requests (0 cancels)."""
+    _check_profiling(request)
+    if not 0 <= count <= PROFILE_MAX_REQUESTS:
+        raise HTTPException(status_code=422, detail=f"count must be in [0, {PROFILE_MAX_REQUESTS}]")
+    request_profiler.arm(count)
+    return _profiling_status()
+
+
+@app.post("/debug/profile/sampler")
+def profile_sampler(request: Request, seconds: float = 30.0, interval_ms: float = 5.0):
+    """Sample all thread stacks every interval_ms for `seconds` (earlier samples are discarded)."""
+    _check_profiling(request)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if interval_ms < 1:
+        raise HTTPException(status_code=422, detail="interval_ms must be >= 1")
+    if not profiling.sampler.start(seconds, interval_ms / 1000.0):
+        raise HTTPException(status_code=409, detail="The sampler is already running")
+    return _profiling_status()
+
+
+@app.delete("/debug/profile")
+def reset_profile(request: Request):
+    """Stop the sampler and discard collected profiles and samples."""
+    _check_profiling(request)
+    profiling.sampler.stop()
+    profiling.sampler.reset()
+    profiling.store.reset()
+    request_profiler.arm(0)
+    return _profiling_status()
 
 
 @app.post("/predict-by-location", response_model=PredictResponse)
-def predict_by_location(payload: PredictByLocationRequest):
+async def predict_by_location(payload: PredictByLocationRequest):
     """
     Predict trekking risk from a location (place name or coordinates).
-    Features are derived offline from the location; same location gives same result.
+    Features are derived offline from the location; same location gives same result,
+    so results are cached per (location, model version).
+    """
+    location = normalize_location(payload.location)
+    loaded = get_registry().current
+    key = (location, loaded.version) if loaded is not None else None
+    result = location_cache.get(key) if key is not None else None
+    if result is None:
+        result = await _run_model(score_location, location)
+        if key is not None:
+            location_cache.put(key, result)
+    return _respond(PredictResponse, result, "/predict-by-location")
+
+
+@app.post("/predict-by-coordinates", response_model=PredictByCoordinatesResponse)
+async def predict_by_coordinates(payload: PredictByCoordinatesRequest):
+    """
+    Predict trekking risk at (lat, lon) from the nearest preloaded route segment.
+    Uses the risk and reasons cached in the index; the model only runs if the
+    served model changed since the index was built (or the index predates
+    cached reasons), re-scoring the segment's stored features.
     """
-    features = _features_from_location(payload.location)
     try:
-        risk_level, confidence = predict_risk(features)
-        reasons = explain_risk(features)
-        if not reasons:
-            reasons = ["Route conditions are generally safe."]
-        confidence_serializable = {k: float(v) for k, v in (confidence or {}).items()}
-        return PredictResponse(
-            risk_level=risk_level,
-            confidence=confidence_serializable,
-            reasons=reasons,
-        )
+        index = get_segment_index()
     except FileNotFoundError as e:
         raise HTTPException(status_code=503, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    hit = index.nearest(payload.lat, payload.lon, payload.max_distance_m)
+    if hit is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No preloaded route segment within {payload.max_distance_m:g} m of ({payload.lat}, {payload.lon})",
+        )
+    i, distance_m = hit
+    entry = index.entry(i)
+    features = entry.pop("features")
+    reasons = entry.pop("reasons", None)
+    loaded = get_registry().current
+    if reasons is None or loaded is None or loaded.version != index.meta["model_version"]:
+        scored = await _model_call(_score_or_none(features))
+        if scored is None:
+            # No model to explain with: keep the cached risk, reasons from the rules
+            reasons = reasons or explain_risk(features)
+        else:
+            entry["risk_level"] = scored["risk_level"]
+            entry["confidence"] = scored["confidence"]
+            reasons = scored["reasons"]
+    return _respond(PredictByCoordinatesResponse, {
+        "risk_level": entry.pop("risk_level"),
+        "confidence": entry.pop("confidence"),
+        "reasons": reasons or [SAFE_REASON],
+        "distance_m": round(distance_m, 1),
+        "segment": {**entry, "features": features},
+    }, "/predict-by-coordinates")
 
 
 @app.post("/predict", response_model=PredictResponse)
-def predict(payload: PredictRequest):
+async def predict(payload: PredictRequest):
     """
     Predict trekking risk from route features.
     Returns risk_level (Safe / Moderate_Risk / High_Risk), confidence scores, and reasons.
+    Concurrent calls are scored together in micro-batches.
     """
     features = {
         "slope_angle": payload.slope_angle,
@@ -135,20 +557,215 @@ def predict(payload: PredictRequest):
         "path_width_m": payload.path_width_m,
         "visibility_km": payload.visibility_km,
     }
+    row = [features[k] for k in FEATURE_COLUMNS]
+    if BATCH_MAX_ROWS <= 1:
+        result = await _model_call(_score_row(row))
+    else:
+        result = await _model_call(asyncio.wait_for(batcher.submit(row), executor.timeout))
+    return _respond(PredictResponse, result, "/predict")
+
+
+def _batch_results(labels, proba, classes, reasons):
+    """Yield one PredictResponse-shaped dict per row."""
+    probs = proba.tolist() if proba is not None else None
+    for i, risk_level in enumerate(labels.tolist()):
+        yield {
+            "risk_level": str(risk_level),
+            "confidence": dict(zip(classes, probs[i])) if probs is not None else {},
+            "reasons": reasons[i] or [SAFE_REASON],
+        }
+
+
+def _ndjson_lines(results):
+    chunk = []
+    for row in results:
+        chunk.append(json.dumps(row))
+        if len(chunk) >= NDJSON_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def _segments_matrix(segments) -> np.ndarray:
+    """(n, n_features) array from a list of feature objects; object dtype if any value is not a number."""
+    if not isinstance(segments, list) or not all(isinstance(seg, dict) for seg in segments):
+        raise ValueError("'segments' must be a list of feature objects")
     try:
-        risk_level, confidence = predict_risk(features)
-        # Explainable AI: rule-based reasons from same features
-        reasons = explain_risk(features)
-        if not reasons:
-            reasons = ["Route conditions are generally safe."]
-        # Convert numpy floats in confidence to Python floats for JSON
-        confidence_serializable = {k: float(v) for k, v in (confidence or {}).items()}
-        return PredictResponse(
-            risk_level=risk_level,
-            confidence=confidence_serializable,
-            reasons=reasons,
-        )
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=503, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        rows = [[seg[k] for k in FEATURE_COLUMNS] for seg in segments]
+    except KeyError as e:
+        raise ValueError(f"Missing feature column: {e.args[0]}") from None
+    try:
+        return np.array(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    except (TypeError, ValueError):
+        # Text values: the validator reports which ones are not numbers
+        return np.array(rows, dtype=object).reshape(-1, len(FEATURE_COLUMNS))
+
+
+# The body is parsed and checked by the vectorised validator rather than per
+# field by pydantic; the OpenAPI docs still show PredictBatchRequest
+_BATCH_REQUEST_SCHEMA = PredictBatchRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+_BATCH_REQUEST_SCHEMA.pop("$defs", None)
+
+
+@app.post(
+    "/predict/batch",
+    response_model=PredictBatchResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": _BATCH_REQUEST_SCHEMA}}}},
+)
+async def predict_batch(request: Request):
+    """
+    Predict trekking risk for many segments with one vectorised model call.
+    Send `segments` (list of feature objects) or `columns` (feature name -> list).
+    All rows are checked against the feature schema in one pass (TREK_VALIDATION).
+    Large batches (or `Accept: application/x-ndjson`) are streamed as NDJSON.
+    """
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Request body must be a JSON object")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail="Request body must be a JSON object")
+    segments, columns = payload.get("segments"), payload.get("columns")
+    if (segments is None) == (columns is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of 'segments' or 'columns'.")
+    try:
+        if segments is not None:
+            data = _segments_matrix(segments)
+        elif isinstance(columns, dict) and all(isinstance(columns.get(k, []), list) for k in FEATURE_COLUMNS):
+            data = columns
+        else:
+            raise ValueError("'columns' must map feature names to lists of values")
+        X, report = validator.validate(data, VALIDATION_MODE, copy=False)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    labels, proba, classes, reasons = await _run_model(score_matrix, X)
+    if metrics.ENABLED and len(labels):
+        for level, n in zip(*np.unique(labels.astype(str), return_counts=True)):
+            PREDICTIONS_TOTAL.inc(("/predict/batch", level), int(n))
+    results = _batch_results(labels, proba, classes, reasons)
+    if VALIDATION_MODE == "flag" and not report.ok:
+        results = _flag_results(list(results), report, range(len(X)))
+    if len(X) >= NDJSON_MIN_ROWS or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson_lines(results), media_type="application/x-ndjson")
+    with metrics.stage_timer("serialize"):
+        body = PredictBatchResponse(count=len(X), results=list(results)).model_dump_json(exclude_none=True)
+    return Response(body, media_type="application/json")
+
+
+def _wants_ndjson(request: Request) -> bool:
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def _read_track(batches):
+    """Track batches, with read / parse errors raised as HTTP 422."""
+    try:
+        yield from batches
+    except (ValueError, UnicodeDecodeError, ET.ParseError) as e:
+        raise HTTPException(status_code=422, detail=f"Could not read track: {e}")
+
+
+async def _route_segments(batches):
+    """
+    Scored segments of a track. Reading and cutting the track run on the
+    threadpool; each batch's model call goes through the inference executor,
+    so route scoring gets the same 429 / 503 / 504 back-pressure as /predict.
+    """
+    async for batch, X in iterate_in_threadpool(_read_track(batches)):
+        for seg in scored_segments(batch, *await _model_call(_execute(score_matrix, X))):
+            yield seg
+
+
+@app.post("/predict-route")
+async def predict_route(
+    request: Request,
+    track_format: Optional[str] = None,
+    segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M,
+    weather_severity: int = DEFAULT_CONDITIONS["weather_severity"],
+    trail_difficulty: int = DEFAULT_CONDITIONS["trail_difficulty"],
+    path_width_m: float = DEFAULT_CONDITIONS["path_width_m"],
+    visibility_km: float = DEFAULT_CONDITIONS["visibility_km"],
+    include_segments: bool = False,
+):
+    """
+    Risk profile for a whole track. Send the GPX or GeoJSON file as the raw
+    request body (track_format: 'gpx' / 'geojson', detected if omitted); route
+    conditions go in query parameters. Returns the summary (plus every segment
+    if include_segments); with `Accept: application/x-ndjson` every segment is
+    streamed as one line, followed by a final {"summary": ...} line.
+    """
+    if segment_length_m <= 0:
+        raise HTTPException(status_code=422, detail="segment_length_m must be positive")
+    conditions = {
+        "weather_severity": weather_severity,
+        "trail_difficulty": trail_difficulty,
+        "path_width_m": path_width_m,
+        "visibility_km": visibility_km,
+    }
+    try:
+        # The track gives slope and altitude change (clipped to the schema); check the rest
+        checked, _ = get_validator(list(conditions)).validate([list(conditions.values())], VALIDATION_MODE)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    conditions = {k: v.item() for k, v in zip(conditions, checked[0])}
+    spool = tempfile.SpooledTemporaryFile(max_size=ROUTE_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    if track_format is None:
+        head = spool.read(512).lstrip()
+        spool.seek(0)
+        track_format = "gpx" if head.startswith(b"<") else "geojson"
+    if track_format not in ("gpx", "geojson"):
+        spool.close()
+        raise HTTPException(status_code=422, detail="track_format must be 'gpx' or 'geojson'")
+    reader = iter_gpx_points if track_format == "gpx" else iter_geojson_points
+    batches = iter_route_batches(reader(spool), conditions, segment_length_m)
+
+    if _wants_ndjson(request):
+        async def lines():
+            profile = RouteProfile()
+            try:
+                async for seg in _route_segments(batches):
+                    profile.add(seg)
+                    yield json.dumps(seg) + "\n"
+                yield json.dumps({"summary": profile.summary()}) + "\n"
+            except HTTPException as e:
+                yield json.dumps({"error": e.detail}) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+            finally:
+                spool.close()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    profile = RouteProfile(keep_segments=include_segments)
+    try:
+        async for seg in _route_segments(batches):
+            profile.add(seg)
+    finally:
+        spool.close()
+    result = {"summary": profile.summary()}
+    if include_segments:
+        result["segments"] = profile.segments
+    return result
+
+
+@app.websocket("/ws/telemetry/{session_id}")
+async def telemetry_stream(websocket: WebSocket, session_id: str):
+    """
+    Live updates from one trekker: JSON messages with any of lat / lon / ele,
+    weather_severity, visibility_km, trail_difficulty, path_width_m and
+    "sos": true. The server answers {"type": "alert", ...} when the risk level
+    or top reason changes, {"type": "sos", ...} once an SOS location is on
+    disk, and {"type": "error", ...} for bad messages.
+    """
+    await telemetry.handle(websocket, session_id)
+
+
+@app.get("/telemetry/{session_id}/last-known")
+async def telemetry_last_known(session_id: str):
+    """Last known location of a trekker session (live state or the location log)."""
+    location = await run_in_threadpool(telemetry.last_known, session_id)
+    if location is None:
+        raise HTTPException(status_code=404, detail=f"No location known for session {session_id!r}")
+    return location
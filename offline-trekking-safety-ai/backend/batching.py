@@ -0,0 +1,169 @@
+"""
+Micro-batching for single-row predictions.
+
+Concurrent /predict requests are queued as feature rows. A collector task
+takes the first waiting row, keeps collecting until it has max_rows rows or
+max_wait_ms has passed since that row arrived, and runs the whole batch in
+one vectorised model call; each request then gets its own row of the result.
+Batches are dispatched while earlier ones are still running (up to
+`max_concurrent` at a time), so under load batches grow instead of queueing.
+
+Batch-size and queue-delay histograms are available from stats().
+A batch holding a row from a profiled request (prediction.profiling) is run
+as a profiled request too.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.executor import ExecutorClosed, QueueFull
+from prediction import profiling
+from prediction.metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+QUEUE_DELAY_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class MicroBatcher:
+    """
+    Coalesce single rows into batches for `run_batch`, an async callable
+    taking an (n_rows, n_features) array and returning n_rows results
+    (an Exception instance fails only its own row's request).
+    """
+
+    def __init__(self, run_batch, max_rows: int = 64, max_wait_ms: float = 2.0,
+                 max_pending: int = 4096, max_concurrent: int = 1):
+        self.run_batch = run_batch
+        self.max_rows = max_rows
+        self.max_wait_ms = max_wait_ms
+        self.max_pending = max_pending
+        self.max_concurrent = max_concurrent
+        self._queue = None
+        self._collector = None
+        self._slots = None
+        self._running = set()
+        self._closed = False
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_delay_ms = Histogram(QUEUE_DELAY_MS_BUCKETS)
+
+    def start(self) -> None:
+        """Start the collector on the running event loop."""
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._collector = asyncio.create_task(self._collect())
+        self._closed = False
+
+    async def stop(self) -> None:
+        """
+        Stop accepting rows, fail the ones not yet collected with
+        ExecutorClosed and wait for dispatched batches to finish.
+        """
+        self._closed = True
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(ExecutorClosed("Server is shutting down"))
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def submit(self, row):
+        """Queue one feature row and wait for its result."""
+        if self._closed:
+            raise ExecutorClosed("Server is shutting down")
+        if self._collector is None or self._collector.done():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(
+                (np.asarray(row, dtype=np.float64), time.perf_counter(), future, profiling.is_profiled())
+            )
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"Batching queue is full ({self.max_pending} rows waiting)") from None
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            deadline = loop.time() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            now = time.perf_counter()
+            # Requests that gave up (timeout / disconnect) are dropped before scoring
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                return
+            for _, queued_at, _, _ in batch:
+                self.queue_delay_ms.observe((now - queued_at) * 1e3)
+            self.batch_sizes.observe(len(batch))
+            self.batches += 1
+            self.rows += len(batch)
+            X = np.stack([row for row, _, _, _ in batch])
+            if any(item[3] for item in batch):
+                profiling.mark_profiled()  # this task's own context
+            try:
+                results = await self.run_batch(X)
+            except asyncio.CancelledError:
+                for _, _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, _, future, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_rows": self.max_rows,
+            "max_wait_ms": self.max_wait_ms,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_delay_ms": self.queue_delay_ms.snapshot(),
+        }
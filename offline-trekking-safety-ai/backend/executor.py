@@ -0,0 +1,138 @@
+"""
+Bounded executor for model work in the async backend.
+
+Request handlers await InferenceExecutor.run(fn, *args) instead of calling
+the model on the event loop or on Starlette's shared threadpool. The pool is
+a thread pool or a process pool (TREK_EXECUTOR=thread|process) with a fixed
+number of workers and a bounded queue behind them:
+
+- when workers + queue are all taken, run() raises QueueFull (HTTP 429);
+- after drain() has started, run() raises ExecutorClosed (HTTP 503);
+- a call that takes longer than `timeout` raises asyncio.TimeoutError (HTTP 504).
+
+A timed-out call that is still queued is cancelled; one already running keeps
+its slot until the worker finishes, so the limit always reflects real load.
+drain() waits for in-flight work on shutdown.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class QueueFull(Exception):
+    """All workers are busy and the wait queue is full."""
+
+
+class ExecutorClosed(Exception):
+    """The executor is draining or stopped and accepts no new work."""
+
+
+class InferenceExecutor:
+    """Fixed-size worker pool with admission control, timeouts and drain."""
+
+    def __init__(self, kind: str = "thread", workers: int = None, max_queue: int = 64,
+                 timeout: float = 10.0, initializer=None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind {kind!r}; expected one of {EXECUTOR_KINDS}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.initializer = initializer
+        self._pool = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    @property
+    def capacity(self) -> int:
+        """Calls that can be admitted at once (running + waiting)."""
+        return self.workers + self.max_queue
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                return
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="inference", initializer=self.initializer
+                )
+            self._closed = False
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._inflight -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def run(self, fn, *args, timeout: float = None):
+        """Run fn(*args) on a worker and return its result."""
+        if self._pool is None and not self._closed:
+            self.start()
+        with self._lock:
+            if self._closed:
+                raise ExecutorClosed("Server is shutting down")
+            if self._inflight >= self.capacity:
+                self.rejected += 1
+                raise QueueFull(f"Inference queue is full ({self.capacity} requests in flight)")
+            self._inflight += 1
+            try:
+                future = self._pool.submit(fn, *args)
+            except BaseException:
+                self._inflight -= 1
+                raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    async def drain(self, timeout: float = 30.0) -> bool:
+        """
+        Stop admitting work, wait up to `timeout` seconds for in-flight calls,
+        then shut the pool down. Returns True if everything finished.
+        """
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        deadline = time.monotonic() + timeout
+        while self._inflight > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        drained = self._inflight == 0
+        if pool is not None:
+            pool.shutdown(wait=drained, cancel_futures=not drained)
+        return drained
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "in_flight": self._inflight,
+            "queued": max(0, self._inflight - self.workers),
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "closed": self._closed,
+        }
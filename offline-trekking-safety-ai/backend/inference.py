@@ -0,0 +1,86 @@
+"""
+Model work run by the backend's inference executor.
+
+Plain module-level functions with picklable arguments and results, so the
+same calls work in a thread pool or in worker processes (see
+backend/executor.py). Each returns the JSON-ready response shape.
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_RANGES
+from prediction.metrics import stage_timer
+from prediction.explain import predict_explain_batch
+from prediction.predictor import features_to_matrix
+from prediction.registry import get_registry
+
+SAFE_REASON = "Route conditions are generally safe."
+
+
+def normalize_location(location: str) -> str:
+    """The form of a location string that features (and cache keys) depend on."""
+    return (location or "").strip() or "Unknown"
+
+
+def features_from_location(location: str) -> dict:
+    """
+    Derive route features from a location string (offline, deterministic).
+    Same location always yields the same features so risk is consistent.
+    Uses hash of location to seed RNG and sample within schema ranges.
+    """
+    raw = normalize_location(location)
+    seed = int(hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12], 16)
+    rng = np.random.default_rng(seed)
+
+    def sample(name: str) -> float:
+        lo, hi = FEATURE_RANGES[name]
+        if isinstance(lo, int) and isinstance(hi, int):
+            return float(rng.integers(lo, hi + 1))
+        return float(rng.uniform(lo, hi))
+
+    return {
+        "slope_angle": sample("slope_angle"),
+        "altitude_change": sample("altitude_change"),
+        "weather_severity": int(sample("weather_severity")),
+        "trail_difficulty": int(sample("trail_difficulty")),
+        "path_width_m": sample("path_width_m"),
+        "visibility_km": sample("visibility_km"),
+    }
+
+
+def score_features(features: dict) -> dict:
+    """risk_level, confidence and reasons for one feature dict."""
+    # Explainable AI: ranked reasons from the model's own splits, same traversal as the prediction
+    labels, proba, classes, reasons = predict_explain_batch(features_to_matrix([features]))
+    return {
+        "risk_level": str(labels[0]),
+        # Convert numpy floats in confidence to Python floats for JSON
+        "confidence": dict(zip(classes, proba[0].tolist())) if proba is not None else {},
+        "reasons": reasons[0] or [SAFE_REASON],
+    }
+
+
+def score_location(location: str) -> dict:
+    with stage_timer("features"):
+        features = features_from_location(location)
+    return score_features(features)
+
+
+def score_matrix(X: np.ndarray) -> tuple:
+    """Batch scoring: (labels, proba or None, classes, reasons per row)."""
+    return predict_explain_batch(X)
+
+
+def warm_worker() -> None:
+    """Process-pool initializer: load the model once per worker process."""
+    try:
+        get_registry().get()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,146 @@
+"""
+Request-level instrumentation for the backend.
+
+RequestMetricsMiddleware is a plain ASGI middleware (no per-request task or
+body buffering) that records, per endpoint (route path template), request
+count by status code and end-to-end latency. Stage timings inside a request
+come from prediction.metrics.stage_timer. Installed only when metrics are on.
+
+ProfilingMiddleware runs chosen requests under cProfile: those sent with an
+`X-Trek-Profile` header whose value equals TREK_PROFILE_TOKEN (no token, no
+profiling) and the next N requests after RequestProfiler.arm(N). The event loop is
+profiled while at least one such request is in flight, which covers request
+parsing, pydantic validation and serialisation (and other requests' loop work
+in that window); model calls are profiled where they run, on the executor,
+through prediction.profiling.profiled_call. Everything is merged into
+prediction.profiling.store.
+"""
+
+import cProfile
+import hmac
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from prediction import metrics, profiling
+
+REQUESTS_TOTAL = metrics.counter(
+    "trek_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status")
+)
+REQUEST_SECONDS = metrics.histogram(
+    "trek_request_seconds", "End-to-end request latency by endpoint", ("endpoint",)
+)
+PREDICTIONS_TOTAL = metrics.counter(
+    "trek_predictions_total", "Predicted segments by endpoint and risk level", ("endpoint", "risk_level")
+)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUESTS_TOTAL.inc((endpoint, str(status)))
+            REQUEST_SECONDS.observe((endpoint,), time.perf_counter() - t0)
+
+
+PROFILE_HEADER = "x-trek-profile"
+
+
+class RequestProfiler:
+    """Which requests to profile, and the shared event-loop profile while they run."""
+
+    def __init__(self, store: profiling.ProfileStore, token: str = None):
+        self.store = store
+        self.token = token or None
+        self.remaining = 0
+        self.profiled = 0
+        self._active = 0
+        self._profile = None
+
+    def authorized(self, value: str) -> bool:
+        """True if `value` matches the token (never, when no token is set)."""
+        if self.token is None:
+            return False
+        return value is not None and hmac.compare_digest(value.encode(), self.token.encode())
+
+    def arm(self, count: int) -> None:
+        """Profile the next `count` requests (0 cancels)."""
+        self.remaining = count
+
+    def wants(self, header_value: str) -> bool:
+        if header_value not in (None, "", "0"):
+            return self.authorized(header_value)
+        if self.remaining > 0:
+            self.remaining -= 1
+            return True
+        return False
+
+    def enter(self) -> None:
+        if self._active == 0:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                self._profile = None  # another profiler is active
+        self._active += 1
+        self.profiled += 1
+
+    def exit(self) -> None:
+        self._active -= 1
+        if self._active == 0 and self._profile is not None:
+            self._profile.disable()
+            self.store.add_profiler(self._profile)
+            self._profile = None
+
+    def stats(self) -> dict:
+        return {"profiled_requests": self.profiled, "armed_requests": self.remaining,
+                "in_flight": self._active, "token_required": self.token is not None}
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: RequestProfiler, exclude_prefix: str = "/debug/profile"):
+        self.app = app
+        self.profiler = profiler
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                header = value.decode("latin-1")
+                break
+        if not self.profiler.wants(header):
+            await self.app(scope, receive, send)
+            return
+        token = profiling.mark_profiled()
+        self.profiler.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.exit()
+            profiling.unmark_profiled(token)
@@ -0,0 +1,428 @@
+"""
+Live trek telemetry over WebSocket.
+
+Each trekker session streams small JSON messages with any of lat / lon / ele
+(a GPS fix), weather_severity, visibility_km, trail_difficulty, path_width_m
+and "sos": true. The server keeps one TrekSession per session (__slots__ only)
+that holds:
+  - the current track segment, cut exactly as geo.route_ingest.iter_segments
+    cuts a track file (length so far, climb, start elevation);
+  - the terrain of the last completed segment;
+  - the latest conditions and the last alert sent.
+A fix only advances the current segment, so slope_angle and altitude_change
+are recomputed for that one segment, never for the whole track.
+
+A session whose features changed is re-scored at most every min_interval_s.
+Fixes that arrive faster are folded into the next score. Scoring goes through
+the server's micro-batcher, so thousands of sessions share a few vectorised
+model calls. An alert is pushed only when the risk level or the top reason
+changes.
+
+Last known locations go to an append-only JSON-lines log (LocationLog), the
+store behind the SOS / emergency mode in ARCHITECTURE.md. Fixes are buffered,
+keeping only the latest per session, and written in one batch every
+flush_interval_s. An SOS message flushes and fsyncs at once. Past max_bytes
+the log is compacted to the latest record per session. The log is read once;
+after that the latest record per session is kept in memory, updated on flush.
+Condition values are checked against config/schema.py FEATURE_RANGES
+(config/validation.py); NaN, inf and out-of-range values are rejected, as are
+fixes with a non-finite or implausible lat / lon / ele. The derived feature
+row is checked again before every score.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config.schema import FEATURE_COLUMNS
+from config.validation import SchemaValidationError, get_validator
+from geo.route_ingest import DEFAULT_CONDITIONS, DEFAULT_SEGMENT_LENGTH_M, haversine_m, segment_terrain
+
+CONDITION_FIELDS = ("weather_severity", "visibility_km", "trail_difficulty", "path_width_m")
+# Plausible GPS elevations (m): below the Dead Sea shore to above Everest
+ELE_RANGE_M = (-500.0, 9000.0)
+# Shorter current segments give unstable slopes; the last completed segment is used until then
+MIN_SEGMENT_M = 50.0
+DEFAULT_MIN_INTERVAL_S = 1.0
+DEFAULT_IDLE_TIMEOUT_S = 3600.0
+DEFAULT_FLUSH_INTERVAL_S = 2.0
+DEFAULT_LOG_MAX_BYTES = 64 * 1024 * 1024
+
+
+def default_log_path() -> str:
+    return os.path.join(PROJECT_ROOT, "data", "telemetry", "last_known.jsonl")
+
+
+class TrekSession:
+    """Rolling state of one trekker: current segment, last fix, conditions and last alert."""
+
+    __slots__ = ("session_id", "segment_length_m", "lat", "lon", "ele", "seg_index", "seg_len", "seg_climb",
+                 "seg_start_ele", "prev_slope", "prev_altitude_change", "weather_severity", "visibility_km",
+                 "trail_difficulty", "path_width_m", "dirty", "scored_at", "risk_level", "top_reason",
+                 "updated_at", "fixes", "connections")
+
+    def __init__(self, session_id: str, segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M, conditions=None):
+        conds = {**DEFAULT_CONDITIONS, **(conditions or {})}
+        self.session_id = session_id
+        self.segment_length_m = segment_length_m
+        self.lat = self.lon = self.ele = None
+        self.seg_index = 0
+        self.seg_len = self.seg_climb = 0.0
+        self.seg_start_ele = None
+        self.prev_slope = self.prev_altitude_change = None
+        for name in CONDITION_FIELDS:
+            setattr(self, name, float(conds[name]))
+        self.dirty = False
+        self.scored_at = 0.0
+        self.risk_level = self.top_reason = None
+        self.updated_at = time.time()
+        self.fixes = 0
+        self.connections = 0
+
+    def add_fix(self, lat: float, lon: float, ele: float = None) -> None:
+        """Advance the current segment to a new fix (missing elevation: unchanged)."""
+        if ele is None:
+            ele = self.ele if self.ele is not None else 0.0
+        self.fixes += 1
+        self.updated_at = time.time()
+        if self.lat is None:
+            self.lat, self.lon, self.ele, self.seg_start_ele = lat, lon, ele, ele
+            return
+        step = haversine_m(self.lat, self.lon, lat, lon)
+        if step == 0 and ele == self.ele:
+            return
+        length = self.segment_length_m
+        while step > 0 and self.seg_len + step >= length:
+            # Close the segment at its exact boundary inside this step
+            t = (length - self.seg_len) / step
+            cut_lat = self.lat + t * (lat - self.lat)
+            cut_lon = self.lon + t * (lon - self.lon)
+            cut_ele = self.ele + t * (ele - self.ele)
+            self.seg_climb += abs(cut_ele - self.ele)
+            self.prev_slope, self.prev_altitude_change = segment_terrain(
+                length, self.seg_climb, cut_ele - self.seg_start_ele
+            )
+            self.seg_index += 1
+            self.lat, self.lon, self.ele, self.seg_start_ele = cut_lat, cut_lon, cut_ele, cut_ele
+            self.seg_len = self.seg_climb = 0.0
+            step -= step * t
+        self.seg_len += step
+        self.seg_climb += abs(ele - self.ele)
+        self.lat, self.lon, self.ele = lat, lon, ele
+        self.dirty = True
+
+    def set_conditions(self, values: dict) -> None:
+        for name, value in values.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                self.dirty = True
+
+    def features(self):
+        """Model features for the current position, or None before the first 50 m of track."""
+        if self.seg_len >= MIN_SEGMENT_M:
+            slope, altitude_change = segment_terrain(self.seg_len, self.seg_climb, self.ele - self.seg_start_ele)
+        elif self.prev_slope is not None:
+            slope, altitude_change = self.prev_slope, self.prev_altitude_change
+        else:
+            return None
+        features = {name: getattr(self, name) for name in CONDITION_FIELDS}
+        features["slope_angle"] = slope
+        features["altitude_change"] = altitude_change
+        return {k: features[k] for k in FEATURE_COLUMNS}
+
+    def location(self, sos: bool = False) -> dict:
+        return {
+            "session": self.session_id,
+            "t": self.updated_at,
+            "lat": self.lat,
+            "lon": self.lon,
+            "ele": self.ele,
+            "segment": self.seg_index,
+            "risk_level": self.risk_level,
+            "sos": sos,
+        }
+
+
+class LocationLog:
+    """Append-only JSON-lines log of last known locations, written in batches."""
+
+    def __init__(self, path: str = None, flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S,
+                 max_bytes: int = DEFAULT_LOG_MAX_BYTES):
+        self.path = path or default_log_path()
+        self.flush_interval_s = flush_interval_s
+        self.max_bytes = max_bytes
+        self._pending = {}
+        self._latest = None  # latest written record per session, read from the log on first use
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.records_written = 0
+        self.compactions = 0
+
+    def record(self, location: dict) -> None:
+        """Buffer a location; only the latest per session is kept until the next flush."""
+        self._pending[location["session"]] = location
+
+    def pending(self, session_id: str):
+        return self._pending.get(session_id)
+
+    async def flush(self, fsync: bool = False) -> int:
+        """
+        Write buffered records (in a thread, off the event loop). Returns how
+        many. On OSError the batch goes back into the buffer (records newer
+        than it are kept) and the error is raised.
+        """
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            await asyncio.to_thread(self._write, list(batch.values()), fsync)
+        except OSError:
+            for session_id, record in batch.items():
+                self._pending.setdefault(session_id, record)
+            raise
+        return len(batch)
+
+    def _write(self, records: list, fsync: bool) -> None:
+        text = "".join(json.dumps(r) + "\n" for r in records)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+                size = f.tell()
+            self.flushes += 1
+            self.records_written += len(records)
+            if self._latest is not None:
+                self._latest.update((r["session"], r) for r in records)
+            if size > self.max_bytes:
+                self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the log with the latest record per session (temp file, then rename)."""
+        if self._latest is None:
+            self._latest = self.load()
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in self._latest.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+        self.compactions += 1
+
+    def load(self) -> dict:
+        """Latest logged record per session (a torn last line is skipped)."""
+        latest = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    latest[record["session"]] = record
+        except FileNotFoundError:
+            pass
+        return latest
+
+    def latest(self, session_id: str):
+        """Latest written record of a session (the log is parsed only on the first call)."""
+        with self._lock:
+            if self._latest is None:
+                self._latest = self.load()
+            return self._latest.get(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "records_written": self.records_written,
+            "compactions": self.compactions,
+        }
+
+
+class TelemetryHub:
+    """
+    Sessions of one server process. `score` is an async callable taking one
+    feature row (FEATURE_COLUMNS order) and returning a PredictResponse-shaped
+    dict; the app passes its micro-batcher.
+    """
+
+    def __init__(self, score, log: LocationLog = None, min_interval_s: float = DEFAULT_MIN_INTERVAL_S,
+                 idle_timeout_s: float = DEFAULT_IDLE_TIMEOUT_S,
+                 segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M):
+        self.score = score
+        self.log = log or LocationLog()
+        self.min_interval_s = min_interval_s
+        self.idle_timeout_s = idle_timeout_s
+        self.segment_length_m = segment_length_m
+        self.sessions = {}
+        self._flusher = None
+        self.connected = 0
+        self.messages = 0
+        self.scores = 0
+        self.alerts = 0
+        self.errors = 0
+        self.expired = 0
+
+    def start(self) -> None:
+        """Start the periodic log flush (and idle-session expiry) on the running loop."""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.log.flush(fsync=True)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.log.flush_interval_s)
+            try:
+                await self.log.flush()
+            except OSError:
+                pass  # keep serving; the next flush retries with newer fixes
+            cutoff = time.time() - self.idle_timeout_s
+            idle = [sid for sid, s in self.sessions.items() if s.connections == 0 and s.updated_at < cutoff]
+            for sid in idle:
+                del self.sessions[sid]
+            self.expired += len(idle)
+
+    def session(self, session_id: str) -> TrekSession:
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = TrekSession(session_id, self.segment_length_m)
+        return state
+
+    def last_known(self, session_id: str):
+        """Latest location of a session: live state, then unflushed buffer, then the log."""
+        state = self.sessions.get(session_id)
+        if state is not None and state.lat is not None:
+            return state.location()
+        return self.log.pending(session_id) or self.log.latest(session_id)
+
+    async def apply(self, state: TrekSession, text: str) -> list:
+        """Apply one message to the session; returns the replies to send right away."""
+        self.messages += 1
+        try:
+            msg = json.loads(text)
+            if not isinstance(msg, dict):
+                raise ValueError("expected a JSON object")
+            conditions = {k: msg[k] for k in CONDITION_FIELDS if k in msg}
+            if conditions:
+                # Checked before anything is applied, so a bad message changes nothing
+                checked, _ = get_validator(list(conditions)).validate([list(conditions.values())], "reject")
+                conditions = dict(zip(conditions, checked[0].tolist()))
+            if "lat" in msg or "lon" in msg:
+                lat, lon = float(msg["lat"]), float(msg["lon"])
+                if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                    raise ValueError("lat / lon out of range")
+                ele = msg.get("ele")
+                if ele is not None:
+                    ele = float(ele)
+                    # NaN fails both comparisons too
+                    if not (ELE_RANGE_M[0] <= ele <= ELE_RANGE_M[1]):
+                        raise ValueError("ele out of range")
+                state.add_fix(lat, lon, ele)
+                self.log.record(state.location())
+            state.set_conditions(conditions)
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            return [{"type": "error", "detail": f"Invalid telemetry message: {e}"}]
+        if msg.get("sos"):
+            if state.lat is None:
+                return [{"type": "error", "detail": "SOS needs a GPS fix (lat, lon)"}]
+            location = state.location(sos=True)
+            self.log.record(location)
+            try:
+                await self.log.flush(fsync=True)
+            except OSError as e:
+                # Still buffered: the periodic flush retries it
+                self.errors += 1
+                return [{"type": "error", "detail": f"SOS not persisted: {e}", "location": location}]
+            return [{"type": "sos", "logged": location}]
+        return []
+
+    async def rescore(self, state: TrekSession):
+        """Score the session's current features; an alert dict if level or top reason changed."""
+        state.dirty = False
+        state.scored_at = time.monotonic()
+        features = state.features()
+        if features is None:
+            return None
+        row = [features[k] for k in FEATURE_COLUMNS]
+        try:
+            # Derived terrain too: a bad fix must never turn into an alert
+            get_validator().validate([row], "reject")
+        except SchemaValidationError as e:
+            self.errors += 1
+            return {"type": "error", "detail": f"Invalid features: {e}"}
+        try:
+            result = await self.score(row)
+        except Exception as e:
+            self.errors += 1
+            return {"type": "error", "detail": f"Scoring failed: {e}"}
+        self.scores += 1
+        top = result["reasons"][0] if result["reasons"] else None
+        if result["risk_level"] == state.risk_level and top == state.top_reason:
+            return None
+        state.risk_level, state.top_reason = result["risk_level"], top
+        self.alerts += 1
+        return {"type": "alert", "segment": state.seg_index, "features": features, **result}
+
+    async def handle(self, websocket: WebSocket, session_id: str) -> None:
+        """Serve one connection until it closes."""
+        await websocket.accept()
+        state = self.session(session_id)
+        state.connections += 1
+        self.connected += 1
+        try:
+            while True:
+                text = None
+                if state.dirty:
+                    # Wait for more fixes only until this session's next score is due
+                    due = max(0.0, state.scored_at + self.min_interval_s - time.monotonic())
+                    try:
+                        text = await asyncio.wait_for(websocket.receive_text(), due)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    text = await websocket.receive_text()
+                if text is not None:
+                    for reply in await self.apply(state, text):
+                        await websocket.send_json(reply)
+                if state.dirty and time.monotonic() - state.scored_at >= self.min_interval_s:
+                    alert = await self.rescore(state)
+                    if alert is not None:
+                        await websocket.send_json(alert)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            state.connections -= 1
+            self.connected -= 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "connected": self.connected,
+            "messages": self.messages,
+            "scores": self.scores,
+            "alerts": self.alerts,
+            "errors": self.errors,
+            "expired": self.expired,
+            "log": self.log.stats(),
+        }
@@ -0,0 +1 @@
+# Benchmarks package: timing scripts for generation, training and inference
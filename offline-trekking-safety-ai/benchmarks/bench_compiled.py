@@ -0,0 +1,69 @@
+"""
+Benchmark: sklearn predict + predict_proba vs the compiled flat-array forest.
+
+Checks that both give identical output on data/raw/trekking_synthetic.csv,
+then times single-row and batch inference.
+Run from project root:
+    python benchmarks/bench_compiled.py
+"""
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import RAW_DATA_DIR
+from prediction.compiled import compile_model, check_matches_model
+from prediction.predictor import load_model
+
+
+def time_call(fn, repeat: int) -> float:
+    """Median seconds per call over `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    payload = load_model()
+    model, feats = payload["model"], payload["features"]
+    compiled = compile_model(model, feats)
+
+    df = pd.read_csv(os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+    X_all = df[feats].to_numpy()
+    check_matches_model(compiled, model, X_all)
+    print(f"Outputs identical on {len(X_all)} rows ({compiled.n_trees} trees, {compiled.n_nodes} nodes)")
+
+    row = [X_all[0].tolist()]
+    rng = np.random.default_rng(0)
+    big = X_all[rng.integers(0, len(X_all), 10_000)]
+
+    def sklearn_predict(X):
+        # What predict_risk did before: two separate walks of the forest
+        model.predict(X)
+        model.predict_proba(X)
+
+    cases = [
+        ("single row", row, 200),
+        ("batch 100", big[:100], 50),
+        ("batch 10k", big, 10),
+    ]
+    print(f"{'case':<12} {'sklearn':>12} {'compiled':>12} {'speedup':>8}")
+    for name, X, repeat in cases:
+        t_sk = time_call(lambda: sklearn_predict(X), repeat)
+        t_c = time_call(lambda: compiled.predict(X), repeat)
+        print(f"{name:<12} {t_sk * 1e3:>10.3f}ms {t_c * 1e3:>10.3f}ms {t_sk / t_c:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
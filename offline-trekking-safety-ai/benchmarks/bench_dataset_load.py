@@ -0,0 +1,94 @@
+"""
+Benchmark: dataset load time and memory for CSV vs columnar npy / parquet.
+
+Generates one dataset (columns engine) in every available format in a temp
+directory, then loads each in a fresh subprocess and reports load time and
+resident memory right after loading and after reading every column once.
+Run from project root:
+    python benchmarks/bench_dataset_load.py --n-per-class 500000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS
+from scripts.generate_dataset import write_synthetic_dataset
+from training.dataset_io import FORMAT_SUFFIX
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc; 0 elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def child(path: str) -> None:
+    """Run in a fresh interpreter: load the dataset and print JSON stats."""
+    import pandas  # noqa: F401  (import cost excluded from the load time)
+    from training.dataset_io import read_dataset
+
+    base = rss_mb()
+    t0 = time.perf_counter()
+    df = read_dataset(path)
+    load_s = time.perf_counter() - t0
+    loaded = rss_mb()
+    total = sum(float(df[col].sum()) for col in FEATURE_COLUMNS)
+    print(json.dumps({
+        "rows": len(df),
+        "load_s": load_s,
+        "rss_after_load_mb": loaded - base,
+        "rss_after_scan_mb": rss_mb() - base,
+        "checksum": total,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n-per-class", type=int, default=500_000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    formats = ["csv", "npy"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        print("pyarrow not installed: skipping parquet")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'format':<8} {'rows':>10} {'size MB':>9} {'load s':>8} {'RSS load MB':>12} {'RSS scan MB':>12}")
+        for fmt in formats:
+            path = os.path.join(tmp, "bench" + FORMAT_SUFFIX[fmt])
+            write_synthetic_dataset(path, args.n_per_class, seed=0, fmt=fmt)
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            else:
+                size = os.path.getsize(path)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", path],
+                check=True, capture_output=True, text=True, cwd=PROJECT_ROOT,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{fmt:<8} {r['rows']:>10} {size / 1e6:>9.1f} {r['load_s']:>8.3f} "
+                  f"{r['rss_after_load_mb']:>12.1f} {r['rss_after_scan_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: incremental forest updates vs full retraining as the dataset grows.
+
+For each stored-dataset size, a batch of new labelled rows arrives. Full
+retraining fits the standard forest (build_classifier) on stored + new rows;
+the incremental update adds trees fitted on the new rows plus an equal replay
+sample (training/incremental.py). Both are scored on the same held-out rows.
+Nothing is saved.
+Run from project root:
+    python benchmarks/bench_incremental.py
+    python benchmarks/bench_incremental.py --sizes 3000,30000,300000 --new-rows 3000
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, TARGET_COLUMN
+from scripts.generate_dataset import generate_synthetic_chunk
+from training.incremental import DEFAULT_NEW_TREES, grow_forest
+from training.train_model import build_classifier
+
+
+def rows(seed: int, n: int) -> pd.DataFrame:
+    """n balanced synthetic rows (n is rounded down to a multiple of 3)."""
+    return generate_synthetic_chunk(np.random.SeedSequence(seed), n // 3)
+
+
+def accuracy(clf, df: pd.DataFrame) -> float:
+    return float(np.mean(clf.predict(df[FEATURE_COLUMNS]) == df[TARGET_COLUMN].astype(str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental updates with full retraining.")
+    parser.add_argument("--sizes", default="3000,30000,150000", help="comma-separated stored-dataset sizes")
+    parser.add_argument("--new-rows", type=int, default=1500)
+    parser.add_argument("--trees", type=int, default=DEFAULT_NEW_TREES)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    new = rows(1, args.new_rows)
+    holdout = rows(2, 30_000)
+    print(f"{'stored rows':>12} {'full fit s':>11} {'incr fit s':>11} {'speedup':>8} "
+          f"{'full acc':>9} {'incr acc':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        stored = rows(0, size)
+        base = build_classifier("random_forest").fit(stored[FEATURE_COLUMNS], stored[TARGET_COLUMN])
+
+        combined = pd.concat([stored, new], ignore_index=True)
+        t0 = time.perf_counter()
+        full = build_classifier("random_forest").fit(combined[FEATURE_COLUMNS], combined[TARGET_COLUMN])
+        full_seconds = time.perf_counter() - t0
+
+        replay = stored.sample(n=min(len(stored), len(new)), random_state=0)
+        train = pd.concat([new, replay], ignore_index=True)
+        t0 = time.perf_counter()
+        grow_forest(base, train[FEATURE_COLUMNS], train[TARGET_COLUMN].astype(str), args.trees, random_state=1)
+        incr_seconds = time.perf_counter() - t0
+
+        print(f"{len(stored):>12d} {full_seconds:>11.3f} {incr_seconds:>11.3f} "
+              f"{full_seconds / incr_seconds:>7.1f}x {accuracy(full, holdout):>9.4f} {accuracy(base, holdout):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: per-worker memory and startup of the model loading paths.
+
+Starts N fresh worker processes per mode (spawned, like `uvicorn --workers N`);
+each loads the model through prediction.registry and scores a batch:
+
+  pickle   - unpickle risk_model.pkl (imports sklearn) and compile it in the worker
+  compiled - risk_model_compiled.npz, a private copy of the arrays per worker
+  mapped   - risk_model_mapped/, read-only memory maps shared by all workers
+
+Once all workers of a mode have loaded, each reports its RSS, PSS (shared
+pages divided between the processes mapping them) and USS (private pages).
+The sum of PSS is what the N workers really cost. The model files are
+written to a temporary directory; model/ is never touched. With --trees the
+forest is refitted at that size on synthetic rows, to see how the paths
+scale with model size.
+Run from project root (Linux: reads /proc/self/smaps_rollup):
+    python benchmarks/bench_shared_model.py
+    python benchmarks/bench_shared_model.py --workers 8 --trees 500 --max-depth 20
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+MODES = ("pickle", "compiled", "mapped")
+
+
+def memory_kb() -> dict:
+    """RSS, PSS and USS of this process in kB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def _worker(mode: str, model_dir: str, barrier, results) -> None:
+    t0 = time.perf_counter()
+    import numpy as np
+    from config.schema import DEFAULT_MODEL_FILENAME, FEATURE_COLUMNS
+    from prediction.registry import ModelRegistry
+
+    registry = ModelRegistry(os.path.join(model_dir, DEFAULT_MODEL_FILENAME))
+    if mode != "mapped":
+        registry.mapped_path = os.path.join(model_dir, "missing")
+    if mode == "pickle":
+        registry.compiled_path = os.path.join(model_dir, "missing.npz")
+    loaded = registry.get()
+    X = np.random.default_rng(0).uniform(0, 20, size=(10_000, len(FEATURE_COLUMNS)))
+    loaded.compiled.predict_with_contributions(X, class_index=0)
+    startup = time.perf_counter() - t0
+    assert loaded.source == mode, (loaded.source, mode)
+    barrier.wait()  # every worker holds its model before anyone measures
+    results.put({"startup_s": startup, **memory_kb()})
+    barrier.wait()
+
+
+def run_mode(mode: str, model_dir: str, n_workers: int) -> list:
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, model_dir, barrier, results)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get(timeout=300) for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def prepare_models(model_dir: str, trees: int = None, max_depth: int = None) -> str:
+    """Write pickle, compiled .npz and mapped copy into model_dir; returns a model summary."""
+    import hashlib
+    import pickle
+    import numpy as np
+    from config.schema import DEFAULT_MODEL_FILENAME, FEATURE_COLUMNS, MODEL_DIR, TARGET_COLUMN
+    from prediction.compiled import compile_model, save_compiled, save_mapped
+
+    if trees:
+        from scripts.generate_dataset import generate_synthetic_chunk
+        from training.train_model import build_classifier
+
+        df = generate_synthetic_chunk(np.random.SeedSequence(0), 100_000)
+        clf = build_classifier("random_forest").set_params(n_estimators=trees, max_depth=max_depth)
+        clf.fit(df[FEATURE_COLUMNS], df[TARGET_COLUMN])
+        blob = pickle.dumps({"model": clf, "features": FEATURE_COLUMNS, "target": TARGET_COLUMN})
+    else:
+        with open(os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME), "rb") as f:
+            blob = f.read()
+    with open(os.path.join(model_dir, DEFAULT_MODEL_FILENAME), "wb") as f:
+        f.write(blob)
+    sha256 = hashlib.sha256(blob).hexdigest()
+    payload = pickle.loads(blob)
+    compiled = compile_model(payload["model"], payload["features"])
+    save_compiled(compiled, os.path.join(model_dir, "risk_model_compiled.npz"), sha256)
+    save_mapped(compiled, os.path.join(model_dir, "risk_model_mapped"), sha256)
+    return f"{compiled.n_trees} trees, {compiled.n_nodes:,} nodes, pickle {len(blob) / 1e6:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker memory and startup per model loading path.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=None, help="refit a forest of this size (default: saved model)")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        print(prepare_models(model_dir, args.trees, args.max_depth) + f"; {args.workers} workers per mode")
+        print(f"{'mode':>9} {'startup s':>10} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'total PSS MB':>13}")
+        for mode in args.modes.split(","):
+            rows = run_mode(mode, model_dir, args.workers)
+
+            def mean(key):
+                return sum(r[key] for r in rows) / len(rows)
+
+            print(f"{mode:>9} {mean('startup_s'):>10.3f} {mean('rss') / 1024:>8.1f} {mean('pss') / 1024:>8.1f} "
+                  f"{mean('uss') / 1024:>8.1f} {sum(r['pss'] for r in rows) / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: nearest-segment queries on the memory-mapped segment index.
+
+Builds a synthetic index (random-walk routes of 200 m segments) in a temp
+directory, checks a sample of queries against a brute-force scan, then times
+load and single queries near the routes and far from them.
+Run from project root:
+    python benchmarks/bench_spatial_index.py --segments 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, RISK_LEVELS
+from geo.spatial_index import SegmentIndex, write_segment_index
+
+
+def synthetic_routes(n_segments: int, n_routes: int, seed: int = 0) -> dict:
+    """Random-walk routes scattered over a ~2 x 2 degree region, 200 m per step."""
+    rng = np.random.default_rng(seed)
+    per_route = n_segments // n_routes
+    step_deg = 200.0 / 111_195.0
+    origin = rng.uniform([31.0, 76.0], [33.0, 78.0], size=(n_routes, 1, 2))
+    heading = np.cumsum(rng.normal(0, 0.3, size=(n_routes, per_route + 1)), axis=1)
+    steps = np.stack([np.cos(heading), np.sin(heading)], axis=-1) * step_deg
+    points = origin + np.cumsum(steps, axis=1)
+    proba = rng.dirichlet(np.ones(len(RISK_LEVELS)), size=n_routes * per_route)
+    return {
+        "start": points[:, :-1].reshape(-1, 2),
+        "end": points[:, 1:].reshape(-1, 2),
+        "features": rng.uniform(0, 10, size=(n_routes * per_route, len(FEATURE_COLUMNS))),
+        "proba": proba,
+        "risk_code": np.argmax(proba, axis=1).astype(np.int8),
+        "route_id": np.repeat(np.arange(n_routes, dtype=np.int32), per_route),
+        "segment_index": np.tile(np.arange(per_route, dtype=np.int32), n_routes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline segment index.")
+    parser.add_argument("--segments", type=int, default=1_000_000)
+    parser.add_argument("--routes", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    entries = synthetic_routes(args.segments, args.routes)
+    meta = {"segment_length_m": 200.0, "classes": RISK_LEVELS,
+            "routes": [f"route_{i}" for i in range(args.routes)], "model_version": "synthetic"}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "segment_index")
+        t0 = time.perf_counter()
+        write_segment_index(path, meta, **entries)
+        print(f"Built index of {len(entries['start'])} segments in {time.perf_counter() - t0:.2f} s")
+
+        t0 = time.perf_counter()
+        index = SegmentIndex.load(path)
+        print(f"Loaded (mmap) in {(time.perf_counter() - t0) * 1e3:.2f} ms")
+
+        rng = np.random.default_rng(1)
+        pick = rng.integers(0, len(index), args.queries)
+        mid = (np.asarray(index.start)[pick] + np.asarray(index.end)[pick]) / 2
+        near = mid + rng.normal(0, 0.001, size=mid.shape)
+        far = rng.uniform([31.0, 76.0], [33.0, 78.0], size=mid.shape)
+
+        everything = np.arange(len(index))
+        for lat, lon in near[:50]:
+            hit = index.nearest(lat, lon)
+            d = index._distances_m(lat, lon, everything)
+            best = float(d.min())
+            expected = best if best <= 500.0 else None
+            got = hit[1] if hit else None
+            if (got is None) != (expected is None) or (got is not None and abs(got - expected) > 1e-6):
+                raise AssertionError(f"Index disagrees with brute force at ({lat}, {lon})")
+        print("Matches brute force on 50 queries")
+
+        for name, queries in (("near a route", near), ("random point", far)):
+            times = []
+            for lat, lon in queries:
+                t0 = time.perf_counter()
+                index.nearest(lat, lon)
+                times.append(time.perf_counter() - t0)
+            times = np.array(times) * 1e6
+            print(f"{name:>14}: p50 {np.median(times):7.1f} us   p99 {np.percentile(times, 99):7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: vectorised schema validation vs per-field pydantic validation.
+
+Times config/validation.py (one NumPy pass over a whole matrix) against a
+pydantic model with the same FEATURE_RANGES bounds (Field(ge=..., le=...)),
+validated row by row as a request model would be, and the /predict/batch
+request body both ways: parsed by json.loads (as FastAPI does), then either
+validated into pydantic models and gathered into a matrix (the endpoint before
+config/validation.py) or gathered straight into a matrix and validated in one
+pass. Rows are drawn from the schema ranges with 1% out of range.
+Run from project root:
+    python benchmarks/bench_validation.py
+"""
+
+import json
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, FEATURE_RANGES
+from config.validation import FeatureValidator
+
+
+def time_call(fn, repeat: int) -> float:
+    """Median seconds per call over `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def make_rows(n: int, bad_fraction: float = 0.01, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    low = np.array([FEATURE_RANGES[f][0] for f in FEATURE_COLUMNS], dtype=np.float64)
+    high = np.array([FEATURE_RANGES[f][1] for f in FEATURE_COLUMNS], dtype=np.float64)
+    X = rng.uniform(low, high, size=(n, len(FEATURE_COLUMNS)))
+    for j, f in enumerate(FEATURE_COLUMNS):
+        if isinstance(FEATURE_RANGES[f][0], int):
+            X[:, j] = np.round(X[:, j])
+    bad = rng.random(n) < bad_fraction
+    X[bad, 0] = high[0] * 2
+    return X
+
+
+def pydantic_models():
+    from pydantic import BaseModel, Field, create_model
+
+    fields = {}
+    for f in FEATURE_COLUMNS:
+        low, high = FEATURE_RANGES[f]
+        fields[f] = (int if isinstance(low, int) else float, Field(ge=low, le=high))
+    Row = create_model("Row", **fields)
+
+    class Batch(BaseModel):
+        segments: List[Row]
+
+    return Row, Batch
+
+
+def main():
+    from pydantic import ValidationError
+
+    Row, Batch = pydantic_models()
+    validator = FeatureValidator()
+
+    def pydantic_rows(dicts):
+        for d in dicts:
+            try:
+                Row.model_validate(d)
+            except ValidationError:
+                pass
+
+    def pydantic_batch(body):
+        try:
+            payload = Batch.model_validate(json.loads(body))
+        except ValidationError:
+            return
+        np.array([[getattr(seg, k) for k in FEATURE_COLUMNS] for seg in payload.segments], dtype=np.float64)
+
+    def vectorised_batch(body):
+        segments = json.loads(body)["segments"]
+        X = np.array([[seg[k] for k in FEATURE_COLUMNS] for seg in segments], dtype=np.float64)
+        validator.validate_rows(X, "clip", copy=False)
+
+    print("Validation only (pydantic: per row; vectorised: whole matrix, reject mode)")
+    print(f"{'case':<12} {'pydantic/row':>13} {'vectorised':>11} {'per row':>9} {'speedup':>8}")
+    for n, repeat in ((1, 2000), (100, 200), (10_000, 10), (1_000_000, 3)):
+        X = make_rows(n)
+        dicts = [dict(zip(FEATURE_COLUMNS, row)) for row in X.tolist()] if n <= 10_000 else None
+        t_vec = time_call(lambda: validator.validate_rows(X, "reject"), repeat)
+        if dicts is not None:
+            t_pyd = time_call(lambda: pydantic_rows(dicts), repeat)
+            pyd = f"{t_pyd / n * 1e6:>11.2f}us"
+            speedup = f"{t_pyd / t_vec:>7.1f}x"
+        else:
+            pyd, speedup = f"{'-':>13}", f"{'-':>8}"
+        print(f"{'rows ' + str(n):<12} {pyd} {t_vec * 1e3:>9.3f}ms {t_vec / n * 1e9:>7.0f}ns {speedup}")
+
+    print()
+    print("/predict/batch body: parse + validate + feature matrix")
+    print(f"{'JSON body':<12} {'pydantic':>13} {'vectorised':>11} {'per row':>9} {'speedup':>8}")
+    for n, repeat in ((100, 200), (10_000, 10)):
+        # All rows valid, so pydantic does not stop early with a ValidationError
+        X = make_rows(n, bad_fraction=0.0)
+        body = json.dumps({"segments": [dict(zip(FEATURE_COLUMNS, row)) for row in X.tolist()]})
+        t_pyd = time_call(lambda: pydantic_batch(body), repeat)
+        t_vec = time_call(lambda: vectorised_batch(body), repeat)
+        print(f"{'rows ' + str(n):<12} {t_pyd * 1e3:>11.3f}ms {t_vec * 1e3:>9.3f}ms "
+              f"{t_vec / n * 1e6:>7.2f}us {t_pyd / t_vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark suite: generation, training, inference and API throughput.
+
+`run` measures
+  generation - rows/sec of the rows and columns dataset engines at several sizes
+  training   - fit time per model_type (same split and settings as train_and_save,
+               without saving, so the served model is never touched)
+  inference  - predict_risk single-row, predict_risk_batch and predict_explain_batch
+               (prediction + ranked reasons) latency percentiles
+  api        - requests/sec and latency percentiles of /predict,
+               /predict-by-location and /predict/batch through an in-process
+               ASGI client (httpx.ASGITransport), requests sent concurrently
+and writes one JSON file with environment metadata. `compare` checks a
+result file against a saved baseline and exits with status 1 if any metric
+got worse by more than --threshold (metrics ending in _per_sec are
+higher-is-better, everything else lower-is-better).
+
+Run from project root:
+    python benchmarks/suite.py run --out benchmarks/results/baseline.json
+    python benchmarks/suite.py run --quick --only inference,api
+    python benchmarks/suite.py compare benchmarks/results/baseline.json benchmarks/results/latest.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, TARGET_COLUMN
+
+DEFAULT_OUT = os.path.join(PROJECT_ROOT, "benchmarks", "results", "latest.json")
+DEFAULT_THRESHOLD = 0.10
+
+
+def percentiles_ms(seconds) -> dict:
+    ms = np.asarray(seconds) * 1e3
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def timed(fn, repeat: int) -> list:
+    """Wall time in seconds of each of `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+# --- Benchmarks ---
+
+def bench_generation(quick: bool) -> dict:
+    from scripts.generate_dataset import generate_synthetic_chunk, generate_synthetic_dataset
+
+    results = {}
+    for n_per_class in ([200] if quick else [200, 2000]):
+        seconds = min(timed(lambda: generate_synthetic_dataset(n_per_class=n_per_class), 3))
+        results[f"rows_engine_{3 * n_per_class}"] = {"rows_per_sec": 3 * n_per_class / seconds}
+    for n_per_class in ([10_000] if quick else [10_000, 100_000, 300_000]):
+        seed = np.random.SeedSequence(42)
+        seconds = min(timed(lambda: generate_synthetic_chunk(seed, n_per_class), 3))
+        results[f"columns_engine_{3 * n_per_class}"] = {"rows_per_sec": 3 * n_per_class / seconds}
+    return results
+
+
+def bench_training(quick: bool) -> dict:
+    from sklearn.model_selection import train_test_split
+    from scripts.generate_dataset import generate_synthetic_chunk
+    from training.train_model import build_classifier, load_data
+
+    datasets = {"shipped": load_data()}
+    if not quick:
+        datasets["synthetic_30k"] = generate_synthetic_chunk(np.random.SeedSequence(7), 10_000)
+    results = {}
+    for name, df in datasets.items():
+        X_train, _, y_train, _ = train_test_split(
+            df[FEATURE_COLUMNS], df[TARGET_COLUMN], test_size=0.2, random_state=42, stratify=df[TARGET_COLUMN]
+        )
+        for model_type in ("decision_tree", "random_forest"):
+            seconds = timed(lambda: build_classifier(model_type).fit(X_train, y_train), 1 if quick else 3)
+            results[f"{model_type}_{name}"] = {"fit_seconds": min(seconds), "rows": len(X_train)}
+    return results
+
+
+def bench_inference(quick: bool) -> dict:
+    from prediction.explain import predict_explain_batch
+    from prediction.predictor import predict_risk, predict_risk_batch
+    from training.train_model import load_data
+
+    X = load_data()[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    rows = [dict(zip(FEATURE_COLUMNS, X[i])) for i in rng.integers(0, len(X), 200)]
+    predict_risk(rows[0])
+    single = []
+    for i in range(500 if quick else 5000):
+        row = rows[i % len(rows)]
+        t0 = time.perf_counter()
+        predict_risk(row)
+        single.append(time.perf_counter() - t0)
+    results = {"predict_risk_single": {**percentiles_ms(single), "rows_per_sec": 1.0 / float(np.mean(single))}}
+    for size in (100, 10_000):
+        batch = X[rng.integers(0, len(X), size)]
+        seconds = timed(lambda: predict_risk_batch(batch), 20 if quick else 100)
+        results[f"predict_risk_batch_{size}"] = {
+            **percentiles_ms(seconds),
+            "rows_per_sec": size / float(np.median(seconds)),
+        }
+        seconds = timed(lambda: predict_explain_batch(batch), 20 if quick else 100)
+        results[f"predict_explain_batch_{size}"] = {
+            **percentiles_ms(seconds),
+            "rows_per_sec": size / float(np.median(seconds)),
+        }
+    return results
+
+
+async def _api_load(client, method: str, path: str, body, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = {}
+    queue = iter(range(n_requests))
+
+    async def worker():
+        for _ in queue:
+            t0 = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - t0
+    if set(statuses) != {200}:
+        raise RuntimeError(f"{path}: unexpected status codes {statuses}")
+    return {**percentiles_ms(latencies), "requests_per_sec": n_requests / wall}
+
+
+def bench_api(quick: bool) -> dict:
+    import httpx
+    from backend.app import app
+
+    segment = {
+        "slope_angle": 32.0, "altitude_change": 250.0, "weather_severity": 4,
+        "trail_difficulty": 3, "path_width_m": 1.2, "visibility_km": 3.0,
+    }
+    cases = [
+        ("predict", "POST", "/predict", segment),
+        ("predict_by_location", "POST", "/predict-by-location", {"location": "Hampta Pass"}),
+        ("predict_batch_100", "POST", "/predict/batch", {"segments": [segment] * 100}),
+    ]
+    n_requests = 200 if quick else 2000
+    concurrency = 32
+
+    async def run_all():
+        results = {}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name, method, path, body in cases:
+                    await _api_load(client, method, path, body, concurrency, concurrency)  # warm-up
+                    results[name] = await _api_load(client, method, path, body, n_requests, concurrency)
+                    results[name]["concurrency"] = concurrency
+        return results
+
+    return asyncio.run(run_all())
+
+
+BENCHMARKS = {
+    "generation": bench_generation,
+    "training": bench_training,
+    "inference": bench_inference,
+    "api": bench_api,
+}
+
+
+# --- Environment metadata ---
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    import pandas as pd
+    import sklearn
+
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+    try:
+        from prediction.registry import get_registry
+        meta["model_version"] = get_registry().get().version
+    except FileNotFoundError:
+        meta["model_version"] = None
+    return meta
+
+
+# --- Commands ---
+
+def run(only: list, quick: bool, out_path: str) -> dict:
+    warnings.filterwarnings("ignore")
+    report = {"environment": environment(), "quick": quick, "results": {}}
+    for name in only:
+        print(f"[{name}]")
+        t0 = time.perf_counter()
+        report["results"][name] = BENCHMARKS[name](quick)
+        for case, metrics in report["results"][name].items():
+            shown = ", ".join(f"{k}={v:.4g}" for k, v in metrics.items())
+            print(f"  {case}: {shown}")
+        print(f"  ({time.perf_counter() - t0:.1f} s)")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results saved to", out_path)
+    return report
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec")
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    One row per metric present in both reports:
+    (benchmark/case/metric, baseline, current, relative change, regressed).
+    Relative change is positive when the current value is worse.
+    """
+    rows = []
+    for group, cases in baseline["results"].items():
+        for case, metrics in cases.items():
+            new_metrics = current.get("results", {}).get(group, {}).get(case, {})
+            for metric, old in metrics.items():
+                new = new_metrics.get(metric)
+                if new is None or metric in ("rows", "concurrency") or not old:
+                    continue
+                worse = (old - new) / old if higher_is_better(metric) else (new - old) / old
+                rows.append((f"{group}/{case}/{metric}", old, new, worse, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with regression check.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="run benchmarks and save JSON results")
+    run_p.add_argument("--only", default=",".join(BENCHMARKS),
+                       help=f"comma-separated subset of {', '.join(BENCHMARKS)}")
+    run_p.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    run_p.add_argument("--out", default=DEFAULT_OUT)
+    cmp_p = sub.add_parser("compare", help="flag regressions against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current", nargs="?", default=DEFAULT_OUT)
+    cmp_p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="relative slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        only = [name.strip() for name in args.only.split(",") if name.strip()]
+        unknown = [name for name in only if name not in BENCHMARKS]
+        if unknown:
+            parser.error(f"unknown benchmarks: {unknown}")
+        run(only, args.quick, args.out)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for key in ("git_commit", "cpu_count", "numpy", "sklearn"):
+        old, new = baseline["environment"].get(key), current["environment"].get(key)
+        if old != new:
+            print(f"note: {key} differs ({old} -> {new})")
+    rows = compare(baseline, current, args.threshold)
+    regressions = 0
+    for name, old, new, worse, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:60s} {old:12.4g} -> {new:12.4g}  {worse:+7.1%} {flag}")
+        regressions += regressed
+    print(f"{len(rows)} metrics compared, {regressions} regression(s) over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,8 +31,30 @@ FEATURE_RANGES = {
     "visibility_km": (0.1, 20.0),
 }
 
+# --- Storage dtypes for the columnar (NPY / Parquet) dataset format ---
+# Continuous features as float32 (the tree models work in float32 anyway),
+# 1-5 scales as int8; risk_level is stored as int8 codes into RISK_LEVELS.
+FEATURE_DTYPES = {
+    "slope_angle": "float32",
+    "altitude_change": "float32",
+    "weather_severity": "int8",
+    "trail_difficulty": "int8",
+    "path_width_m": "float32",
+    "visibility_km": "float32",
+}
+TARGET_CODE_DTYPE = "int8"
+
 # --- Output paths ---
 RAW_DATA_DIR = "data/raw"
 PROCESSED_DATA_DIR = "data/processed"
 MODEL_DIR = "model"
 DEFAULT_MODEL_FILENAME = "risk_model.pkl"
+DEFAULT_COMPILED_FILENAME = "risk_model_compiled.npz"
+DEFAULT_QUANTIZED_FILENAME = "risk_model_quantized.bin"
+DEFAULT_TABLE_FILENAME = "risk_model_table.npz"
+DEFAULT_MAPPED_DIRNAME = "risk_model_mapped"
+# In-browser copy of the model for the web frontend (prediction/web_export.py)
+WEB_MODEL_PATH = "frontend/model/risk_model.json"
+LINEAGE_FILENAME = "lineage.json"
+MAPS_DIR = "maps"
+SEGMENT_INDEX_DIRNAME = "segment_index"
@@ -0,0 +1,450 @@
+"""
+Vectorised schema validation for feature data (offline).
+
+One FeatureValidator per feature list, built from config/schema.py:
+FEATURE_RANGES gives the bounds and FEATURE_DTYPES which features are whole
+numbers. check() finds the bad rows of a whole (n_rows, n_features) matrix
+with a few NumPy comparisons per value (no per-row or per-field Python), then
+works out for those rows only which values are
+
+  missing      - NaN (or None / empty in the input)
+  not_numeric  - text that does not parse as a number (DataFrames, object arrays)
+  not_integer  - a fraction in a whole-number feature (weather_severity, ...)
+  below/above  - outside FEATURE_RANGES
+
+and validate() applies one of three modes:
+
+  reject - any bad row raises SchemaValidationError (a ValueError)
+  clip   - out-of-range values are clipped to the range and fractions in
+           whole-number features rounded half up (2.5 -> 3); rows with
+           missing / non-numeric values cannot be repaired and still raise.
+           The trees' split thresholds all lie inside the training data, so
+           clipping an out-of-range value never changes a prediction or its
+           reasons; rounding a fraction can (a split may fall between the
+           fraction and the whole number it is rounded to).
+  flag   - values are passed on unchanged and the report marks the bad rows;
+           only missing / non-numeric values (nothing to score) still raise.
+
+validate_rows() does the same but marks the rows a mode rejects instead of
+raising, for callers that answer per row (the backend's micro-batches).
+Every validator counts what it has seen (stats(), exported in GET /metrics).
+
+Run from project root (checks the training CSV, or another CSV / Parquet file):
+    python config/validation.py
+    python config/validation.py segments.parquet
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, FEATURE_DTYPES, FEATURE_RANGES
+
+VALIDATION_MODES = ("reject", "clip", "flag")
+# Rows described in an error message
+MAX_REPORTED_ROWS = 3
+# Rows per block in invalid_rows (a few hundred KB of buffers); up to
+# SMALL_ROWS (request-sized batches) the matrix is checked in one go
+BLOCK_ROWS = 16384
+SMALL_ROWS = 512
+# Rows per chunk when validate_frame scans a DataFrame (a few MB of float64)
+FRAME_CHUNK_ROWS = 65536
+
+
+class SchemaValidationError(ValueError):
+    """Rows that fail the schema under the chosen mode; .report has the details."""
+
+    def __init__(self, message: str, report: "ValidationReport" = None):
+        super().__init__(message)
+        self.report = report
+
+
+class ValidationReport:
+    """Violations found by one check (kept for the bad rows only), plus what the mode did about them."""
+
+    def __init__(self, validator: "FeatureValidator", invalid: np.ndarray, values: np.ndarray,
+                 masks: dict, mode: str):
+        self.validator = validator
+        self.mode = mode
+        self.n_rows = len(invalid)
+        self.invalid = invalid  # (n_rows,) bool
+        self.rows = np.flatnonzero(invalid)  # indices of the bad rows
+        self.n_invalid = len(self.rows)
+        self.values = values  # their values as given, (n_invalid, n_features)
+        self.masks = masks  # kind -> (n_invalid, n_features) bool, only kinds that occur
+        self.rejected = np.zeros(self.n_rows, dtype=bool)
+        self.clipped = None  # clip mode: (n_invalid, n_features) bool of repaired cells
+        self.cells_clipped = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.n_invalid == 0
+
+    def counts(self, rows: np.ndarray = None) -> dict:
+        """{feature: {kind: cells}} for every violation found (in `rows`, a mask, if given)."""
+        out = {}
+        selected = rows[self.rows] if rows is not None else None
+        for kind, mask in self.masks.items():
+            if selected is not None:
+                mask = mask[selected]
+            for name, n in zip(self.validator.features, mask.sum(axis=0).tolist()):
+                if n:
+                    out.setdefault(name, {})[kind] = n
+        return out
+
+    def row_problems(self, i: int) -> list:
+        """Human-readable violations of row i."""
+        k = int(np.searchsorted(self.rows, i))
+        if k == self.n_invalid or self.rows[k] != i:
+            return []
+        v = self.validator
+        problems = []
+        for j, name in enumerate(v.features):
+            value = self.values[k, j]
+            if "missing" in self.masks and self.masks["missing"][k, j]:
+                problems.append(f"{name} is missing")
+            elif "not_numeric" in self.masks and self.masks["not_numeric"][k, j]:
+                problems.append(f"{name} is not a number")
+            elif "below" in self.masks and self.masks["below"][k, j]:
+                problems.append(f"{name}={value:g} is below the minimum {v.low[j]:g}")
+            elif "above" in self.masks and self.masks["above"][k, j]:
+                problems.append(f"{name}={value:g} is above the maximum {v.high[j]:g}")
+            elif "not_integer" in self.masks and self.masks["not_integer"][k, j]:
+                problems.append(f"{name}={value:g} is not a whole number")
+        return problems
+
+    def summary(self, rows: np.ndarray = None) -> str:
+        """One-line description of the bad rows (or of `rows`, a mask)."""
+        rows = self.invalid if rows is None else rows
+        idx = np.flatnonzero(rows)
+        counts = "; ".join(
+            f"{name}: " + ", ".join(f"{n} {kind.replace('_', ' ')}" for kind, n in kinds.items())
+            for name, kinds in self.counts(rows).items()
+        )
+        examples = "; ".join(f"row {i}: {', '.join(self.row_problems(i))}" for i in idx[:MAX_REPORTED_ROWS])
+        return f"{len(idx)} of {self.n_rows} rows fail the feature schema ({counts}). {examples}"
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "rows": self.n_rows,
+            "invalid_rows": self.n_invalid,
+            "rejected_rows": int(self.rejected.sum()),
+            "cells_clipped": self.cells_clipped,
+            "violations": self.counts(),
+        }
+
+
+class FeatureValidator:
+    """Schema checks for a fixed list of features (columns of the matrices it is given)."""
+
+    def __init__(self, features=FEATURE_COLUMNS, ranges=FEATURE_RANGES, dtypes=FEATURE_DTYPES):
+        unknown = [f for f in features if f not in ranges]
+        if unknown:
+            raise ValueError(f"No schema range for features {unknown}")
+        self.features = list(features)
+        self.low = np.array([ranges[f][0] for f in self.features], dtype=np.float64)
+        self.high = np.array([ranges[f][1] for f in self.features], dtype=np.float64)
+        self.integer = np.array([np.issubdtype(np.dtype(dtypes.get(f, "float64")), np.integer)
+                                 for f in self.features])
+        self._integer_cols = np.flatnonzero(self.integer)
+        self._lock = threading.Lock()
+        self.rows_checked = 0
+        self.rows_invalid = 0
+        self.rows_rejected = 0
+        self.cells_clipped = 0
+        self._violations = {}
+
+    # --- Checks ---
+
+    def as_matrix(self, data) -> tuple:
+        """
+        (float64 matrix, not_numeric mask or None) from a 2-D array, a dict of
+        columns or a DataFrame. Text that does not parse becomes NaN and is
+        marked not_numeric. A float64 array is used as is, not copied.
+        """
+        if hasattr(data, "columns") or isinstance(data, dict):
+            missing = [f for f in self.features if f not in data]
+            if missing:
+                raise SchemaValidationError(f"Missing feature columns: {missing}")
+            columns = [np.asarray(data[f]) for f in self.features]
+            n = len(columns[0]) if columns else 0
+            X = np.empty((n, len(self.features)), dtype=np.float64)
+            not_numeric = None
+            for j, col in enumerate(columns):
+                if len(col) != n:
+                    raise SchemaValidationError("Feature columns must all have the same length")
+                values, bad = _to_float(col)
+                X[:, j] = values
+                if bad is not None:
+                    not_numeric = np.zeros(X.shape, dtype=bool) if not_numeric is None else not_numeric
+                    not_numeric[:, j] = bad
+            return X, not_numeric
+        X = np.asarray(data)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise SchemaValidationError(
+                f"Expected {len(self.features)} feature columns, got shape {X.shape}"
+            )
+        if X.dtype.kind in "biuf":
+            return X.astype(np.float64, copy=False), None
+        out = np.empty(X.shape, dtype=np.float64)
+        not_numeric = np.zeros(X.shape, dtype=bool)
+        for j in range(X.shape[1]):
+            out[:, j], bad = _to_float(X[:, j])
+            if bad is not None:
+                not_numeric[:, j] = bad
+        return out, not_numeric if not_numeric.any() else None
+
+    def invalid_rows(self, X: np.ndarray) -> np.ndarray:
+        """
+        (n_rows,) bool, True where any value is outside its range, NaN or (for
+        whole-number features) fractional. Works through X in blocks of
+        BLOCK_ROWS with buffers that stay in cache, so a million-row matrix
+        costs a few comparisons per value and no full-size temporaries.
+        """
+        n, k = X.shape
+        if n <= SMALL_ROWS:
+            # Few rows: fewer, whole-matrix NumPy calls beat the block loop's per-call overhead
+            ok = (X >= self.low) & (X <= self.high) & ((X == np.floor(X)) | ~self.integer)
+            return ~ok.all(axis=1)
+        invalid = np.empty(n, dtype=bool)
+        size = min(n, BLOCK_ROWS)
+        ok, tmp, row_ok = np.empty((size, k), dtype=bool), np.empty((size, k), dtype=bool), np.empty(size, dtype=bool)
+        ints = self._integer_cols
+        for start in range(0, n, BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            m = len(block)
+            o, t, r = ok[:m], tmp[:m], row_ok[:m]
+            # NaN fails both comparisons, so missing values need no pass of their own
+            np.greater_equal(block, self.low, out=o)
+            np.less_equal(block, self.high, out=t)
+            o &= t
+            if len(ints):
+                cols = block[:, ints]
+                o[:, ints] &= cols == np.floor(cols)
+            # Column by column: much faster than .all(axis=1) over a handful of features
+            np.copyto(r, o[:, 0])
+            for j in range(1, k):
+                r &= o[:, j]
+            np.logical_not(r, out=invalid[start:start + m])
+        return invalid
+
+    def check(self, data, mode: str = "flag") -> ValidationReport:
+        """Find every violation; nothing is changed or raised."""
+        return self._check(*self.as_matrix(data), mode)
+
+    def _check(self, X: np.ndarray, not_numeric, mode: str) -> ValidationReport:
+        invalid = self.invalid_rows(X)
+        if not invalid.any():
+            return ValidationReport(self, invalid, X[:0], {}, mode)
+        rows = np.flatnonzero(invalid)
+        values = X[rows]
+        masks = {}
+        missing = np.isnan(values)
+        if not_numeric is not None:
+            not_numeric = not_numeric[rows]
+            missing &= ~not_numeric
+            masks["not_numeric"] = not_numeric
+        for kind, mask in (("missing", missing), ("below", values < self.low), ("above", values > self.high)):
+            if mask.any():
+                masks[kind] = mask
+        if len(self._integer_cols):
+            cols = values[:, self._integer_cols]
+            fraction = (cols != np.floor(cols)) & np.isfinite(cols)
+            if fraction.any():
+                not_integer = np.zeros(values.shape, dtype=bool)
+                not_integer[:, self._integer_cols] = fraction
+                masks["not_integer"] = not_integer
+        return ValidationReport(self, invalid, values, masks, mode)
+
+    # --- Modes ---
+
+    def validate_rows(self, data, mode: str = "reject", copy: bool = True) -> tuple:
+        """
+        (matrix, report) under `mode`, with the rows the mode rejects marked in
+        report.rejected (their values are left as they were) instead of raised.
+        copy=False lets clip repair a float64 input array in place.
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode {mode!r}; expected one of {VALIDATION_MODES}")
+        X, not_numeric = self.as_matrix(data)
+        report = self._check(X, not_numeric, mode)
+        fixed = self._apply_mode(report, mode)
+        if fixed is not None:
+            if copy and isinstance(data, np.ndarray) and np.may_share_memory(X, data):
+                X = X.copy()
+            X[report.rows] = fixed
+        self._record(report)
+        return X, report
+
+    def _apply_mode(self, report: ValidationReport, mode: str):
+        """
+        Mark the rows `mode` rejects in report.rejected; in clip mode, also
+        return the repaired values of the bad rows (else None).
+        """
+        if report.ok:
+            return None
+        masks = report.masks
+        if mode == "reject":
+            bad = np.ones(report.n_invalid, dtype=bool)
+        else:
+            # Nothing to score with: rejected in every mode
+            unfixable = [masks[k] for k in ("missing", "not_numeric") if k in masks]
+            bad = np.zeros(report.n_invalid, dtype=bool)
+            if unfixable:
+                bad = np.logical_or.reduce(unfixable).any(axis=1)
+        report.rejected[report.rows] = bad
+        if mode != "clip":
+            return None
+        fixable = [masks[k] for k in ("below", "above", "not_integer") if k in masks]
+        if not fixable:
+            return None
+        changed = np.logical_or.reduce(fixable) & ~bad[:, None]
+        fixed = np.clip(report.values, self.low, self.high)
+        # Half up, not np.rint's half to even: 2.5 and 3.5 both round up
+        fixed[:, self._integer_cols] = np.floor(fixed[:, self._integer_cols] + 0.5)
+        fixed[~changed] = report.values[~changed]
+        report.clipped = changed
+        report.cells_clipped = int(changed.sum())
+        return fixed
+
+    def validate(self, data, mode: str = "reject", copy: bool = True) -> tuple:
+        """(matrix, report); SchemaValidationError if the mode rejects any row."""
+        X, report = self.validate_rows(data, mode, copy)
+        if report.rejected.any():
+            raise SchemaValidationError(report.summary(report.rejected), report)
+        return X, report
+
+    def validate_frame(self, df, mode: str = "reject", chunk_rows: int = FRAME_CHUNK_ROWS) -> tuple:
+        """
+        (DataFrame, report) for the feature columns of df. The frame is checked
+        chunk_rows at a time and only its bad rows are gathered, so a large
+        (e.g. memory-mapped) frame is never copied as a whole. Without repairs
+        the input frame itself is returned; clip returns a shallow copy with
+        new arrays for the repaired columns only (integer columns keep their
+        dtype). The input frame is never modified.
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode {mode!r}; expected one of {VALIDATION_MODES}")
+        n = len(df)
+        invalid = np.zeros(n, dtype=bool)
+        for start in range(0, n, chunk_rows):
+            X, _ = self.as_matrix(df.iloc[start:start + chunk_rows])
+            # Text that does not parse is NaN here, so it fails the range checks too
+            invalid[start:start + len(X)] = self.invalid_rows(X)
+        rows = np.flatnonzero(invalid)
+        X, not_numeric = self.as_matrix(df.iloc[rows])
+        bad = self._check(X, not_numeric, mode)
+        fixed = self._apply_mode(bad, mode)
+        # Same report as a whole-frame check: bad-row details indexed by position in df
+        report = ValidationReport(self, invalid, bad.values, bad.masks, mode)
+        report.rejected[rows] = bad.rejected
+        report.clipped, report.cells_clipped = bad.clipped, bad.cells_clipped
+        self._record(report)
+        if report.rejected.any():
+            raise SchemaValidationError(report.summary(report.rejected), report)
+        if fixed is not None and report.cells_clipped:
+            df = df.copy(deep=False)
+            for j in np.flatnonzero(report.clipped.any(axis=0)):
+                name = self.features[j]
+                if df[name].dtype.kind in "iuf":
+                    col = df[name].to_numpy(copy=True)
+                else:
+                    col = _to_float(df[name].to_numpy())[0].copy()
+                changed = report.clipped[:, j]
+                col[rows[changed]] = fixed[changed, j].astype(col.dtype)
+                df[name] = col
+        return df, report
+
+    # --- Counters ---
+
+    def _record(self, report: ValidationReport) -> None:
+        with self._lock:
+            self.rows_checked += report.n_rows
+            if report.ok:
+                return
+            self.rows_invalid += report.n_invalid
+            self.rows_rejected += int(report.rejected.sum())
+            self.cells_clipped += report.cells_clipped
+            for name, kinds in report.counts().items():
+                slot = self._violations.setdefault(name, {})
+                for kind, n in kinds.items():
+                    slot[kind] = slot.get(kind, 0) + n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows_checked": self.rows_checked,
+                "rows_invalid": self.rows_invalid,
+                "rows_rejected": self.rows_rejected,
+                "cells_clipped": self.cells_clipped,
+                "violations": {name: dict(kinds) for name, kinds in self._violations.items()},
+            }
+
+
+def _to_float(col: np.ndarray) -> tuple:
+    """(float64 values, mask of entries that are present but not numbers, or None)."""
+    if col.dtype.kind in "biuf":
+        return col.astype(np.float64, copy=False), None
+    try:
+        return np.asarray(col, dtype=np.float64), None
+    except (TypeError, ValueError):
+        import pandas as pd
+
+        values = pd.to_numeric(pd.Series(col), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        present = pd.notna(pd.Series(col)).to_numpy() & (pd.Series(col).astype(str).str.strip() != "").to_numpy()
+        return values, np.isnan(values) & present
+
+
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(features=None) -> FeatureValidator:
+    """Shared validator for a feature list (default FEATURE_COLUMNS)."""
+    key = tuple(features or FEATURE_COLUMNS)
+    validator = _validators.get(key)
+    if validator is None:
+        with _validators_lock:
+            validator = _validators.setdefault(key, FeatureValidator(key))
+    return validator
+
+
+def validate_features(data, mode: str = "reject", features=None) -> tuple:
+    """(float64 matrix, report) for a 2-D array / dict of columns / DataFrame."""
+    return get_validator(features).validate(data, mode)
+
+
+def validate_frame(df, mode: str = "reject", features=None) -> tuple:
+    """(DataFrame, report) for the feature columns of df; see FeatureValidator.validate_frame."""
+    return get_validator(features).validate_frame(df, mode)
+
+
+def main():
+    import argparse
+    import pandas as pd
+    from config.schema import RAW_DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Check a dataset against the feature schema.")
+    parser.add_argument("path", nargs="?", default=os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+    args = parser.parse_args()
+    df = pd.read_parquet(args.path) if args.path.endswith(".parquet") else pd.read_csv(args.path)
+    try:
+        report = get_validator().check(df)
+    except SchemaValidationError as e:
+        sys.exit(f"Error: {e}")
+    if report.ok:
+        print(f"{report.n_rows} rows: all features within the schema")
+    else:
+        print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 /**
  * Trek Safety AI - Frontend
- * Calls backend POST /predict-by-location with a single location; shows risk level, confidence, and reasons.
+ * Scores a single location in the browser with the exported model (model.js +
+ * model/risk_model.json); falls back to backend POST /predict-by-location when
+ * the model cannot be loaded. Shows risk level, confidence, and reasons.
  */
 
 (function () {
   // Backend URL: change if you run the API on a different host/port
   const API_BASE = "http://127.0.0.1:8000";
+  // Model bundle written by training/train_model.py (prediction/web_export.py)
+  const MODEL_URL = "model/risk_model.json";
 
   const form = document.getElementById("predict-form");
   const resultSection = document.getElementById("result-section");
@@ -111,6 +115,46 @@
       "</div>";
   }
 
+  /**
+   * Load the exported model once; resolves to null when it is unavailable
+   * (e.g. page opened from file://, where fetch is blocked).
+   */
+  var localModel = null;
+  function getLocalModel() {
+    if (!localModel) {
+      localModel = (typeof TrekModel === "undefined" ? Promise.reject(new Error("model.js not loaded"))
+        : fetch(MODEL_URL)
+          .then(function (res) {
+            if (!res.ok) throw new Error("HTTP " + res.status);
+            return res.json();
+          })
+          .then(function (bundle) { return TrekModel.fromBundle(bundle); }))
+        .catch(function () { return null; });
+    }
+    return localModel;
+  }
+
+  /**
+   * Score on the backend (fallback). Resolves to the response, or throws an
+   * Error whose message is shown to the user.
+   */
+  async function predictRemote(payload) {
+    const res = await fetch(API_BASE + "/predict-by-location", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+    const data = await res.json();
+
+    if (!res.ok) {
+      var msg = data.detail;
+      if (Array.isArray(msg)) msg = msg.map(function (x) { return x.msg || x; }).join("; ");
+      else if (typeof msg !== "string") msg = "Request failed. Is the backend running?";
+      throw new Error(msg);
+    }
+    return data;
+  }
+
   function escapeHtml(text) {
     const div = document.createElement("div");
     div.textContent = text;
@@ -125,25 +169,22 @@
     const payload = getFormPayload();
 
     try {
-      const res = await fetch(API_BASE + "/predict-by-location", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-      const data = await res.json();
-
-      if (!res.ok) {
-        var msg = data.detail;
-        if (Array.isArray(msg)) msg = msg.map(function (x) { return x.msg || x; }).join("; ");
-        else if (typeof msg !== "string") msg = "Request failed. Is the backend running?";
-        showError(msg);
-        return;
-      }
-      showResult(data);
+      const model = await getLocalModel();
+      showResult(model ? model.predictLocation(payload.location) : await predictRemote(payload));
     } catch (err) {
-      showError("Could not reach the server. Start the backend with: uvicorn backend.app:app --reload");
+      if (err instanceof TypeError || err instanceof SyntaxError) {
+        showError("Could not reach the server. Start the backend with: uvicorn backend.app:app --reload");
+      } else {
+        showError(err.message);
+      }
     } finally {
       submitBtn.disabled = false;
     }
   });
+
+  // Cache the page and the model for offline use (service workers need http(s))
+  if ("serviceWorker" in navigator && /^https?:$/.test(location.protocol)) {
+    navigator.serviceWorker.register("sw.js").catch(function () {});
+  }
+  getLocalModel();
 })();
@@ -0,0 +1,24 @@
+/**
+ * Node harness for prediction/web_export.py --check.
+ * Usage: node frontend/check_model.js <bundle.json> <request.json>
+ * request: {"rows": [[feature values in bundle order], ...], "locations": [...]}
+ * Prints {"rows": [result, ...], "locations": [{features, result}, ...]} as JSON.
+ */
+
+const fs = require("fs");
+const path = require("path");
+const TrekModel = require(path.join(__dirname, "model.js"));
+
+const model = TrekModel.fromBundle(JSON.parse(fs.readFileSync(process.argv[2], "utf8")));
+const request = JSON.parse(fs.readFileSync(process.argv[3], "utf8"));
+
+const rows = request.rows.map(function (values) {
+  const features = {};
+  model.features.forEach(function (name, i) { features[name] = values[i]; });
+  return model.predict(features);
+});
+const locations = request.locations.map(function (location) {
+  const features = model.featuresFromLocation(location);
+  return { features: features, result: model.predict(features) };
+});
+process.stdout.write(JSON.stringify({ rows: rows, locations: locations }));
@@ -0,0 +1,284 @@
+/**
+ * Trek Safety AI - in-browser risk model.
+ * Scores features with the forest bundle from prediction/web_export.py: same
+ * traversal, probabilities and ranked reasons as the Python model. Derives
+ * features from a location exactly as backend/inference.py does (SHA-256 seed,
+ * NumPy SeedSequence + PCG64 draws), so answers match the server's.
+ * Works in the browser (window.TrekModel) and in Node (require).
+ */
+
+(function (root, factory) {
+  var api = factory();
+  if (typeof module === "object" && module.exports) module.exports = api;
+  else root.TrekModel = api;
+})(typeof self !== "undefined" ? self : this, function () {
+  "use strict";
+
+  // --- Bundle decoding ---
+
+  function decode(b64, Type) {
+    var bin = typeof atob === "function" ? atob(b64) : Buffer.from(b64, "base64").toString("binary");
+    var bytes = new Uint8Array(bin.length);
+    for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    return new Type(bytes.buffer);
+  }
+
+  /**
+   * Forest from a parsed bundle (JSON object).
+   */
+  function Forest(bundle) {
+    if (bundle.format !== "trek-forest" || bundle.version !== 2) {
+      throw new Error("Unsupported model bundle: " + bundle.format + " v" + bundle.version);
+    }
+    var a = bundle.arrays;
+    this.features = bundle.features;
+    this.classes = bundle.classes;
+    this.roots = bundle.roots;
+    this.featureRanges = bundle.feature_ranges;
+    this.minContribution = bundle.min_contribution;
+    this.reasons = bundle.reasons;
+    this.safeReason = bundle.safe_reason;
+    this.version = bundle.source_sha256 ? bundle.source_sha256.slice(0, 12) : null;
+    this.feature = decode(a.feature, Int8Array);
+    this.threshold = decode(a.threshold, Float64Array);
+    this.left = decode(a.left, Int32Array);
+    this.right = decode(a.right, Int32Array);
+    this.leaf = decode(a.leaf, Int32Array);
+    this.leafValue = decode(a.leaf_value, Float64Array);
+    this.leafContribution = decode(a.leaf_safe_contribution, Float64Array);
+  }
+
+  /**
+   * { risk_level, confidence, reasons } for one feature object, the same
+   * response as the backend's /predict.
+   */
+  Forest.prototype.predict = function (features) {
+    var nF = this.features.length, nC = this.classes.length, nT = this.roots.length;
+    var raw = new Float64Array(nF), x = new Float64Array(nF);
+    for (var f = 0; f < nF; f++) {
+      var v = Number(features[this.features[f]]);
+      if (!isFinite(v)) throw new Error("Missing or invalid feature: " + this.features[f]);
+      raw[f] = v;
+      x[f] = Math.fround(v); // the trees compare float32 inputs, as sklearn does
+    }
+    var proba = new Float64Array(nC), contribution = new Float64Array(nF);
+    // Sum tree by tree (same order as Python) so rounding is identical
+    for (var t = 0; t < nT; t++) {
+      var node = this.roots[t];
+      while (this.feature[node] >= 0) {
+        node = x[this.feature[node]] > this.threshold[node] ? this.right[node] : this.left[node];
+      }
+      var slot = this.leaf[node];
+      for (var c = 0; c < nC; c++) proba[c] += this.leafValue[slot * nC + c];
+      for (f = 0; f < nF; f++) contribution[f] += this.leafContribution[slot * nF + f];
+    }
+    var best = 0, confidence = {};
+    for (c = 0; c < nC; c++) {
+      proba[c] /= nT;
+      if (proba[c] > proba[best]) best = c;
+    }
+    for (c = 0; c < nC; c++) confidence[this.classes[c]] = proba[c];
+    // Risk gained = Safe probability lost along each feature's splits, largest first
+    var order = [];
+    for (f = 0; f < nF; f++) {
+      contribution[f] /= nT;
+      order.push(f);
+    }
+    order.sort(function (i, j) { return contribution[i] - contribution[j]; });
+    var reasons = [];
+    for (var k = 0; k < nF; k++) {
+      if (-contribution[order[k]] < this.minContribution) break;
+      reasons.push(this.reasonText(order[k], raw[order[k]]));
+    }
+    return {
+      risk_level: this.classes[best],
+      confidence: confidence,
+      reasons: reasons.length ? reasons : [this.safeReason],
+    };
+  };
+
+  /**
+   * Reason for feature index f at value v: the rule text only if the rule
+   * holds (prediction/explain.py reason_text), else the neutral wording.
+   */
+  Forest.prototype.reasonText = function (f, v) {
+    var r = this.reasons[this.features[f]], rule = r.rule;
+    if (!rule) return r.neutral;
+    var holds = rule[0] === ">" ? v > rule[1] : rule[0] === ">=" ? v >= rule[1] : v < rule[1];
+    return holds ? r.text : r.neutral;
+  };
+
+  /**
+   * Features for a location string, identical to backend/inference.py
+   * features_from_location().
+   */
+  Forest.prototype.featuresFromLocation = function (location) {
+    var raw = String(location || "").trim() || "Unknown";
+    var seed = parseInt(sha256Hex(new TextEncoder().encode(raw)).slice(0, 12), 16);
+    var rng = new PCG64(seedSequenceState(seed));
+    var out = {};
+    var order = ["slope_angle", "altitude_change", "weather_severity", "trail_difficulty", "path_width_m", "visibility_km"];
+    for (var i = 0; i < order.length; i++) {
+      var range = this.featureRanges[order[i]];
+      out[order[i]] = range.integer ? rng.integers(range.low, range.high + 1) : rng.uniform(range.low, range.high);
+    }
+    return out;
+  };
+
+  Forest.prototype.predictLocation = function (location) {
+    return this.predict(this.featuresFromLocation(location));
+  };
+
+  // --- NumPy default_rng(seed): SeedSequence -> PCG64 ---
+
+  var INIT_A = 0x43b0d7e5, MULT_A = 0x931e8875, INIT_B = 0x8b51f9dd, MULT_B = 0x58f38ded;
+  var MIX_MULT_L = 0xca01f9dd, MIX_MULT_R = 0x4973f715, POOL_SIZE = 4;
+
+  /** Four uint64 words (as BigInt) that SeedSequence(seed).generate_state(4, uint64) returns. */
+  function seedSequenceState(seed) {
+    var entropy = [];
+    var n = seed;
+    do {
+      entropy.push(n % 4294967296);
+      n = Math.floor(n / 4294967296);
+    } while (n > 0);
+    var hashConst = INIT_A;
+    function hashmix(value) {
+      value = (value ^ hashConst) >>> 0;
+      hashConst = Math.imul(hashConst, MULT_A) >>> 0;
+      value = Math.imul(value, hashConst) >>> 0;
+      return (value ^ (value >>> 16)) >>> 0;
+    }
+    function mix(x, y) {
+      var result = (Math.imul(MIX_MULT_L, x) - Math.imul(MIX_MULT_R, y)) >>> 0;
+      return (result ^ (result >>> 16)) >>> 0;
+    }
+    var pool = [];
+    for (var i = 0; i < POOL_SIZE; i++) pool.push(hashmix(i < entropy.length ? entropy[i] : 0));
+    for (var src = 0; src < POOL_SIZE; src++) {
+      for (var dst = 0; dst < POOL_SIZE; dst++) {
+        if (src !== dst) pool[dst] = mix(pool[dst], hashmix(pool[src]));
+      }
+    }
+    for (src = POOL_SIZE; src < entropy.length; src++) {
+      for (dst = 0; dst < POOL_SIZE; dst++) pool[dst] = mix(pool[dst], hashmix(entropy[src]));
+    }
+    var words = [], h = INIT_B;
+    for (i = 0; i < 8; i++) {
+      var value = (pool[i % POOL_SIZE] ^ h) >>> 0;
+      h = Math.imul(h, MULT_B) >>> 0;
+      value = Math.imul(value, h) >>> 0;
+      words.push((value ^ (value >>> 16)) >>> 0);
+    }
+    var state = [];
+    for (i = 0; i < 4; i++) state.push((BigInt(words[2 * i + 1]) << 32n) | BigInt(words[2 * i]));
+    return state;
+  }
+
+  var MASK64 = (1n << 64n) - 1n, MASK128 = (1n << 128n) - 1n;
+  var PCG_MULT = 0x2360ed051fc65da44385df649fccf645n;
+
+  function PCG64(seedState) {
+    var initState = (seedState[0] << 64n) | seedState[1];
+    var initSeq = (seedState[2] << 64n) | seedState[3];
+    this.inc = ((initSeq << 1n) | 1n) & MASK128;
+    this.state = 0n;
+    this.step();
+    this.state = (this.state + initState) & MASK128;
+    this.step();
+    this.hasUint32 = false;
+    this.uinteger = 0;
+  }
+
+  PCG64.prototype.step = function () {
+    this.state = (this.state * PCG_MULT + this.inc) & MASK128;
+  };
+
+  PCG64.prototype.nextUint64 = function () {
+    this.step();
+    var x = ((this.state >> 64n) ^ this.state) & MASK64;
+    var rot = this.state >> 122n;
+    return ((x >> rot) | (x << ((64n - rot) & 63n))) & MASK64;
+  };
+
+  PCG64.prototype.nextUint32 = function () {
+    if (this.hasUint32) {
+      this.hasUint32 = false;
+      return this.uinteger;
+    }
+    var next = this.nextUint64();
+    this.hasUint32 = true;
+    this.uinteger = Number(next >> 32n);
+    return Number(next & 0xffffffffn);
+  };
+
+  PCG64.prototype.uniform = function (low, high) {
+    return low + (high - low) * (Number(this.nextUint64() >> 11n) / 9007199254740992);
+  };
+
+  /** Generator.integers(low, high): Lemire's bounded draw on 32-bit outputs. */
+  PCG64.prototype.integers = function (low, high) {
+    var rng = high - 1 - low;
+    if (rng === 0) return low;
+    var excl = rng + 1;
+    var m = this.nextUint32() * excl;
+    var leftover = m % 4294967296;
+    if (leftover < excl) {
+      var threshold = (4294967295 - rng) % excl;
+      while (leftover < threshold) {
+        m = this.nextUint32() * excl;
+        leftover = m % 4294967296;
+      }
+    }
+    return low + Math.floor(m / 4294967296);
+  };
+
+  // --- SHA-256 (synchronous; crypto.subtle is unavailable on file:// and plain http) ---
+
+  var K = new Uint32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+  ]);
+
+  function sha256Hex(bytes) {
+    var len = bytes.length, padded = new Uint8Array(((len + 9 + 63) >> 6) << 6);
+    padded.set(bytes);
+    padded[len] = 0x80;
+    var view = new DataView(padded.buffer);
+    view.setUint32(padded.length - 8, Math.floor(len / 0x20000000));
+    view.setUint32(padded.length - 4, (len << 3) >>> 0);
+    var H = new Uint32Array([0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]);
+    var W = new Uint32Array(64);
+    function rotr(v, n) { return (v >>> n) | (v << (32 - n)); }
+    for (var off = 0; off < padded.length; off += 64) {
+      for (var i = 0; i < 16; i++) W[i] = view.getUint32(off + 4 * i);
+      for (i = 16; i < 64; i++) {
+        var s0 = rotr(W[i - 15], 7) ^ rotr(W[i - 15], 18) ^ (W[i - 15] >>> 3);
+        var s1 = rotr(W[i - 2], 17) ^ rotr(W[i - 2], 19) ^ (W[i - 2] >>> 10);
+        W[i] = W[i - 16] + s0 + W[i - 7] + s1;
+      }
+      var a = H[0], b = H[1], c = H[2], d = H[3], e = H[4], f = H[5], g = H[6], h = H[7];
+      for (i = 0; i < 64; i++) {
+        var t1 = (h + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) + K[i] + W[i]) >>> 0;
+        var t2 = ((rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) >>> 0;
+        h = g; g = f; f = e; e = (d + t1) >>> 0;
+        d = c; c = b; b = a; a = (t1 + t2) >>> 0;
+      }
+      H[0] += a; H[1] += b; H[2] += c; H[3] += d; H[4] += e; H[5] += f; H[6] += g; H[7] += h;
+    }
+    var hex = "";
+    for (i = 0; i < 8; i++) hex += ("00000000" + H[i].toString(16)).slice(-8);
+    return hex;
+  }
+
+  return {
+    fromBundle: function (bundle) { return new Forest(bundle); },
+    sha256Hex: sha256Hex,
+  };
+});
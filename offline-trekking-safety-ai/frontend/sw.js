@@ -0,0 +1,67 @@
+/**
+ * Trek Safety AI - service worker.
+ * Precaches the page, scripts and model bundle so the UI works with no network.
+ * The model bundle is network-first (a retrained model is picked up when
+ * online); other same-origin GETs (page, scripts) are stale-while-revalidate:
+ * served from the cache, refreshed in the background for the next load, so
+ * an updated app.js / model.js is picked up without renaming the cache.
+ * API calls pass through.
+ */
+
+const CACHE_NAME = "trek-safety-v2";
+const MODEL_URL = "model/risk_model.json";
+const PRECACHE = ["./", "index.html", "styles.css", "model.js", "app.js", MODEL_URL];
+
+self.addEventListener("install", function (event) {
+  event.waitUntil(
+    caches.open(CACHE_NAME)
+      .then(function (cache) { return cache.addAll(PRECACHE); })
+      .then(function () { return self.skipWaiting(); })
+  );
+});
+
+self.addEventListener("activate", function (event) {
+  event.waitUntil(
+    caches.keys()
+      .then(function (keys) {
+        return Promise.all(keys.filter(function (k) { return k !== CACHE_NAME; })
+          .map(function (k) { return caches.delete(k); }));
+      })
+      .then(function () { return self.clients.claim(); })
+  );
+});
+
+self.addEventListener("fetch", function (event) {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== "GET" || url.origin !== self.location.origin) return;
+
+  if (url.pathname.endsWith("/" + MODEL_URL)) {
+    event.respondWith(
+      fetch(request)
+        .then(function (res) {
+          if (res.ok) {
+            const copy = res.clone();
+            caches.open(CACHE_NAME).then(function (cache) { cache.put(request, copy); });
+          }
+          return res;
+        })
+        .catch(function () { return caches.match(request); })
+    );
+    return;
+  }
+  event.respondWith(
+    caches.open(CACHE_NAME).then(function (cache) {
+      return cache.match(request).then(function (cached) {
+        const refresh = fetch(request).then(function (res) {
+          if (res.ok) cache.put(request, res.clone());
+          return res;
+        });
+        if (!cached) return refresh;
+        // Keep the worker alive until the background refresh lands
+        event.waitUntil(refresh.catch(function () {}));
+        return cached;
+      });
+    })
+  );
+});
@@ -0,0 +1 @@
+# Geo package: route track ingest and (lat, lon) lookups for offline maps
@@ -0,0 +1,326 @@
+"""
+Route ingest: stream a GPX or GeoJSON track through the risk model (offline).
+
+The track is read point by point (GPX with iterparse, GeoJSON with a small
+incremental tokenizer), cut into fixed-length segments, and slope_angle /
+altitude_change are computed per segment as points arrive. Segments are
+scored in batches with predict_risk_batch, so memory stays bounded by the
+batch size however long the track is. Features the track cannot provide
+(weather, trail difficulty, path width, visibility) come from `conditions`.
+
+Run from project root:
+    python app_interface/cli.py --route maps/my_trek.gpx
+"""
+
+import codecs
+import math
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, FEATURE_RANGES, RISK_LEVELS
+
+TrackPoint = namedtuple("TrackPoint", ["lat", "lon", "ele"])
+Segment = namedtuple(
+    "Segment",
+    ["index", "start", "end", "start_m", "length_m", "altitude_change", "slope_angle"],
+)
+
+EARTH_RADIUS_M = 6371008.8
+DEFAULT_SEGMENT_LENGTH_M = 200.0
+DEFAULT_BATCH_SIZE = 256
+
+# Route-wide conditions used for the features a track does not contain
+DEFAULT_CONDITIONS = {
+    "weather_severity": 2,
+    "trail_difficulty": 2,
+    "path_width_m": 2.0,
+    "visibility_km": 8.0,
+}
+
+
+# --- Track readers (generators, one point at a time) ---
+
+def iter_gpx_points(f):
+    """Yield TrackPoints from a GPX file object (track and route points)."""
+    parents = []
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if tag in ("trkpt", "rtept"):
+            ele = next((c.text for c in elem if c.tag.rsplit("}", 1)[-1] == "ele"), None)
+            yield TrackPoint(float(elem.get("lat")), float(elem.get("lon")),
+                             float(ele) if ele is not None else None)
+            # Drop the finished point so the tree never grows with the track
+            if parents:
+                parents[-1].remove(elem)
+
+
+_JSON_TOKEN = re.compile(
+    r'"(?:[^"\\]|\\.)*"|-?\d+\.?\d*(?:[eE][+-]?\d*)?|[\[\]{}:,]|true|false|null|"|-'
+)
+
+
+def _json_tokens(f, chunk_size: int = 1 << 16):
+    """Tokenize JSON text from a file object chunk by chunk."""
+    buf = ""
+    # Incremental, so a multibyte character split across two chunks still decodes
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = f.read(chunk_size)
+        final = not chunk
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk, final=final)
+        buf += chunk
+        pos = 0
+        for m in _JSON_TOKEN.finditer(buf):
+            tok = m.group()
+            # A token touching the end of the buffer may continue in the next chunk
+            if not final and (tok in ('"', "-") or m.end() == len(buf)):
+                break
+            pos = m.end()
+            yield tok
+        buf = buf[pos:]
+        if final:
+            return
+
+
+def iter_geojson_points(f):
+    """
+    Yield TrackPoints from every "coordinates" array in a GeoJSON file
+    (LineString, MultiLineString, Feature or FeatureCollection), in order.
+    GeoJSON positions are [lon, lat] or [lon, lat, ele].
+    """
+    tokens = _json_tokens(f)
+    for tok in tokens:
+        if tok != '"coordinates"':
+            continue
+        depth = 0
+        position = []
+        for tok in tokens:
+            if tok == "[":
+                depth += 1
+                position = []
+            elif tok == "]":
+                depth -= 1
+                if len(position) >= 2:
+                    yield TrackPoint(position[1], position[0], position[2] if len(position) > 2 else None)
+                position = []
+                if depth == 0:
+                    break
+            elif tok not in (":", ","):
+                position.append(float(tok))
+
+
+def iter_track_points(path: str):
+    """Yield TrackPoints from a .gpx or .geojson/.json file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        reader = iter_gpx_points if ext == ".gpx" else iter_geojson_points
+        yield from reader(f)
+
+
+# --- Segmentation ---
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle distance in meters."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _clip(name: str, value: float) -> float:
+    lo, hi = FEATURE_RANGES[name]
+    return min(max(value, lo), hi)
+
+
+def iter_segments(points, segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M):
+    """
+    Cut a point stream into segments of segment_length_m (the last may be shorter).
+    Long steps are split by linear interpolation. Per segment:
+    altitude_change = net elevation change, slope_angle = atan(total climb and
+    descent / horizontal length) in degrees; both clipped to FEATURE_RANGES.
+    Missing elevations count as flat.
+    """
+    index = 0
+    start = prev = None
+    start_m = 0.0
+    seg_len = climb = 0.0
+    for point in points:
+        if point.ele is None:
+            point = point._replace(ele=prev.ele if prev is not None and prev.ele is not None else 0.0)
+        if prev is None:
+            start = prev = point
+            continue
+        step = haversine_m(prev.lat, prev.lon, point.lat, point.lon)
+        while step > 0 and seg_len + step >= segment_length_m:
+            # Cut at the exact segment boundary inside this step
+            t = (segment_length_m - seg_len) / step
+            cut = TrackPoint(prev.lat + t * (point.lat - prev.lat),
+                             prev.lon + t * (point.lon - prev.lon),
+                             prev.ele + t * (point.ele - prev.ele))
+            climb += abs(cut.ele - prev.ele)
+            yield _make_segment(index, start, cut, start_m, segment_length_m, climb)
+            index += 1
+            start_m += segment_length_m
+            start = prev = cut
+            seg_len = climb = 0.0
+            step -= step * t
+        seg_len += step
+        climb += abs(point.ele - prev.ele)
+        prev = point
+    if start is not None and seg_len > 0:
+        yield _make_segment(index, start, prev, start_m, seg_len, climb)
+
+
+def segment_terrain(length_m: float, climb: float, altitude_change: float) -> tuple:
+    """(slope_angle, altitude_change) of a stretch of track, clipped to FEATURE_RANGES."""
+    slope = math.degrees(math.atan2(climb, length_m)) if length_m > 0 else 0.0
+    return _clip("slope_angle", slope), _clip("altitude_change", altitude_change)
+
+
+def _make_segment(index, start, end, start_m, length_m, climb) -> Segment:
+    slope, altitude_change = segment_terrain(length_m, climb, end.ele - start.ele)
+    return Segment(
+        index=index,
+        start=start,
+        end=end,
+        start_m=start_m,
+        length_m=length_m,
+        altitude_change=altitude_change,
+        slope_angle=slope,
+    )
+
+
+def segment_features(segment: Segment, conditions: dict) -> dict:
+    """Model feature dict for one segment under the given route conditions."""
+    features = dict(conditions)
+    features["slope_angle"] = segment.slope_angle
+    features["altitude_change"] = segment.altitude_change
+    return {k: features[k] for k in FEATURE_COLUMNS}
+
+
+# --- Scoring ---
+
+def _batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_route_batches(
+    points,
+    conditions: dict = None,
+    segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+):
+    """Yield (segments, feature matrix) per batch of up to batch_size segments, not yet scored."""
+    from prediction.predictor import features_to_matrix
+
+    conds = {**DEFAULT_CONDITIONS, **(conditions or {})}
+    for batch in _batched(iter_segments(points, segment_length_m), batch_size):
+        yield batch, features_to_matrix([segment_features(seg, conds) for seg in batch])
+
+
+def scored_segments(batch, labels, proba, classes, reasons) -> list:
+    """One dict per segment of a batch, from predict_explain_batch's output for its matrix."""
+    probs = proba.tolist() if proba is not None else [[] for _ in batch]
+    return [
+        {
+            "index": seg.index,
+            "start": [seg.start.lat, seg.start.lon],
+            "end": [seg.end.lat, seg.end.lon],
+            "start_m": round(seg.start_m, 1),
+            "length_m": round(seg.length_m, 1),
+            "slope_angle": round(seg.slope_angle, 2),
+            "altitude_change": round(seg.altitude_change, 1),
+            "risk_level": str(label),
+            "confidence": dict(zip(classes, p)),
+            "reasons": why,
+        }
+        for seg, label, p, why in zip(batch, labels.tolist(), probs, reasons)
+    ]
+
+
+def iter_route_risk(
+    points,
+    conditions: dict = None,
+    segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+):
+    """Yield one scored dict per segment, scoring batch_size segments per model call."""
+    from prediction.explain import predict_explain_batch
+
+    for batch, X in iter_route_batches(points, conditions, segment_length_m, batch_size):
+        yield from scored_segments(batch, *predict_explain_batch(X))
+
+
+class RouteProfile:
+    """Running summary of a scored route (constant memory unless segments are kept)."""
+
+    def __init__(self, keep_segments: bool = False):
+        self.keep_segments = keep_segments
+        self.segments = []
+        self.n_segments = 0
+        self.distance_m = 0.0
+        self.ascent_m = 0.0
+        self.descent_m = 0.0
+        self.distance_by_level = {level: 0.0 for level in RISK_LEVELS}
+        self.count_by_level = {level: 0 for level in RISK_LEVELS}
+        self.riskiest = None
+
+    def add(self, scored: dict) -> None:
+        self.n_segments += 1
+        self.distance_m += scored["length_m"]
+        if scored["altitude_change"] > 0:
+            self.ascent_m += scored["altitude_change"]
+        else:
+            self.descent_m -= scored["altitude_change"]
+        level = scored["risk_level"]
+        self.distance_by_level[level] = self.distance_by_level.get(level, 0.0) + scored["length_m"]
+        self.count_by_level[level] = self.count_by_level.get(level, 0) + 1
+        p_high = scored["confidence"].get("High_Risk", 0.0)
+        if self.riskiest is None or p_high > self.riskiest["confidence"].get("High_Risk", 0.0):
+            self.riskiest = scored
+        if self.keep_segments:
+            self.segments.append(scored)
+
+    def summary(self) -> dict:
+        worst = next((lvl for lvl in reversed(RISK_LEVELS) if self.count_by_level.get(lvl)), None)
+        return {
+            "segments": self.n_segments,
+            "distance_m": round(self.distance_m, 1),
+            "ascent_m": round(self.ascent_m, 1),
+            "descent_m": round(self.descent_m, 1),
+            "overall_risk_level": worst,
+            "count_by_level": self.count_by_level,
+            "distance_by_level_m": {k: round(v, 1) for k, v in self.distance_by_level.items()},
+            "riskiest_segment": self.riskiest,
+        }
+
+
+def route_risk_profile(
+    path: str,
+    conditions: dict = None,
+    segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M,
+    keep_segments: bool = False,
+) -> RouteProfile:
+    """Score a whole track file and return its RouteProfile."""
+    profile = RouteProfile(keep_segments=keep_segments)
+    for scored in iter_route_risk(iter_track_points(path), conditions, segment_length_m):
+        profile.add(scored)
+    return profile
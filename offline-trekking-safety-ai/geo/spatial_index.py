@@ -0,0 +1,276 @@
+"""
+Offline spatial index over preloaded route segments: (lat, lon) -> segment -> risk.
+
+Segments from GPX / GeoJSON tracks (see geo/route_ingest.py) are bucketed
+into a regular lat/lon grid by their midpoint and stored, sorted by cell,
+as one .npy file per array under maps/segment_index/ with a meta.json;
+maps/segment_index is a symlink to the current version, swapped atomically
+on rebuild (prediction.compiled.publish_version_dir).
+Every entry keeps the segment's endpoints, model features and the risk
+(label + probabilities + reasons) cached at build time. The index is opened with
+np.load(mmap_mode="r"); a query looks at the query cell and its neighbours
+(growing outwards up to max_distance_m) and returns the nearest segment.
+
+Build from project root:
+    python geo/spatial_index.py maps/*.gpx maps/*.geojson
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, FEATURE_DTYPES, MAPS_DIR, SEGMENT_INDEX_DIRNAME
+from prediction.compiled import new_version_dir, publish_version_dir
+from geo.route_ingest import (
+    DEFAULT_CONDITIONS,
+    DEFAULT_SEGMENT_LENGTH_M,
+    EARTH_RADIUS_M,
+    iter_route_risk,
+    iter_track_points,
+)
+
+DEFAULT_CELL_DEG = 0.01          # ~1.1 km of latitude; keep > segment length
+DEFAULT_MAX_DISTANCE_M = 500.0
+# Largest search radius the API accepts (nearest() visits (2 * ring + 1)^2 cells)
+MAX_DISTANCE_LIMIT_M = 5000.0
+_KEY_OFFSET = 1 << 24
+_KEY_STRIDE = 1 << 26
+INDEX_ARRAYS = ("cell_keys", "cell_starts", "start", "end", "features", "risk_code",
+                "proba", "route_id", "segment_index")
+# Index into meta["reason_sets"]; absent in indexes built before reasons were cached
+OPTIONAL_INDEX_ARRAYS = ("reason_set",)
+
+
+def default_index_dir() -> str:
+    return os.path.join(PROJECT_ROOT, MAPS_DIR, SEGMENT_INDEX_DIRNAME)
+
+
+def _cell_key(lat, lon, cell_deg):
+    i = np.floor(np.asarray(lat) / cell_deg).astype(np.int64)
+    j = np.floor(np.asarray(lon) / cell_deg).astype(np.int64)
+    return (i + _KEY_OFFSET) * _KEY_STRIDE + (j + _KEY_OFFSET)
+
+
+def build_segment_index(
+    track_paths: list,
+    out_dir: str = None,
+    conditions: dict = None,
+    segment_length_m: float = DEFAULT_SEGMENT_LENGTH_M,
+    cell_deg: float = DEFAULT_CELL_DEG,
+) -> dict:
+    """Score every segment of the given tracks and write the index. Returns meta."""
+    from prediction.registry import get_registry
+
+    out_dir = out_dir or default_index_dir()
+    conds = {**DEFAULT_CONDITIONS, **(conditions or {})}
+    starts, ends, feats, probas, levels, route_ids, seg_ids = [], [], [], [], [], [], []
+    reason_ids, reason_sets = [], {}
+    classes = None
+    for route_id, path in enumerate(track_paths):
+        for seg in iter_route_risk(iter_track_points(path), conds, segment_length_m):
+            starts.append(seg["start"])
+            ends.append(seg["end"])
+            feats.append([seg[k] if k in seg else conds[k] for k in FEATURE_COLUMNS])
+            classes = list(seg["confidence"])
+            probas.append([seg["confidence"][c] for c in classes])
+            levels.append(seg["risk_level"])
+            route_ids.append(route_id)
+            seg_ids.append(seg["index"])
+            # Few distinct reason lists across a track: store each once
+            reason_ids.append(reason_sets.setdefault(tuple(seg["reasons"]), len(reason_sets)))
+    if not starts:
+        raise ValueError("No segments found in the given tracks")
+
+    meta = {
+        "segment_length_m": segment_length_m,
+        "classes": classes,
+        "routes": [os.path.basename(p) for p in track_paths],
+        "model_version": get_registry().get().version,
+        "reason_sets": [list(reasons) for reasons in reason_sets],
+    }
+    return write_segment_index(
+        out_dir,
+        start=np.array(starts, dtype=np.float64),
+        end=np.array(ends, dtype=np.float64),
+        features=np.array(feats, dtype=np.float64),
+        proba=np.array(probas, dtype=np.float64),
+        risk_code=np.array([classes.index(lv) for lv in levels], dtype=np.int8),
+        route_id=np.array(route_ids, dtype=np.int32),
+        segment_index=np.array(seg_ids, dtype=np.int32),
+        reason_set=np.array(reason_ids, dtype=np.int32),
+        meta=meta,
+        cell_deg=cell_deg,
+    )
+
+
+def write_segment_index(out_dir: str, meta: dict, cell_deg: float = DEFAULT_CELL_DEG, **entries) -> dict:
+    """
+    Bucket entries (start, end, features, proba, risk_code, route_id,
+    segment_index, optionally reason_set; one row per segment) by midpoint
+    cell, sort them by cell
+    and write one .npy per array plus meta.json into a new version directory
+    that replaces out_dir atomically. Returns the full meta.
+    """
+    mid = (entries["start"] + entries["end"]) / 2
+    keys = _cell_key(mid[:, 0], mid[:, 1], cell_deg)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    cell_keys, cell_starts = np.unique(keys, return_index=True)
+    arrays = {name: np.ascontiguousarray(arr[order]) for name, arr in entries.items()}
+    arrays["cell_keys"] = cell_keys
+    arrays["cell_starts"] = np.append(cell_starts, len(keys)).astype(np.int64)
+    meta = {**meta, "cell_deg": cell_deg, "segments": int(len(keys)),
+            "features": FEATURE_COLUMNS, "built_at": time.time()}
+
+    version_dir = new_version_dir(out_dir)
+    for name in INDEX_ARRAYS + OPTIONAL_INDEX_ARRAYS:
+        if name in arrays:
+            np.save(os.path.join(version_dir, name + ".npy"), arrays[name])
+    with open(os.path.join(version_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    # The server may have the previous version mapped: it is kept until the next rebuild
+    publish_version_dir(out_dir, version_dir)
+    return meta
+
+
+class SegmentIndex:
+    """Read-only, memory-mapped segment index with nearest-segment queries."""
+
+    def __init__(self, path: str, meta: dict, arrays: dict):
+        self.path = path
+        self.meta = meta
+        self.cell_deg = meta["cell_deg"]
+        self.classes = meta["classes"]
+        for name in INDEX_ARRAYS + OPTIONAL_INDEX_ARRAYS:
+            setattr(self, name, arrays.get(name))
+
+    @classmethod
+    def load(cls, path: str = None) -> "SegmentIndex":
+        path = path or default_index_dir()
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.isfile(meta_path):
+            raise FileNotFoundError(f"Segment index not found at {path}. Run geo/spatial_index.py first.")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in INDEX_ARRAYS}
+        for name in OPTIONAL_INDEX_ARRAYS:
+            if os.path.isfile(os.path.join(path, name + ".npy")):
+                arrays[name] = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        return cls(path, meta, arrays)
+
+    def __len__(self) -> int:
+        return int(self.meta["segments"])
+
+    def _candidates(self, lat: float, lon: float, ring: int) -> np.ndarray:
+        """Entry indices in the (2 * ring + 1)^2 cells around the query."""
+        i = math.floor(lat / self.cell_deg) + _KEY_OFFSET
+        j = math.floor(lon / self.cell_deg) + _KEY_OFFSET
+        offsets = np.arange(-ring, ring + 1)
+        wanted = ((i + offsets)[:, None] * _KEY_STRIDE + (j + offsets)[None, :]).ravel()
+        pos = np.searchsorted(self.cell_keys, wanted)
+        found = pos < len(self.cell_keys)
+        found[found] = self.cell_keys[pos[found]] == wanted[found]
+        pos = pos[found]
+        if len(pos) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.cell_starts[p], self.cell_starts[p + 1]) for p in pos])
+
+    def _distances_m(self, lat: float, lon: float, idx: np.ndarray) -> np.ndarray:
+        """Distance from the query to each candidate segment (local flat-earth projection)."""
+        kx = math.cos(math.radians(lat)) * math.radians(1.0) * EARTH_RADIUS_M
+        ky = math.radians(1.0) * EARTH_RADIUS_M
+        a = self.start[idx]
+        b = self.end[idx]
+        ax, ay = (a[:, 1] - lon) * kx, (a[:, 0] - lat) * ky
+        bx, by = (b[:, 1] - lon) * kx, (b[:, 0] - lat) * ky
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        px, py = ax + t * dx, ay + t * dy
+        return np.hypot(px, py)
+
+    def nearest(self, lat: float, lon: float, max_distance_m: float = DEFAULT_MAX_DISTANCE_M):
+        """Return (entry index, distance_m) of the nearest segment, or None if none within range."""
+        cell_m = self.cell_deg * math.radians(1.0) * EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 0.01)
+        # A segment can be up to half its length closer than its (bucketed) midpoint
+        margin = self.meta["segment_length_m"] / 2
+        max_ring = max(1, math.ceil((max_distance_m + margin) / cell_m))
+        ring = 1
+        while True:
+            idx = self._candidates(lat, lon, ring)
+            if len(idx):
+                dist = self._distances_m(lat, lon, idx)
+                best = int(np.argmin(dist))
+                # Midpoints outside the searched square are at least ring cells away
+                if dist[best] <= max_distance_m and (dist[best] <= ring * cell_m - margin or ring >= max_ring):
+                    return int(idx[best]), float(dist[best])
+            if ring >= max_ring:
+                return None
+            ring = min(ring * 2, max_ring)
+
+    def entry(self, i: int) -> dict:
+        """Cached features and risk (and reasons, if the index has them) for entry i."""
+        entry = {
+            "features": {
+                name: int(v) if FEATURE_DTYPES[name].startswith("int") else v
+                for name, v in zip(self.meta["features"], self.features[i].tolist())
+            },
+            "risk_level": self.classes[int(self.risk_code[i])],
+            "confidence": dict(zip(self.classes, self.proba[i].tolist())),
+            "route": self.meta["routes"][int(self.route_id[i])],
+            "segment_index": int(self.segment_index[i]),
+            "start": self.start[i].tolist(),
+            "end": self.end[i].tolist(),
+        }
+        if self.reason_set is not None:
+            entry["reasons"] = list(self.meta["reason_sets"][int(self.reason_set[i])])
+        return entry
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_segment_index() -> SegmentIndex:
+    """Process-wide index from maps/segment_index (raises FileNotFoundError if not built)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SegmentIndex.load()
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline segment index under maps/.")
+    parser.add_argument("tracks", nargs="+", help="GPX / GeoJSON track files")
+    parser.add_argument("--out", default=None, help="index directory (default maps/segment_index)")
+    parser.add_argument("--cell-deg", type=float, default=DEFAULT_CELL_DEG)
+    parser.add_argument("--segment-length", type=float, default=DEFAULT_SEGMENT_LENGTH_M)
+    parser.add_argument("--weather-severity", type=int, default=DEFAULT_CONDITIONS["weather_severity"])
+    parser.add_argument("--trail-difficulty", type=int, default=DEFAULT_CONDITIONS["trail_difficulty"])
+    parser.add_argument("--path-width", type=float, default=DEFAULT_CONDITIONS["path_width_m"])
+    parser.add_argument("--visibility", type=float, default=DEFAULT_CONDITIONS["visibility_km"])
+    args = parser.parse_args()
+    conditions = {
+        "weather_severity": args.weather_severity,
+        "trail_difficulty": args.trail_difficulty,
+        "path_width_m": args.path_width,
+        "visibility_km": args.visibility,
+    }
+    meta = build_segment_index(args.tracks, args.out, conditions, args.segment_length, args.cell_deg)
+    print(f"Indexed {meta['segments']} segments from {len(meta['routes'])} tracks "
+          f"(model {meta['model_version']}) into {args.out or default_index_dir()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bounded LRU cache with optional TTL for deterministic predictions (offline).
+
+Used by /predict-by-location: the same location always gives the same
+features and, for a given model version, the same prediction. Keys include
+the model version, so a stale entry can never be served; the cache is also
+cleared when the registry swaps in a new model to free the old entries.
+Hit / miss / eviction counts are available from stats().
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache holding at most `maxsize` entries.
+    With `ttl` (seconds), entries older than ttl count as misses and are dropped.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, stored_at = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, or compute(), cache and return it."""
+        value = self.get(key)
+        if value is None:
+            # Computed outside the lock; two racing misses just compute twice
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self, *_args) -> None:
+        """Drop every entry (extra args are ignored so it can be a registry listener)."""
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
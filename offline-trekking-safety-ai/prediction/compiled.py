@@ -0,0 +1,458 @@
+"""
+Compiled flat-array inference for the tree risk models (offline).
+
+compile_model() flattens a fitted DecisionTreeClassifier or
+RandomForestClassifier into a few contiguous NumPy arrays (one node table for
+all trees). CompiledForest.predict() walks every tree for every row at once and
+returns labels and probabilities from that single traversal, without
+sklearn's per-call input validation. Results match sklearn bit for bit:
+inputs are cast to float32 as sklearn does, and per-tree probabilities are
+summed in tree order before dividing by the number of trees.
+Per-node path contributions are compiled and saved alongside, so
+predict_with_contributions() explains a batch in the same traversal
+(see prediction/explain.py).
+
+For servers with several worker processes, save_mapped() also writes every
+array the forest reads (including the traversal and per-class contribution
+tables otherwise derived at load time) as plain .npy files; load_mapped_for()
+maps them read-only, so all workers share one copy in the page cache.
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import MODEL_DIR, DEFAULT_COMPILED_FILENAME, DEFAULT_MAPPED_DIRNAME
+
+MAPPED_META_FILENAME = "meta.json"
+
+
+class CompiledForest:
+    """
+    Node arrays for a forest of binary trees, concatenated tree after tree.
+    feature / threshold / left / right: one entry per node; leaves point to
+    themselves so a fixed number of steps (the tree depth) always ends on a leaf.
+    value: (n_nodes, n_classes) class distribution of every node.
+    roots / depths: root node index and depth of each tree.
+    children / feature_index / class_contributions: the derived lookup tables,
+    when already computed (e.g. memory-mapped by load_mapped_for).
+    """
+
+    # Above this many rows, walk one tree at a time (less memory, better locality)
+    PER_TREE_MIN_ROWS = 256
+
+    def __init__(self, feature, threshold, left, right, value, roots, depths,
+                 classes, features, contributions=None, children=None, feature_index=None,
+                 class_contributions=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.depths = np.ascontiguousarray(depths, dtype=np.int32)
+        self.classes = [str(c) for c in classes]
+        self.features = list(features)
+        # (n_nodes, n_features, n_classes) path contributions, see path_contributions()
+        self.contributions = None if contributions is None else np.ascontiguousarray(contributions, dtype=np.float64)
+        self._class_contributions = {}
+        if class_contributions is not None:
+            # (n_classes, n_nodes, n_features): each class's table is a contiguous view
+            self._class_contributions = {k: class_contributions[k] for k in range(len(class_contributions))}
+        self.max_depth = int(self.depths.max()) if len(self.depths) else 0
+        self._classes_arr = np.array(self.classes, dtype=object)
+        # Traversal tables: [left, right] pairs per node so a step is one take()
+        if children is None:
+            children = np.stack([self.left, self.right], axis=1).ravel()
+        self._children = np.ascontiguousarray(children, dtype=np.intp)
+        self._feature = np.ascontiguousarray(self.feature if feature_index is None else feature_index, dtype=np.intp)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node index for every (tree, row): shape (n_trees, n_rows)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        row_offset = np.arange(n_rows, dtype=np.intp) * n_features
+        if n_rows < self.PER_TREE_MIN_ROWS:
+            # Few rows: step all trees together, max_depth vectorised steps in total
+            idx = np.repeat(self.roots.astype(np.intp)[:, None], n_rows, axis=1)
+            return self._descend(idx, flat_x, row_offset[None, :], self.max_depth)
+        leaves = np.empty((self.n_trees, n_rows), dtype=np.intp)
+        for t in range(self.n_trees):
+            idx = np.full(n_rows, self.roots[t], dtype=np.intp)
+            leaves[t] = self._descend(idx, flat_x, row_offset, self.depths[t])
+        return leaves
+
+    def _descend(self, idx, flat_x, row_offset, steps) -> np.ndarray:
+        for _ in range(steps):
+            # sklearn goes left when x <= threshold, so "go right" is x > threshold
+            go_right = flat_x.take(row_offset + self._feature.take(idx)) > self.threshold.take(idx)
+            idx = self._children.take(2 * idx + go_right)
+        return idx
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Mean class distribution over trees: shape (n_rows, n_classes)."""
+        return self._proba(self.apply(X))
+
+    def _proba(self, leaves) -> np.ndarray:
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        # Sum tree by tree (same order as sklearn) so rounding is identical
+        for t in range(leaves.shape[0]):
+            proba += self.value[leaves[t]]
+        proba /= leaves.shape[0]
+        return proba
+
+    def predict(self, X) -> tuple:
+        """Return (labels, probabilities) from one traversal of the forest."""
+        proba = self.predict_proba(X)
+        labels = self._classes_arr.take(np.argmax(proba, axis=1))
+        return labels, proba
+
+    def predict_with_contributions(self, X, class_index: int = None) -> tuple:
+        """
+        (labels, probabilities, contributions) from one traversal. contributions
+        has shape (n_rows, n_features, n_classes): how much each feature's splits
+        moved the class distribution from the root's, averaged over trees.
+        With class_index, only that class's column: (n_rows, n_features).
+        """
+        leaves = self.apply(X)
+        contrib = self._contributions(leaves, class_index)
+        proba = self._proba(leaves)
+        return self._classes_arr.take(np.argmax(proba, axis=1)), proba, contrib
+
+    def contributions_for(self, X, class_index: int = None) -> np.ndarray:
+        """Only the contributions of predict_with_contributions (labels come from elsewhere)."""
+        return self._contributions(self.apply(X), class_index)
+
+    def _contributions(self, leaves: np.ndarray, class_index: int = None) -> np.ndarray:
+        if self.contributions is None:
+            raise ValueError("This compiled model has no path contributions; recompile it")
+        if class_index is None:
+            table = self.contributions
+        else:
+            table = self._class_contributions.get(class_index)
+            if table is None:
+                table = self._class_contributions[class_index] = np.ascontiguousarray(
+                    self.contributions[:, :, class_index]
+                )
+        contrib = np.zeros((leaves.shape[1],) + table.shape[1:], dtype=np.float64)
+        for t in range(leaves.shape[0]):
+            contrib += table[leaves[t]]
+        contrib /= leaves.shape[0]
+        return contrib
+
+    def to_arrays(self) -> dict:
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "depths": self.depths,
+            "classes": np.array(self.classes, dtype=str),
+            "features": np.array(self.features, dtype=str),
+        }
+        if self.contributions is not None:
+            arrays["contributions"] = self.contributions
+        return arrays
+
+    def mapped_arrays(self) -> dict:
+        """to_arrays() plus the tables derived at load time, for save_mapped()."""
+        arrays = self.to_arrays()
+        arrays["children"] = self._children
+        arrays["feature_index"] = self._feature
+        if self.contributions is not None:
+            arrays["class_contributions"] = np.ascontiguousarray(self.contributions.transpose(2, 0, 1))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CompiledForest":
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            depths=arrays["depths"],
+            classes=arrays["classes"].tolist(),
+            features=arrays["features"].tolist(),
+            contributions=arrays["contributions"] if "contributions" in arrays else None,
+            children=arrays["children"] if "children" in arrays else None,
+            feature_index=arrays["feature_index"] if "feature_index" in arrays else None,
+            class_contributions=arrays["class_contributions"] if "class_contributions" in arrays else None,
+        )
+
+
+def path_contributions(feature, left, right, value, roots, n_features) -> np.ndarray:
+    """
+    For every node, the change in class distribution from its tree's root to
+    that node, split by the feature of each split on the way:
+    (n_nodes, n_features, n_classes). Leaf entries decompose a tree's
+    prediction as value[root] + sum over features (Saabas' method).
+    Filled level by level from the roots, one vectorised step per depth.
+    """
+    contrib = np.zeros((len(feature), n_features, value.shape[1]), dtype=np.float64)
+    frontier = np.asarray(roots, dtype=np.intp)
+    ids = np.arange(len(feature))
+    while len(frontier):
+        parents = frontier[left[frontier] != ids[frontier]]  # leaves point to themselves
+        children = np.concatenate([left[parents], right[parents]])
+        parents = np.concatenate([parents, parents])
+        contrib[children] = contrib[parents]
+        contrib[children, feature[parents]] += value[children] - value[parents]
+        frontier = children
+    return contrib
+
+
+def _tree_values(tree) -> np.ndarray:
+    """Per-node class distribution exactly as the tree's predict_proba returns it."""
+    value = np.asarray(tree.value[:, 0, :], dtype=np.float64)
+    # sklearn >= 1.4 stores fractions; older versions store counts and
+    # normalise at predict time. Counts at the root sum to the sample count.
+    if value[0].sum() > 1.0 + 1e-9:
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer
+    return value
+
+
+def compile_model(model, features) -> CompiledForest:
+    """
+    Flatten a fitted DecisionTreeClassifier or RandomForestClassifier.
+    Raises TypeError for other estimators (callers fall back to sklearn).
+    """
+    if hasattr(model, "estimators_"):
+        trees = [est.tree_ for est in model.estimators_]
+    elif hasattr(model, "tree_"):
+        trees = [model.tree_]
+    else:
+        raise TypeError(f"Cannot compile {type(model).__name__}: not a tree model")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("Only single-output classifiers can be compiled")
+
+    feature, threshold, left, right, value, roots, depths = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        n = tree.node_count
+        ids = np.arange(n)
+        is_leaf = tree.children_left == -1
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        left.append(np.where(is_leaf, ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, ids, tree.children_right) + offset)
+        value.append(_tree_values(tree))
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += n
+
+    feature, left, right, value = (np.concatenate(a) for a in (feature, left, right, value))
+    return CompiledForest(
+        feature=feature,
+        threshold=np.concatenate(threshold),
+        left=left,
+        right=right,
+        value=value,
+        roots=np.array(roots),
+        depths=np.array(depths),
+        classes=model.classes_,
+        features=features,
+        contributions=path_contributions(feature, left, right, value, roots, len(features)),
+    )
+
+
+def default_compiled_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_COMPILED_FILENAME)
+
+
+def save_compiled(compiled: CompiledForest, path: str = None, source_sha256: str = None) -> str:
+    """
+    Write node arrays to an .npz file (no pickled objects), via a temp file.
+    source_sha256: SHA-256 of the pickle the forest was compiled from; lets
+    the registry serve from the .npz without unpickling (see load_compiled_for).
+    """
+    path = path or default_compiled_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = compiled.to_arrays()
+    if source_sha256:
+        arrays["source_sha256"] = np.array(source_sha256, dtype=str)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_compiled(path: str = None) -> CompiledForest:
+    """Load a compiled forest; needs only NumPy (no sklearn import)."""
+    path = path or default_compiled_path()
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Compiled model not found at {path}. Run training/train_model.py first.")
+    with np.load(path, allow_pickle=False) as arrays:
+        return CompiledForest.from_arrays(arrays)
+
+
+def load_compiled_for(source_sha256: str, path: str = None):
+    """
+    The compiled forest at `path` if it was compiled from the pickle with this
+    SHA-256, else None (missing, unreadable, or compiled from another model).
+    """
+    import zipfile
+
+    path = path or default_compiled_path()
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            if "source_sha256" not in arrays.files or str(arrays["source_sha256"]) != source_sha256:
+                return None
+            return CompiledForest.from_arrays(arrays)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def default_mapped_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MAPPED_DIRNAME)
+
+
+def save_mapped(compiled: CompiledForest, path: str = None, source_sha256: str = None) -> str:
+    """
+    Write the forest as a directory of .npy files plus meta.json, for
+    load_mapped_for(). `path` is a symlink to a versioned directory
+    (`<path>.<hex time>`): the new version is written in full, then the link
+    is swapped with one rename, so readers always see a complete directory.
+    Files are never rewritten in place and the previous version is kept, so
+    workers still mapping an older model are unaffected; older ones are removed.
+    """
+    path = path or default_mapped_path()
+    version_dir = new_version_dir(path)
+    arrays = compiled.mapped_arrays()
+    meta = {
+        "source_sha256": source_sha256,
+        "classes": arrays.pop("classes").tolist(),
+        "features": arrays.pop("features").tolist(),
+        "arrays": sorted(arrays),
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(version_dir, name + ".npy"), arr)
+    with open(os.path.join(version_dir, MAPPED_META_FILENAME), "w") as f:
+        json.dump(meta, f, indent=2)
+    publish_version_dir(path, version_dir)
+    return path
+
+
+def new_version_dir(path: str) -> str:
+    """Create an empty `<path>.<hex time>` directory to write the next version of `path` into."""
+    version_dir = f"{path}.{time.time_ns():x}"
+    os.makedirs(version_dir)
+    return version_dir
+
+
+def publish_version_dir(path: str, version_dir: str, keep: int = 2) -> None:
+    """
+    Point the `path` symlink at a fully written version_dir with one rename,
+    so readers see the old or the new directory and never a missing one,
+    then remove all but the newest `keep` versions.
+    """
+    link_tmp = path + ".link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Plain directory from before versioning: move it aside (as the oldest version)
+        os.replace(path, f"{path}.0")
+    os.replace(link_tmp, path)
+    _prune_versions(path, keep)
+
+
+def _prune_versions(path: str, keep: int) -> None:
+    """Remove all but the newest `keep` versioned directories behind the `path` link."""
+    parent, name = os.path.split(path)
+    versions = []
+    for entry in os.listdir(parent or "."):
+        prefix, _, suffix = entry.rpartition(".")
+        if prefix != name:
+            continue
+        try:
+            versions.append((int(suffix, 16), os.path.join(parent, entry)))
+        except ValueError:
+            continue
+    for _, old in sorted(versions)[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def load_mapped_for(source_sha256: str, path: str = None):
+    """
+    The forest in the mapped directory at `path`, with every array a read-only
+    memory map (shared between processes, nothing copied), if it was saved for
+    the pickle with this SHA-256; else None.
+    """
+    path = path or default_mapped_path()
+    try:
+        with open(os.path.join(path, MAPPED_META_FILENAME)) as f:
+            meta = json.load(f)
+        if meta.get("source_sha256") != source_sha256:
+            return None
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in meta["arrays"]}
+    except (OSError, ValueError, KeyError):
+        return None
+    arrays["classes"] = np.array(meta["classes"], dtype=str)
+    arrays["features"] = np.array(meta["features"], dtype=str)
+    return CompiledForest.from_arrays(arrays)
+
+
+def check_matches_model(compiled: CompiledForest, model, X) -> None:
+    """Raise AssertionError unless compiled output equals sklearn's exactly."""
+    labels, proba = compiled.predict(X)
+    expected_proba = model.predict_proba(X)
+    expected_labels = model.predict(X)
+    if not np.array_equal(proba, expected_proba):
+        raise AssertionError("Compiled probabilities differ from the sklearn model")
+    if not np.array_equal(labels.astype(str), np.asarray(expected_labels).astype(str)):
+        raise AssertionError("Compiled labels differ from the sklearn model")
+
+
+def main():
+    """Compile the saved pickle (model/risk_model.pkl) and verify it on the raw dataset."""
+    import argparse
+    import pickle
+    import pandas as pd
+    from config.schema import DEFAULT_MODEL_FILENAME, RAW_DATA_DIR
+
+    import hashlib
+
+    parser = argparse.ArgumentParser(description="Compile the saved model to flat node arrays.")
+    parser.add_argument("--mapped", action="store_true",
+                        help="also write the memory-mapped copy shared by server workers")
+    args = parser.parse_args()
+    with open(os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME), "rb") as f:
+        blob = f.read()
+    payload = pickle.loads(blob)
+    compiled = compile_model(payload["model"], payload["features"])
+    df = pd.read_csv(os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+    check_matches_model(compiled, payload["model"], df[payload["features"]])
+    print(f"{compiled.n_trees} trees, {compiled.n_nodes} nodes; matches sklearn on {len(df)} rows")
+    sha256 = hashlib.sha256(blob).hexdigest()
+    print("Compiled model saved to", save_compiled(compiled, source_sha256=sha256))
+    if args.mapped:
+        print("Mapped model saved to", save_mapped(compiled, source_sha256=sha256))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Model-aware explanations from path-based feature contributions (offline).
+
+Every node of the compiled forest stores how the class distribution changed
+from its tree's root to that node, split by the feature tested on the way
+(prediction.compiled.path_contributions); the arrays are saved with the
+compiled model. Summing the leaf entries over trees tells, for each row, how
+much each feature moved the prediction away from the training prior, so
+explaining a batch costs no more than the traversal that predicts it.
+
+Reasons are the features whose splits raised the probability of risk (every
+class other than Safe) by at least min_contribution, largest first. A reason
+uses its rule text from app_interface/cli.py only when the row also meets that
+rule's condition ("Severe weather ..." needs weather_severity >= 4); otherwise
+it is worded neutrally ("Weather conditions add to risk"). When the model has no
+contributions (not a tree model, or a compiled file from before they were
+added), the rule-based explain_risk_batch is used instead.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import RISK_LEVELS
+from config.validation import get_validator
+from app_interface.cli import EXPLANATION_RULES, explain_risk_batch
+from prediction.metrics import stage_timer
+from prediction.predictor import features_to_matrix, predict_risk_batch
+from prediction.registry import get_registry
+
+# Smallest rise in risk probability (0-1) that is worth a reason
+MIN_CONTRIBUTION = 0.05
+
+# Rule text per feature, used only for rows that meet the rule: (op, threshold, text)
+REASON_RULES = {rule[0]: (rule[1], rule[2], rule[4]) for rule in EXPLANATION_RULES}
+# Wording when the rule does not hold for the row, or the feature has no rule
+NEUTRAL_REASONS = {
+    "slope_angle": "Slope angle adds to risk",
+    "altitude_change": "Altitude change adds to risk",
+    "weather_severity": "Weather conditions add to risk",
+    "trail_difficulty": "Trail difficulty adds to risk",
+    "path_width_m": "Path width adds to risk",
+    "visibility_km": "Visibility adds to risk",
+}
+_COMPARISONS = {">": np.greater, ">=": np.greater_equal, "<": np.less}
+
+
+def reason_text(feature: str, rule_holds: bool) -> str:
+    if rule_holds:
+        return REASON_RULES[feature][2]
+    return NEUTRAL_REASONS.get(feature, f"{feature} adds to risk")
+
+
+def rules_hold(X: np.ndarray, features) -> np.ndarray:
+    """(n_rows, n_features) bool: the feature's rule condition holds for the row."""
+    holds = np.zeros(X.shape, dtype=bool)
+    for j, name in enumerate(features):
+        if name in REASON_RULES:
+            op, threshold, _text = REASON_RULES[name]
+            holds[:, j] = _COMPARISONS[op](X[:, j], threshold)
+    return holds
+
+
+def ranked_reasons(risk: np.ndarray, X: np.ndarray, features, min_contribution: float = MIN_CONTRIBUTION,
+                   max_reasons: int = None) -> list:
+    """
+    Reason texts per row for features with risk contribution >= min_contribution,
+    largest first, worded by whether the row (X, same columns as risk) meets
+    each feature's rule. Rows are grouped by their ranked feature list and
+    wording (encoded as one integer), so each distinct list is built only once.
+    """
+    n_features = risk.shape[1]
+    order = np.argsort(-risk, axis=1, kind="stable")
+    keep = np.take_along_axis(risk, order, axis=1) >= min_contribution
+    if max_reasons is not None:
+        keep[:, max_reasons:] = False
+    holds = np.take_along_axis(rules_hold(X, features), order, axis=1)
+    # Base-(2 * n_features + 1) digits: rank r holds 2 * feature index + 1 (+ 1 if
+    # its rule holds), or 0 when not kept
+    digits = np.where(keep, 2 * order + 1 + holds, 0).astype(np.int64)
+    codes = digits @ (2 * n_features + 1) ** np.arange(n_features, dtype=np.int64)
+    _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    by_code = [
+        [reason_text(features[f], h) for f, h in zip(order[i][keep[i]].tolist(), holds[i][keep[i]].tolist())]
+        for i in first.tolist()
+    ]
+    return [by_code[i] for i in inverse.ravel().tolist()]
+
+
+def predict_explain_batch(features, min_contribution: float = MIN_CONTRIBUTION,
+                          validation: str = None) -> tuple:
+    """
+    Like predict_risk_batch, plus ranked reasons per row from the same traversal:
+    (labels, probabilities or None, class names, reasons). Rows with no reason
+    get an empty list. validation is as for predict_risk_batch. With a lookup
+    table loaded, labels and probabilities come from the table (as in
+    predict_risk_batch) and the forest is walked only for the contributions.
+    """
+    loaded = get_registry().get()
+    compiled = loaded.compiled
+    X = features_to_matrix(features, loaded.features)
+    if validation:
+        X, _ = get_validator(loaded.features).validate(X, validation)
+    if compiled is None or compiled.contributions is None or RISK_LEVELS[0] not in compiled.classes:
+        labels, proba, classes = predict_risk_batch(X)
+        with stage_timer("explain"):
+            reasons = explain_risk_batch(X, loaded.features)
+        return labels, proba, classes, reasons
+    safe = compiled.classes.index(RISK_LEVELS[0])
+    if loaded.table is not None:
+        # Table mode: labels and probabilities by cell lookup, the forest only for reasons
+        with stage_timer("predict"):
+            labels, proba = loaded.table.predict(X)
+        with stage_timer("explain"):
+            safe_contrib = compiled.contributions_for(X, class_index=safe)
+            reasons = ranked_reasons(-safe_contrib, X, compiled.features, min_contribution)
+        return labels, proba, loaded.table.classes, reasons
+    with stage_timer("predict"):
+        labels, proba, safe_contrib = compiled.predict_with_contributions(X, class_index=safe)
+    with stage_timer("explain"):
+        # Each node's distribution sums to 1, so risk gained (any non-Safe class) is Safe lost
+        reasons = ranked_reasons(-safe_contrib, X, compiled.features, min_contribution)
+    return labels, proba, compiled.classes, reasons
@@ -0,0 +1,259 @@
+"""
+Optional table mode: the forest precomputed over its own split grid (offline).
+
+A tree ensemble is piecewise constant: its output only changes where some
+split threshold is crossed. The sorted thresholds of each feature cut its axis
+into intervals, and every combination of intervals (a cell) has one fixed
+prediction, so the whole model is a lookup table over the cells. Prediction is
+then one searchsorted per feature and one array index, exact for every input
+(no interpolation is needed inside a cell, the model is flat there).
+
+The number of cells is the product over features of (thresholds + 1), which
+grows quickly with forest size; build_table() refuses beyond max_cells and the
+predictor keeps using the compiled forest. The table is saved next to the model
+tagged with the pickle's SHA-256; prediction.registry loads it only when it
+matches the served model.
+
+Run from project root:
+    python prediction/lookup_table.py                  # build for the saved model
+    python prediction/lookup_table.py --max-cells 5000000
+    python training/train_model.py --lookup-table      # build at training time
+"""
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_RANGES, MODEL_DIR, DEFAULT_TABLE_FILENAME
+from prediction.compiled import CompiledForest
+
+# ~24 MB of float64 probabilities for three classes
+DEFAULT_MAX_CELLS = 1_000_000
+_BUILD_CHUNK_ROWS = 65_536
+
+
+class TableTooLarge(ValueError):
+    """The model's split grid has more cells than allowed."""
+
+
+class LookupTable:
+    """
+    edges: sorted split thresholds per feature (FEATURE order).
+    labels: class code per cell; proba: (n_cells, n_classes) per cell.
+    Cells are in C order over the per-feature interval indices.
+    """
+
+    def __init__(self, edges, labels, proba, classes, features):
+        self.edges = [np.ascontiguousarray(e, dtype=np.float64) for e in edges]
+        self.shape = tuple(len(e) + 1 for e in self.edges)
+        self.labels = np.ascontiguousarray(labels, dtype=np.uint8)
+        self.proba = np.ascontiguousarray(proba, dtype=np.float64)
+        self.classes = [str(c) for c in classes]
+        self.features = list(features)
+        self._classes_arr = np.array(self.classes, dtype=object)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return self.labels.nbytes + self.proba.nbytes + sum(e.nbytes for e in self.edges)
+
+    def cells(self, X) -> np.ndarray:
+        """Flat cell index per row."""
+        # Same comparison as the forest: inputs as float32, "right" when x > threshold
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        X = X.astype(np.float64)
+        idx = [np.searchsorted(edges, X[:, f], side="left") for f, edges in enumerate(self.edges)]
+        return np.ravel_multi_index(idx, self.shape)
+
+    def predict(self, X) -> tuple:
+        """(labels, probabilities), the same as CompiledForest.predict."""
+        cells = self.cells(X)
+        return self._classes_arr.take(self.labels[cells]), self.proba[cells]
+
+    def to_arrays(self) -> dict:
+        arrays = {f"edges_{f}": e for f, e in enumerate(self.edges)}
+        arrays.update(
+            labels=self.labels,
+            proba=self.proba,
+            classes=np.array(self.classes, dtype=str),
+            features=np.array(self.features, dtype=str),
+        )
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "LookupTable":
+        features = arrays["features"].tolist()
+        return cls(
+            edges=[arrays[f"edges_{f}"] for f in range(len(features))],
+            labels=arrays["labels"],
+            proba=arrays["proba"],
+            classes=arrays["classes"].tolist(),
+            features=features,
+        )
+
+
+def split_edges(compiled: CompiledForest) -> list:
+    """Sorted distinct split thresholds of each feature."""
+    internal = compiled.left != np.arange(compiled.n_nodes)
+    return [
+        np.unique(compiled.threshold[internal & (compiled.feature == f)])
+        for f in range(len(compiled.features))
+    ]
+
+
+def table_cells(edges) -> int:
+    return int(np.prod([len(e) + 1 for e in edges], dtype=object))
+
+
+def interval_representatives(edges: np.ndarray) -> np.ndarray:
+    """
+    One float32 value inside each interval: the largest float32 <= each edge,
+    then the smallest float32 above the last edge.
+    """
+    below = edges.astype(np.float32)
+    below = np.where(below.astype(np.float64) > edges, np.nextafter(below, np.float32(-np.inf)), below)
+    if len(edges):
+        last = np.float32(edges[-1])
+        if float(last) <= edges[-1]:
+            last = np.nextafter(last, np.float32(np.inf))
+        values = np.append(below, last)
+    else:
+        values = np.zeros(1, dtype=np.float32)
+    if not np.array_equal(np.searchsorted(edges, values.astype(np.float64), side="left"), np.arange(len(values))):
+        raise ValueError("Split thresholds closer than float32 resolution; cannot tabulate")
+    return values
+
+
+def build_table(compiled: CompiledForest, max_cells: int = DEFAULT_MAX_CELLS) -> LookupTable:
+    """Evaluate the forest once per cell. Raises TableTooLarge beyond max_cells."""
+    edges = split_edges(compiled)
+    n_cells = table_cells(edges)
+    if n_cells > max_cells:
+        raise TableTooLarge(f"Split grid has {n_cells:,} cells (limit {max_cells:,})")
+    reps = [interval_representatives(e) for e in edges]
+    shape = tuple(len(r) for r in reps)
+    labels = np.empty(n_cells, dtype=np.uint8)
+    proba = np.empty((n_cells, len(compiled.classes)), dtype=np.float64)
+    codes = {c: i for i, c in enumerate(compiled.classes)}
+    for start in range(0, n_cells, _BUILD_CHUNK_ROWS):
+        flat = np.arange(start, min(start + _BUILD_CHUNK_ROWS, n_cells))
+        idx = np.unravel_index(flat, shape)
+        X = np.column_stack([r[i] for r, i in zip(reps, idx)])
+        chunk_labels, chunk_proba = compiled.predict(X)
+        labels[flat] = [codes[c] for c in chunk_labels.tolist()]
+        proba[flat] = chunk_proba
+    return LookupTable(edges, labels, proba, compiled.classes, compiled.features)
+
+
+def check_agrees(table: LookupTable, compiled: CompiledForest, X) -> None:
+    """Raise AssertionError unless the table gives exactly the forest's output on X."""
+    labels, proba = table.predict(X)
+    expected_labels, expected_proba = compiled.predict(X)
+    if not np.array_equal(proba, expected_proba):
+        raise AssertionError("Table probabilities differ from the compiled forest")
+    if not np.array_equal(labels.astype(str), expected_labels.astype(str)):
+        raise AssertionError("Table labels differ from the compiled forest")
+
+
+def default_table_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_TABLE_FILENAME)
+
+
+def save_table(table: LookupTable, path: str = None, source_sha256: str = None) -> str:
+    """Write the table to an .npz (temp file, then rename), tagged with the model's hash."""
+    path = path or default_table_path()
+    arrays = table.to_arrays()
+    if source_sha256:
+        arrays["source_sha256"] = np.array(source_sha256, dtype=str)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_table_for(source_sha256: str, path: str = None):
+    """The table at `path` if it was built from the pickle with this SHA-256, else None."""
+    path = path or default_table_path()
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            if "source_sha256" not in arrays.files or str(arrays["source_sha256"]) != source_sha256:
+                return None
+            return LookupTable.from_arrays(arrays)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def build_and_save(compiled: CompiledForest, source_sha256: str, X=None,
+                   max_cells: int = DEFAULT_MAX_CELLS, path: str = None) -> dict:
+    """
+    Build, verify and save the table for a model; report cells, size and build
+    time. If the grid is too large, any old table is removed (the predictor
+    then uses the forest) and the report has "table": False.
+    """
+    path = path or default_table_path()
+    edges = split_edges(compiled)
+    report = {"cells": table_cells(edges), "max_cells": max_cells}
+    t0 = time.perf_counter()
+    try:
+        table = build_table(compiled, max_cells)
+    except TableTooLarge:
+        if os.path.exists(path):
+            os.remove(path)
+        return {**report, "table": False}
+    report["build_seconds"] = time.perf_counter() - t0
+    rng = np.random.default_rng(0)
+    lo, hi = np.array([FEATURE_RANGES[f] for f in compiled.features], dtype=np.float64).T
+    probe = rng.uniform(lo - 0.1 * (hi - lo), hi + 0.1 * (hi - lo), size=(100_000, len(lo)))
+    check_agrees(table, compiled, probe)
+    if X is not None:
+        check_agrees(table, compiled, X)
+    save_table(table, path, source_sha256)
+    return {**report, "table": True, "bytes": table.nbytes, "path": path}
+
+
+def print_report(report: dict) -> None:
+    if not report["table"]:
+        print(f"Lookup table skipped: {report['cells']:,} cells exceeds {report['max_cells']:,}; "
+              "the compiled forest is used")
+        return
+    print(f"Lookup table saved to {report['path']}: {report['cells']:,} cells, "
+          f"{report['bytes'] / 1e6:.1f} MB, built in {report['build_seconds']:.2f} s; "
+          "matches the forest on 100k random rows")
+
+
+def main():
+    """Build the table for the saved model (model/risk_model.pkl)."""
+    import hashlib
+    import pickle
+    import pandas as pd
+    from config.schema import DEFAULT_MODEL_FILENAME, RAW_DATA_DIR
+    from prediction.compiled import compile_model
+
+    parser = argparse.ArgumentParser(description="Precompute the saved model over its split grid.")
+    parser.add_argument("--max-cells", type=int, default=DEFAULT_MAX_CELLS)
+    args = parser.parse_args()
+    with open(os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME), "rb") as f:
+        blob = f.read()
+    payload = pickle.loads(blob)
+    compiled = compile_model(payload["model"], payload["features"])
+    df = pd.read_csv(os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+    report = build_and_save(compiled, hashlib.sha256(blob).hexdigest(), df[compiled.features], args.max_cells)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
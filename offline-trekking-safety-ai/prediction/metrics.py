@@ -0,0 +1,225 @@
+"""
+Process-wide metrics registry (offline).
+
+Two kinds of metrics, both rendered by render_prometheus() for GET /metrics:
+
+- labelled counters and histograms created with counter() / histogram(),
+  e.g. per-stage latency (stage_timer) and predictions by risk level;
+- sources: components register a zero-argument callable returning a dict of
+  their current counters (cache, executor, batcher, model). Numbers become
+  gauges; Histogram snapshots become histograms. collect() returns them as JSON.
+
+Set TREK_METRICS=0 to turn instrumentation off: stage timers and labelled
+metrics become no-ops (sources are plain counters and stay available).
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("TREK_METRICS", "1").lower() not in ("0", "false", "off", "no")
+
+# Seconds; covers sub-100us compiled predictions up to slow route uploads
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Cumulative-bucket histogram over fixed upper bounds (plus +Inf)."""
+
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """{"buckets": {upper bound: observations <= bound}, "count", "sum"}."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        buckets, running = {}, 0
+        for bound, n in zip(self.bounds + ["+Inf"], counts):
+            running += n
+            buckets[str(bound)] = running
+        return {"buckets": buckets, "count": running, "sum": total}
+
+
+class LabeledCounter:
+    """Counter with one value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class LabeledHistogram:
+    """Histogram with one Histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, bounds=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.bounds = bounds
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.bounds))
+        return child
+
+    def observe(self, labels: tuple, value: float) -> None:
+        if ENABLED:
+            self.labels(*labels).observe(value)
+
+    def samples(self):
+        for labels, child in list(self._children.items()):
+            yield from _histogram_samples(self.name, dict(zip(self.labelnames, labels)), child.snapshot())
+
+
+_metrics = []
+_sources = {}
+_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str, labelnames: tuple = ()) -> LabeledCounter:
+    metric = LabeledCounter(name, help_text, labelnames)
+    with _lock:
+        _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, labelnames: tuple = (), bounds=LATENCY_BUCKETS) -> LabeledHistogram:
+    metric = LabeledHistogram(name, help_text, labelnames, bounds)
+    with _lock:
+        _metrics.append(metric)
+    return metric
+
+
+STAGE_SECONDS = histogram(
+    "trek_stage_seconds",
+    "Time spent in each prediction stage (model_load, features, predict, explain, serialize)",
+    ("stage",),
+)
+
+
+class _StageTimer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+_NO_TIMER = nullcontext()
+
+
+def stage_timer(stage: str):
+    """Context manager recording the block's duration under trek_stage_seconds{stage}."""
+    if not ENABLED:
+        return _NO_TIMER
+    return _StageTimer(STAGE_SECONDS.labels(stage))
+
+
+def register(name: str, source) -> None:
+    """Expose source() under `name` (replaces an earlier source of that name)."""
+    with _lock:
+        _sources[name] = source
+
+
+def collect() -> dict:
+    """Current values from every registered source."""
+    with _lock:
+        sources = list(_sources.items())
+    return {name: source() for name, source in sources}
+
+
+# --- Prometheus text exposition ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_sample(name: str, labels: dict, value) -> str:
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{label_text}}} {float(value)!r}"
+    return f"{name} {float(value)!r}"
+
+
+def _histogram_samples(name: str, labels: dict, snapshot: dict):
+    for bound, count in snapshot["buckets"].items():
+        yield name + "_bucket", {**labels, "le": bound}, count
+    yield name + "_sum", labels, snapshot["sum"]
+    yield name + "_count", labels, snapshot["count"]
+
+
+def _is_histogram(value) -> bool:
+    return isinstance(value, dict) and "buckets" in value and "count" in value
+
+
+def _source_metrics(prefix: str, values: dict):
+    """(name, kind, samples) for every number / histogram in a source's dict."""
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if _is_histogram(value):
+            yield name, "histogram", list(_histogram_samples(name, {}, value))
+        elif isinstance(value, dict):
+            yield from _source_metrics(name, value)
+        elif isinstance(value, (bool, int, float)):
+            yield name, "gauge", [(name, {}, value)]
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        metrics = list(_metrics)
+    for metric in metrics:
+        samples = list(metric.samples())
+        if not samples:
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_format_sample(*s) for s in samples)
+    for source, values in collect().items():
+        for name, kind, samples in _source_metrics("trek_" + source, values):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(_format_sample(*s) for s in samples)
+    return "\n".join(lines) + "\n"
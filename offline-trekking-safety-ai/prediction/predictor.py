@@ -3,26 +3,31 @@ Risk prediction for trekking segments (offline).
 
 Loads the trained model from model/ and predicts risk level
 (Safe / Moderate_Risk / High_Risk) for a given feature vector.
+The model is loaded once per process, on first use, through
+prediction.registry and reused across calls (and threads) until the file on
+disk changes. Importing this module does not load the model or sklearn.
+Predictions come from the lookup table when one was built for the model,
+else from the compiled forest, else from sklearn.
 """
 
 import os
 import sys
-import pickle
+
+import numpy as np
 
 # Project root
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
 
-from config.schema import FEATURE_COLUMNS, MODEL_DIR, DEFAULT_MODEL_FILENAME
+from config.schema import FEATURE_COLUMNS
+from config.validation import get_validator
+from prediction.metrics import stage_timer
+from prediction.registry import get_registry
 
 
 def load_model():
-    """Load saved model and metadata."""
-    path = os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME)
-    if not os.path.isfile(path):
-        raise FileNotFoundError(f"Model not found at {path}. Run training/train_model.py first.")
-    with open(path, "rb") as f:
-        return pickle.load(f)
+    """Return saved model and metadata (cached; reloaded if the file changes)."""
+    return get_registry().get().payload
 
 
 def predict_risk(features: dict) -> tuple:
@@ -31,18 +36,81 @@ def predict_risk(features: dict) -> tuple:
     features: dict with keys in FEATURE_COLUMNS (slope_angle, altitude_change, etc.)
     Returns (risk_level_str, confidence_dict or None if not available).
     """
-    payload = load_model()
-    model = payload["model"]
-    feats = payload["features"]
-    X = [[features[k] for k in feats]]
-    risk = model.predict(X)[0]
-    # Probabilities for explainability
-    if hasattr(model, "predict_proba"):
-        probs = model.predict_proba(X)[0]
-        classes = model.classes_
-        confidence = dict(zip(classes, probs))
-        return risk, confidence
-    return risk, None
+    loaded = get_registry().get()
+    X = [[features[k] for k in loaded.features]]
+    with stage_timer("predict"):
+        if loaded.table is not None:
+            labels, proba = loaded.table.predict(X)
+            return labels[0], dict(zip(loaded.table.classes, proba[0]))
+        if loaded.compiled is not None:
+            # One traversal of the flat-array forest gives label and probabilities
+            labels, proba = loaded.compiled.predict(X)
+            return labels[0], dict(zip(loaded.compiled.classes, proba[0]))
+        model = loaded.payload["model"]
+        risk = model.predict(X)[0]
+        # Probabilities for explainability
+        if hasattr(model, "predict_proba"):
+            probs = model.predict_proba(X)[0]
+            classes = model.classes_
+            confidence = dict(zip(classes, probs))
+            return risk, confidence
+        return risk, None
+
+
+def features_to_matrix(features, feats=FEATURE_COLUMNS) -> np.ndarray:
+    """
+    Build an (n_rows, n_features) float array in `feats` order from:
+    a 2-D array (columns already in schema order), a dict of columns,
+    or a list of per-row feature dicts.
+    """
+    if isinstance(features, np.ndarray):
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(feats):
+            raise ValueError(f"Expected {len(feats)} feature columns, got {X.shape[1]}")
+        return X
+    if isinstance(features, dict):
+        missing = [k for k in feats if k not in features]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        return np.column_stack([np.asarray(features[k], dtype=np.float64) for k in feats])
+    rows = list(features)
+    if not rows:
+        return np.empty((0, len(feats)), dtype=np.float64)
+    try:
+        return np.array([[row[k] for k in feats] for row in rows], dtype=np.float64)
+    except KeyError as e:
+        raise ValueError(f"Missing feature column: {e.args[0]}") from None
+
+
+def predict_risk_batch(features, validation: str = None) -> tuple:
+    """
+    Predict risk level for many segments with one model call.
+    features: 2-D array (FEATURE_COLUMNS order), dict of columns, or list of dicts.
+    validation: None (no checks) or a config/validation.py mode ("reject", "clip",
+    "flag"); rows the mode rejects raise SchemaValidationError (a ValueError).
+    Returns (risk_levels array, probabilities array (n_rows, n_classes) or None, class names).
+    """
+    loaded = get_registry().get()
+    X = features_to_matrix(features, loaded.features)
+    if validation:
+        X, _ = get_validator(loaded.features).validate(X, validation)
+    with stage_timer("predict"):
+        if loaded.table is not None:
+            labels, proba = loaded.table.predict(X)
+            return labels, proba, loaded.table.classes
+        if loaded.compiled is not None:
+            labels, proba = loaded.compiled.predict(X)
+            return labels, proba, loaded.compiled.classes
+        model = loaded.payload["model"]
+        classes = [str(c) for c in model.classes_]
+        if len(X) == 0:
+            return np.empty(0, dtype=object), np.empty((0, len(classes))), classes
+        if hasattr(model, "predict_proba"):
+            proba = model.predict_proba(X)
+            return model.classes_.take(np.argmax(proba, axis=1)), proba, classes
+        return model.predict(X), None, classes
 
 
 def predict_risk_simple(slope_angle, altitude_change, weather_severity,
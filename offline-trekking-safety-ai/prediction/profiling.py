@@ -0,0 +1,309 @@
+"""
+On-demand profiling hooks (offline).
+
+Two profilers, both usable in the API server, the CLI and the scripts:
+
+- cProfile (deterministic): profiled_call() runs one function under cProfile
+  in the calling thread and returns its raw stats, so work done on executor
+  threads or worker processes can be added to a ProfileStore, which merges
+  everything into one pstats profile (text report or binary .pstats dump).
+- StackSampler (statistical): a background thread reads every thread's stack
+  from sys._current_frames() every few milliseconds and counts them as
+  collapsed stacks ("thread;outer;...;inner count"), the input format of
+  flamegraph.pl and speedscope. Cost is one stack walk per thread per sample,
+  so it can run on a loaded server; idle threads (waiting on a lock, queue or
+  the event loop's select) are left out.
+
+profile_to(path) wraps a whole command: a `.collapsed` / `.folded` path uses
+the sampler, any other path gets a cProfile dump (python -m pstats PATH, or
+snakeviz) and the top functions on stderr. Only this process is profiled;
+with --workers > 1 the pool's work shows up as the parent waiting.
+"""
+
+import cProfile
+import contextvars
+import io
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLLAPSED_SUFFIXES = (".collapsed", ".folded")
+DEFAULT_INTERVAL_S = 0.005
+PSTATS_SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "time", "name", "filename")
+
+# Leaf frames of threads that are blocked waiting for work (skipped unless include_idle)
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures worker blocked on its work queue
+}
+
+
+# --- cProfile ---
+
+class _RawStats:
+    """Adapter so pstats.Stats() accepts a raw stats dict (Profile.stats)."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profiled_call(fn, *args):
+    """
+    Run fn(*args) under cProfile in this thread; returns (result, raw stats).
+    Both are picklable, so this also works through a process pool.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active (Python 3.12+ allows one per process)
+        return fn(*args), {}
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+class ProfileStore:
+    """cProfile statistics merged from any number of profiled calls."""
+
+    def __init__(self):
+        self._stats = None
+        self._lock = threading.Lock()
+        self.profiles = 0
+
+    def add(self, stats: dict) -> None:
+        """Merge the raw stats of one profile (Profile.stats / profiled_call)."""
+        if not stats:
+            return
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(_RawStats(stats))
+            else:
+                self._stats.add(pstats.Stats(_RawStats(stats)))
+            self.profiles += 1
+
+    def add_profiler(self, profiler: cProfile.Profile) -> None:
+        profiler.create_stats()
+        self.add(profiler.stats)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = None
+            self.profiles = 0
+
+    def empty(self) -> bool:
+        return self._stats is None
+
+    def text(self, sort: str = "cumulative", limit: int = 40) -> str:
+        """pstats report, `limit` functions sorted by `sort` (ValueError for an unknown key)."""
+        if sort not in PSTATS_SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(PSTATS_SORT_KEYS)}")
+        buf = io.StringIO()
+        with self._lock:
+            if self._stats is None:
+                return ""
+            self._stats.stream = buf
+            self._stats.sort_stats(sort).print_stats(limit)
+        return buf.getvalue()
+
+    def dump(self) -> bytes:
+        """The merged profile in the .pstats file format (pstats.Stats(path), snakeviz)."""
+        with self._lock:
+            return marshal.dumps(self._stats.stats if self._stats is not None else {})
+
+    def stats(self) -> dict:
+        with self._lock:
+            functions = len(self._stats.stats) if self._stats is not None else 0
+            seconds = self._stats.total_tt if self._stats is not None else 0.0
+        return {"profiles": self.profiles, "functions": functions, "profiled_seconds": seconds}
+
+
+# Set for the duration of a request that is being profiled (see backend/instrumentation.py)
+_request_profiled = contextvars.ContextVar("trek_request_profiled", default=False)
+
+
+def mark_profiled():
+    """Flag the current context (request task) as profiled; returns a token for unmark_profiled."""
+    return _request_profiled.set(True)
+
+
+def unmark_profiled(token) -> None:
+    _request_profiled.reset(token)
+
+
+def is_profiled() -> bool:
+    return _request_profiled.get()
+
+
+# --- Statistical sampler ---
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(PROJECT_ROOT + os.sep):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    parts = filename.split(os.sep)
+    return os.sep.join(parts[-2:])
+
+
+class StackSampler:
+    """Samples all thread stacks at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, include_idle: bool = False):
+        self.include_idle = include_idle
+        self.interval = DEFAULT_INTERVAL_S
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._counts = Counter()
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = None, interval: float = DEFAULT_INTERVAL_S) -> bool:
+        """
+        Start sampling (for `seconds`, or until stop()); earlier samples are
+        discarded. Returns False if the sampler is already running.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._counts = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            deadline = time.monotonic() + seconds if seconds else None
+            self._thread = threading.Thread(
+                target=self._run, args=(deadline,), name="trek-profile-sampler", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = Counter()
+            self.samples = 0
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self, deadline) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    # Pool threads share one root frame ("inference_0" -> "inference")
+                    names = {t.ident: re.sub(r"[_-]\d+$", "", t.name) for t in threading.enumerate()}
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self._counts.update(stacks)
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    def collapsed(self) -> str:
+        """One "frame;frame;... count" line per distinct stack, most frequent first."""
+        with self._lock:
+            items = self._counts.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "stacks": len(self._counts),
+            "interval_seconds": self.interval,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+
+# Process-wide instances used by the API server
+store = ProfileStore()
+sampler = StackSampler()
+
+
+# --- Command-line hook ---
+
+def add_profile_argument(parser) -> None:
+    parser.add_argument("--profile", metavar="PATH", default=None,
+                        help="profile this run: cProfile dump to PATH, or sampled "
+                             "collapsed stacks if PATH ends in .collapsed / .folded")
+
+
+@contextmanager
+def profile_to(path: str = None, top: int = 15):
+    """Profile the enclosed block into `path` (no-op when path is None)."""
+    if not path:
+        yield
+        return
+    if path.endswith(COLLAPSED_SUFFIXES):
+        run_sampler = StackSampler()
+        run_sampler.start(interval=0.001)
+        try:
+            yield
+        finally:
+            run_sampler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(run_sampler.collapsed())
+            print(f"Profile: {run_sampler.samples} samples written to {path} "
+                  "(collapsed stacks for flamegraph.pl / speedscope)", file=sys.stderr)
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.dump_stats(path)
+        stats.sort_stats("cumulative").print_stats(top)
+        print(f"Profile written to {path} (python -m pstats {path})", file=sys.stderr)
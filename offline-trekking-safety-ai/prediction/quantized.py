@@ -0,0 +1,299 @@
+"""
+Compact quantized model file for low-memory offline devices.
+
+export_quantized() stores a compiled forest (prediction.compiled) in one small
+binary file:
+  - split thresholds as uint8 / uint16 codes on a grid spanning each feature's
+    FEATURE_RANGES (config/schema.py), or as float16 ("precision");
+  - split feature ids as uint8, child indices as int16 (relative to the tree's
+    root; int32 only if a tree has more than 32767 nodes);
+  - class distributions only for leaves, deduplicated into one table that
+    leaves index into.
+load_quantized() reads it back with NumPy alone (no pickle, no sklearn) into
+a CompiledForest, so inference is the same flat-array traversal.
+
+File layout: b"TRKQ", uint16 format version, uint32 header length, a JSON
+header (classes, features, precision, ranges, source_sha256 of the pickle it
+was exported from, array dtypes/shapes/offsets), then the arrays, each
+starting on an 8-byte boundary. training/train_model.py re-exports the file on
+every save, and load_quantized(source_sha256=...) refuses a file exported from
+another model.
+
+Quantizing thresholds can move a split past some inputs, so export checks
+accuracy against the unquantized forest on labelled rows and refuses (or, with
+precision="auto", picks the next finer precision) if it drops by more than the
+tolerance.
+
+Run from project root:
+    python prediction/quantized.py
+    python prediction/quantized.py --precision uint8 --tolerance 0.002
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_RANGES, MODEL_DIR, DEFAULT_QUANTIZED_FILENAME
+from prediction.compiled import CompiledForest
+
+MAGIC = b"TRKQ"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<4sHI")
+_ALIGN = 8
+
+# Threshold code levels per precision; float16 stores thresholds directly
+PRECISIONS = {"uint8": 255, "uint16": 65535, "float16": None}
+AUTO_ORDER = ("uint8", "uint16", "float16")
+DEFAULT_TOLERANCE = 0.005
+_LEAF_FEATURE = 255
+
+
+def default_quantized_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_QUANTIZED_FILENAME)
+
+
+# --- Threshold quantization ---
+
+def _feature_ranges(features) -> np.ndarray:
+    return np.array([FEATURE_RANGES[name] for name in features], dtype=np.float64)
+
+
+def quantize_thresholds(threshold, feature, ranges, precision: str) -> np.ndarray:
+    """Threshold codes (uint8/uint16 grid over each feature's range) or float16 values."""
+    levels = PRECISIONS[precision]
+    if levels is None:
+        return np.asarray(threshold, dtype=np.float16)
+    lo, hi = ranges[feature, 0], ranges[feature, 1]
+    code = np.rint((threshold - lo) / (hi - lo) * levels)
+    return np.clip(code, 0, levels).astype(np.uint8 if levels == 255 else np.uint16)
+
+
+def dequantize_thresholds(codes, feature, ranges, precision: str) -> np.ndarray:
+    levels = PRECISIONS[precision]
+    if levels is None:
+        return codes.astype(np.float64)
+    lo, hi = ranges[feature, 0], ranges[feature, 1]
+    return lo + codes.astype(np.float64) * ((hi - lo) / levels)
+
+
+# --- Packing ---
+
+def pack_forest(compiled: CompiledForest, precision: str) -> tuple:
+    """(header dict, {name: array}) for the compact layout."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {list(PRECISIONS)}, got {precision!r}")
+    if len(compiled.features) >= _LEAF_FEATURE:
+        raise ValueError("Too many features for uint8 feature ids")
+    n_nodes = compiled.n_nodes
+    ids = np.arange(n_nodes)
+    is_leaf = compiled.left == ids
+    roots = compiled.roots.astype(np.int64)
+    sizes = np.diff(np.append(roots, n_nodes))
+    node_root = np.repeat(roots, sizes)
+    index_dtype = np.int16 if sizes.max() <= np.iinfo(np.int16).max else np.int32
+
+    ranges = _feature_ranges(compiled.features)
+    feature = np.where(is_leaf, 0, compiled.feature)
+    codes = quantize_thresholds(compiled.threshold, feature, ranges, precision)
+    codes[is_leaf] = 0
+    leaf_values, leaf_index = np.unique(compiled.value[is_leaf], axis=0, return_inverse=True)
+
+    arrays = {
+        "tree_sizes": sizes.astype(np.uint16 if sizes.max() <= np.iinfo(np.uint16).max else np.uint32),
+        "depths": compiled.depths.astype(np.uint8),
+        "feature": np.where(is_leaf, _LEAF_FEATURE, compiled.feature).astype(np.uint8),
+        "threshold": codes,
+        # Children relative to the tree root; -1 marks a leaf
+        "left": np.where(is_leaf, -1, compiled.left - node_root).astype(index_dtype),
+        "right": np.where(is_leaf, -1, compiled.right - node_root).astype(index_dtype),
+        "leaf_index": leaf_index.ravel().astype(np.uint16 if len(leaf_values) <= 65536 else np.uint32),
+        "leaf_values": leaf_values,
+    }
+    header = {
+        "classes": compiled.classes,
+        "features": compiled.features,
+        "precision": precision,
+        "ranges": ranges.tolist(),
+    }
+    return header, arrays
+
+
+def unpack_forest(header: dict, arrays: dict) -> CompiledForest:
+    """Rebuild the flat-array forest from packed arrays."""
+    sizes = arrays["tree_sizes"].astype(np.int64)
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    node_root = np.repeat(roots, sizes)
+    ids = np.arange(len(node_root))
+    is_leaf = arrays["left"] < 0
+    feature = np.where(is_leaf, 0, arrays["feature"]).astype(np.int64)
+    threshold = dequantize_thresholds(
+        arrays["threshold"], feature, np.asarray(header["ranges"], dtype=np.float64), header["precision"]
+    )
+    value = np.zeros((len(ids), arrays["leaf_values"].shape[1]), dtype=np.float64)
+    value[is_leaf] = arrays["leaf_values"][arrays["leaf_index"]]
+    return CompiledForest(
+        feature=feature,
+        threshold=np.where(is_leaf, 0.0, threshold),
+        left=np.where(is_leaf, ids, arrays["left"].astype(np.int64) + node_root),
+        right=np.where(is_leaf, ids, arrays["right"].astype(np.int64) + node_root),
+        value=value,
+        roots=roots,
+        depths=arrays["depths"],
+        classes=header["classes"],
+        features=header["features"],
+    )
+
+
+def write_quantized(header: dict, arrays: dict, path: str) -> str:
+    """Write header and arrays in the TRKQ layout (temp file, then rename)."""
+    layout, offset = [], 0
+    for name, arr in arrays.items():
+        layout.append({"name": name, "dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset})
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    header_bytes = json.dumps({**header, "arrays": layout}, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(_PREAMBLE.size + len(header_bytes)) % _ALIGN)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for arr in arrays.values():
+            data = np.ascontiguousarray(arr).tobytes()
+            f.write(data + b"\0" * (-len(data) % _ALIGN))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def read_quantized(path: str) -> tuple:
+    """(header dict, {name: array}) from a TRKQ file."""
+    with open(path, "rb") as f:
+        buf = f.read()
+    magic, version, header_len = _PREAMBLE.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a quantized model file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format version {version}")
+    data_start = _PREAMBLE.size + header_len
+    header = json.loads(buf[_PREAMBLE.size:data_start])
+    arrays = {}
+    for spec in header.pop("arrays"):
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[spec["name"]] = np.frombuffer(
+            buf, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+    return header, arrays
+
+
+def load_quantized(path: str = None, source_sha256: str = None) -> CompiledForest:
+    """
+    Load a quantized model file for inference; needs only NumPy. With
+    source_sha256, raises ValueError unless the file was exported from the
+    pickle with that SHA-256.
+    """
+    path = path or default_quantized_path()
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Quantized model not found at {path}. Run prediction/quantized.py first.")
+    header, arrays = read_quantized(path)
+    if source_sha256 is not None and header.get("source_sha256") != source_sha256:
+        raise ValueError(
+            f"{path} was exported from model {str(header.get('source_sha256'))[:12]}, "
+            f"not {source_sha256[:12]}; run prediction/quantized.py"
+        )
+    return unpack_forest(header, arrays)
+
+
+# --- Export with accuracy check ---
+
+def accuracy_delta(reference: CompiledForest, candidate: CompiledForest, X, y) -> dict:
+    """Accuracy of both forests on labelled rows, and how often they disagree."""
+    y = np.asarray(y).astype(str)
+    ref_labels, ref_proba = reference.predict(X)
+    labels, proba = candidate.predict(X)
+    ref_acc = float(np.mean(ref_labels.astype(str) == y))
+    acc = float(np.mean(labels.astype(str) == y))
+    return {
+        "reference_accuracy": ref_acc,
+        "accuracy": acc,
+        "accuracy_drop": ref_acc - acc,
+        "label_disagreement": float(np.mean(labels != ref_labels)),
+        "max_proba_diff": float(np.abs(proba - ref_proba).max()) if len(proba) else 0.0,
+    }
+
+
+def export_quantized(compiled: CompiledForest, X, y, path: str = None, precision: str = "auto",
+                     tolerance: float = DEFAULT_TOLERANCE, source_sha256: str = None) -> dict:
+    """
+    Quantize, check accuracy on (X, y) and write the file, tagged with the
+    source pickle's SHA-256. precision="auto" uses the coarsest precision
+    whose accuracy drop is within tolerance. Raises ValueError if the
+    requested precision (or, for auto, every precision) loses more than that.
+    Returns the accuracy report.
+    """
+    path = path or default_quantized_path()
+    candidates = AUTO_ORDER if precision == "auto" else (precision,)
+    for name in candidates:
+        header, arrays = pack_forest(compiled, name)
+        header["source_sha256"] = source_sha256
+        report = {"precision": name, **accuracy_delta(compiled, unpack_forest(header, arrays), X, y)}
+        if report["accuracy_drop"] <= tolerance:
+            write_quantized(header, arrays, path)
+            return report
+    raise ValueError(
+        f"Accuracy drop {report['accuracy_drop']:.4f} with {report['precision']} thresholds "
+        f"exceeds tolerance {tolerance}"
+    )
+
+
+def main():
+    """Quantize the saved model (model/risk_model.pkl) and report size, load time and accuracy."""
+    import hashlib
+    import pickle
+    import pandas as pd
+    from config.schema import DEFAULT_MODEL_FILENAME, RAW_DATA_DIR
+    from prediction.compiled import compile_model
+
+    parser = argparse.ArgumentParser(description="Export the model as a compact quantized file.")
+    parser.add_argument("--precision", choices=["auto", *PRECISIONS], default="auto")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="largest allowed accuracy drop vs the full model (default 0.005)")
+    parser.add_argument("--out", default=default_quantized_path())
+    args = parser.parse_args()
+
+    model_path = os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME)
+    t0 = time.perf_counter()
+    with open(model_path, "rb") as f:
+        blob = f.read()
+    payload = pickle.loads(blob)
+    pickle_load = time.perf_counter() - t0
+    compiled = compile_model(payload["model"], payload["features"])
+    df = pd.read_csv(os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+    try:
+        report = export_quantized(compiled, df[compiled.features], df[payload["target"]],
+                                  args.out, args.precision, args.tolerance,
+                                  source_sha256=hashlib.sha256(blob).hexdigest())
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    t0 = time.perf_counter()
+    load_quantized(args.out)
+    quantized_load = time.perf_counter() - t0
+
+    print(f"Quantized model ({report['precision']} thresholds) saved to {args.out}")
+    print(f"  size:      {os.path.getsize(args.out):>8d} bytes (pickle {os.path.getsize(model_path)} bytes)")
+    print(f"  load time: {quantized_load * 1e3:>8.2f} ms (pickle {pickle_load * 1e3:.2f} ms, includes sklearn import)")
+    print(f"  accuracy:  {report['accuracy']:.4f} vs {report['reference_accuracy']:.4f} "
+          f"(drop {report['accuracy_drop']:+.4f}, tolerance {args.tolerance})")
+    print(f"  labels differing from full model: {report['label_disagreement']:.2%}, "
+          f"max probability difference {report['max_proba_diff']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
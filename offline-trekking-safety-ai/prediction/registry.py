@@ -0,0 +1,239 @@
+"""
+Process-wide model registry (offline).
+
+Loads model/risk_model.pkl once and shares it between threads. The file is
+re-checked (mtime + size, then SHA-256) at most every `check_interval`
+seconds; when it has changed, the new model is loaded first and then swapped
+in with a single assignment, so readers never see a half-loaded model.
+Loading uses the memory-mapped arrays (model/risk_model_mapped/, shared by
+all worker processes) or else the compiled .npz next to the pickle when they
+were compiled from the same bytes (needs only NumPy); otherwise the pickle is
+unpickled and compiled to flat arrays here (see prediction.compiled). A lookup table built
+for the same pickle (prediction.lookup_table) is loaded too. Listeners registered
+with add_listener() are called after each reload (e.g. to drop caches).
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import (
+    MODEL_DIR,
+    DEFAULT_MODEL_FILENAME,
+    DEFAULT_COMPILED_FILENAME,
+    DEFAULT_TABLE_FILENAME,
+    DEFAULT_MAPPED_DIRNAME,
+)
+from prediction.compiled import compile_model, load_compiled_for, load_mapped_for
+from prediction.lookup_table import load_table_for
+from prediction.metrics import STAGE_SECONDS
+
+
+def default_model_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME)
+
+
+class LoadedModel:
+    """
+    One loaded model plus where it came from and how long it took.
+    When the compiled arrays match the pickle, the pickle is only unpickled
+    (importing sklearn) the first time `payload` is read. source says where
+    the arrays came from: "mapped", "compiled" or "pickle".
+    """
+
+    __slots__ = ("_payload", "_blob", "compiled", "table", "source", "path", "sha256", "mtime", "size",
+                 "load_seconds", "loaded_at")
+
+    def __init__(self, payload, compiled, path, sha256, mtime, size, load_seconds, loaded_at, blob=None,
+                 table=None, source="pickle"):
+        self._payload = payload
+        self._blob = blob
+        self.compiled = compiled
+        self.source = source
+        self.table = table
+        self.path = path
+        self.sha256 = sha256
+        self.mtime = mtime
+        self.size = size
+        self.load_seconds = load_seconds
+        self.loaded_at = loaded_at
+
+    @property
+    def payload(self) -> dict:
+        """The unpickled {"model", "features", "target"} dict."""
+        if self._payload is None:
+            blob = self._blob
+            if blob is None:
+                # Mapped models keep no private copy of the pickle; read it again
+                with open(self.path, "rb") as f:
+                    blob = f.read()
+                if hashlib.sha256(blob).hexdigest() != self.sha256:
+                    raise RuntimeError(f"{self.path} changed since it was loaded; reload the model")
+            self._payload = pickle.loads(blob)
+            self._blob = None
+        return self._payload
+
+    @property
+    def features(self) -> list:
+        """Feature column order the model expects."""
+        if self.compiled is not None:
+            return self.compiled.features
+        return self.payload["features"]
+
+    @property
+    def version(self) -> str:
+        """Short content hash; changes whenever the pickle changes."""
+        return self.sha256[:12]
+
+
+class ModelRegistry:
+    """
+    Thread-safe holder for the current model.
+    get() is lock-free on the fast path; only (re)loads take the lock.
+    """
+
+    def __init__(self, path: str = None, check_interval: float = 1.0, compiled_path: str = None):
+        self.path = path or default_model_path()
+        self.compiled_path = compiled_path or os.path.join(os.path.dirname(self.path), DEFAULT_COMPILED_FILENAME)
+        self.table_path = os.path.join(os.path.dirname(self.path), DEFAULT_TABLE_FILENAME)
+        self.mapped_path = os.path.join(os.path.dirname(self.path), DEFAULT_MAPPED_DIRNAME)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._last_check = 0.0
+        self._stat = None
+        self._listeners = []
+        self.reloads = 0
+
+    def add_listener(self, callback) -> None:
+        """Call callback(loaded_model) whenever a new model replaces the current one."""
+        self._listeners.append(callback)
+
+    def get(self) -> LoadedModel:
+        """Return the current model, reloading it if the file changed on disk."""
+        current = self._current
+        if current is not None and time.monotonic() - self._last_check < self.check_interval:
+            return current
+        return self._refresh()
+
+    @property
+    def current(self):
+        """The loaded model without checking the file (None before the first load)."""
+        return self._current
+
+    def reload(self) -> LoadedModel:
+        """Force a re-read of the model file (e.g. after training)."""
+        return self._refresh(force=True)
+
+    def _refresh(self, force: bool = False) -> LoadedModel:
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"Model not found at {self.path}. Run training/train_model.py first."
+                ) from None
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if not force and self._current is not None and stat_key == self._stat:
+                return self._current
+            t0 = time.perf_counter()
+            with open(self.path, "rb") as f:
+                blob = f.read()
+            sha256 = hashlib.sha256(blob).hexdigest()
+            if not force and self._current is not None and sha256 == self._current.sha256:
+                # Touched but not changed: keep the loaded model
+                self._stat = stat_key
+                return self._current
+            # Fast paths: arrays compiled from exactly this pickle, no unpickling yet
+            payload, source = None, "mapped"
+            compiled = load_mapped_for(sha256, self.mapped_path)
+            if compiled is None:
+                source = "compiled"
+                compiled = load_compiled_for(sha256, self.compiled_path)
+            if compiled is None:
+                source = "pickle"
+                payload = pickle.loads(blob)
+                try:
+                    compiled = compile_model(payload["model"], payload["features"])
+                except TypeError:
+                    compiled = None  # not a tree model: predictor uses sklearn directly
+            loaded = LoadedModel(
+                payload=payload,
+                blob=blob if source == "compiled" else None,
+                compiled=compiled,
+                source=source,
+                # Optional table mode (prediction.lookup_table), only if built for this pickle
+                table=load_table_for(sha256, self.table_path),
+                path=self.path,
+                sha256=sha256,
+                mtime=st.st_mtime,
+                size=st.st_size,
+                load_seconds=time.perf_counter() - t0,
+                loaded_at=time.time(),
+            )
+            STAGE_SECONDS.observe(("model_load",), loaded.load_seconds)
+            replaced = self._current is not None
+            if replaced:
+                self.reloads += 1
+            self._stat = stat_key
+            self._current = loaded
+        if replaced:
+            for callback in self._listeners:
+                callback(loaded)
+        return loaded
+
+    def stats(self) -> dict:
+        """Load counters without touching the file (empty before the first load)."""
+        loaded = self._current
+        if loaded is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "load_seconds": loaded.load_seconds,
+            "loaded_at": loaded.loaded_at,
+            "file_size_bytes": loaded.size,
+            "reloads": self.reloads,
+        }
+
+    def info(self) -> dict:
+        """Summary of the loaded model for diagnostics endpoints."""
+        loaded = self.get()
+        model = loaded.payload["model"]
+        return {
+            "path": loaded.path,
+            "version": loaded.version,
+            "sha256": loaded.sha256,
+            "model_type": type(model).__name__,
+            "n_estimators": len(getattr(model, "estimators_", [model])),
+            "features": list(loaded.features),
+            "compiled": loaded.compiled is not None,
+            "source": loaded.source,
+            "lookup_table_cells": loaded.table.n_cells if loaded.table is not None else None,
+            "file_size_bytes": loaded.size,
+            "file_mtime": loaded.mtime,
+            "load_seconds": loaded.load_seconds,
+            "loaded_at": loaded.loaded_at,
+            "reloads": self.reloads,
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry for the default model path."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
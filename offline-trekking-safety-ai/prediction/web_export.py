@@ -0,0 +1,188 @@
+"""
+Model bundle for client-side inference in the web frontend (offline).
+
+export_web_bundle() writes the compiled forest (prediction.compiled) as one
+JSON file that frontend/model.js scores in the browser, so the UI keeps
+working with no server. Arrays are stored as base64 little-endian typed
+arrays (exact float64 thresholds and leaf values; int8 / int32 indices):
+  - per node: split feature (-1 for a leaf), threshold, left / right child
+    (absolute node index) and leaf slot (-1 for an internal node);
+  - per leaf: class distribution, and the Safe-class path contribution of
+    every feature, which gives the same ranked reasons as
+    prediction.explain.predict_explain_batch.
+Reason texts, MIN_CONTRIBUTION, FEATURE_RANGES (for the location -> features
+mapping of backend/inference.py) and the pickle's SHA-256 go in the header.
+
+check_bundle() runs frontend/model.js under Node on the training CSV and a
+set of locations and fails unless labels, probabilities and reasons equal the
+Python model's exactly.
+
+Run from project root:
+    python prediction/web_export.py            # export for the saved model
+    python prediction/web_export.py --check    # export, then compare with Node
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_RANGES, RISK_LEVELS, WEB_MODEL_PATH
+from prediction.compiled import CompiledForest
+
+BUNDLE_FORMAT = "trek-forest"
+BUNDLE_VERSION = 2
+NODE_CHECK = os.path.join(PROJECT_ROOT, "frontend", "check_model.js")
+CHECK_LOCATIONS = ["Rohtang Pass, Himachal Pradesh", "Annapurna Base Camp", "46.0207, 7.7491", "", "Kedarkantha"]
+
+
+def default_bundle_path() -> str:
+    return os.path.join(PROJECT_ROOT, WEB_MODEL_PATH)
+
+
+def _b64(arr: np.ndarray, dtype: str) -> str:
+    return base64.b64encode(np.ascontiguousarray(arr, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()).decode()
+
+
+def build_bundle(compiled: CompiledForest, source_sha256: str = None) -> dict:
+    """JSON-ready bundle of a compiled forest with path contributions."""
+    from app_interface.cli import SAFE_REASON
+    from prediction.explain import MIN_CONTRIBUTION, REASON_RULES, reason_text
+
+    if compiled.contributions is None:
+        raise ValueError("The compiled model has no path contributions; recompile it")
+    if compiled.n_nodes > np.iinfo(np.int32).max:
+        raise ValueError("Forest too large for int32 node indices")
+    nodes = np.arange(compiled.n_nodes)
+    is_leaf = compiled.left == nodes
+    leaf_slot = np.full(compiled.n_nodes, -1, dtype=np.int64)
+    leaf_slot[is_leaf] = np.arange(int(is_leaf.sum()))
+    safe = compiled.classes.index(RISK_LEVELS[0])
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "source_sha256": source_sha256,
+        "features": compiled.features,
+        "classes": compiled.classes,
+        "safe_class": safe,
+        "n_nodes": compiled.n_nodes,
+        "n_leaves": int(is_leaf.sum()),
+        "roots": compiled.roots.tolist(),
+        "depths": compiled.depths.tolist(),
+        "feature_ranges": {
+            name: {"low": lo, "high": hi, "integer": isinstance(lo, int) and isinstance(hi, int)}
+            for name, (lo, hi) in FEATURE_RANGES.items()
+        },
+        "min_contribution": MIN_CONTRIBUTION,
+        # Rule text only when the rule holds for the input, else the neutral text
+        "reasons": {
+            f: {
+                "rule": list(REASON_RULES[f][:2]) if f in REASON_RULES else None,
+                "text": reason_text(f, True) if f in REASON_RULES else None,
+                "neutral": reason_text(f, False),
+            }
+            for f in compiled.features
+        },
+        "safe_reason": SAFE_REASON,
+        "arrays": {
+            "feature": _b64(np.where(is_leaf, -1, compiled.feature), "i1"),
+            "threshold": _b64(np.where(is_leaf, 0.0, compiled.threshold), "f8"),
+            "left": _b64(compiled.left, "i4"),
+            "right": _b64(compiled.right, "i4"),
+            "leaf": _b64(leaf_slot, "i4"),
+            "leaf_value": _b64(compiled.value[is_leaf], "f8"),
+            "leaf_safe_contribution": _b64(compiled.contributions[is_leaf, :, safe], "f8"),
+        },
+    }
+
+
+def export_web_bundle(compiled: CompiledForest, source_sha256: str = None, path: str = None) -> str:
+    """Write the bundle (temp file, then rename); returns the path."""
+    path = path or default_bundle_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(build_bundle(compiled, source_sha256), f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def check_bundle(path: str, X: np.ndarray, locations=CHECK_LOCATIONS) -> dict:
+    """
+    Score X and locations with frontend/model.js under Node and with the
+    served Python model; AssertionError on any difference. Returns counts.
+    """
+    from backend.inference import SAFE_REASON, features_from_location, score_features
+    from prediction.explain import predict_explain_batch
+
+    X = np.asarray(X, dtype=np.float64)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"rows": X.tolist(), "locations": list(locations)}, f)
+        request = f.name
+    try:
+        out = subprocess.run(["node", NODE_CHECK, path, request], capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("Node.js is needed for --check (node not found)") from None
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Node check failed: {e.stderr.strip()}") from None
+    finally:
+        os.remove(request)
+    js = json.loads(out.stdout)
+
+    labels, proba, classes, reasons = predict_explain_batch(X)
+    expected = [
+        {"risk_level": str(label), "confidence": dict(zip(classes, p)), "reasons": r or [SAFE_REASON]}
+        for label, p, r in zip(labels.tolist(), proba.tolist(), reasons)
+    ]
+    for i, (got, want) in enumerate(zip(js["rows"], expected)):
+        if got != want:
+            raise AssertionError(f"Row {i}: browser model gave {got}, Python gave {want}")
+    for location, got in zip(locations, js["locations"]):
+        want_features = features_from_location(location)
+        if got["features"] != want_features:
+            raise AssertionError(f"{location!r}: browser features {got['features']}, Python {want_features}")
+        want = score_features(want_features)
+        if got["result"] != want:
+            raise AssertionError(f"{location!r}: browser gave {got['result']}, Python gave {want}")
+    return {"rows": len(expected), "locations": len(js["locations"])}
+
+
+def main():
+    """Export the bundle for the saved model (model/risk_model.pkl)."""
+    import hashlib
+    import pickle
+    import pandas as pd
+    from config.schema import DEFAULT_MODEL_FILENAME, MODEL_DIR, RAW_DATA_DIR
+    from prediction.compiled import compile_model
+
+    parser = argparse.ArgumentParser(description="Export the model for in-browser inference.")
+    parser.add_argument("--out", default=None, help=f"bundle path (default {WEB_MODEL_PATH})")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the browser evaluator (Node) with Python on the training CSV")
+    args = parser.parse_args()
+    with open(os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME), "rb") as f:
+        blob = f.read()
+    payload = pickle.loads(blob)
+    compiled = compile_model(payload["model"], payload["features"])
+    path = export_web_bundle(compiled, hashlib.sha256(blob).hexdigest(), args.out)
+    print(f"Web model saved to {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+    if args.check:
+        df = pd.read_csv(os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv"))
+        try:
+            counts = check_bundle(path, df[compiled.features].to_numpy())
+        except (AssertionError, RuntimeError) as e:
+            sys.exit(f"Error: {e}")
+        print(f"Browser evaluator matches Python on {counts['rows']} training rows "
+              f"and {counts['locations']} locations")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,28 @@ Uses simulation modules (terrain + weather) to create rows with features
 and assigns risk_level (Safe / Moderate_Risk / High_Risk) so that
 a Decision Tree or Random Forest can learn the mapping.
 
+Two engines:
+  rows    - one sample at a time (default; reproduces the shipped CSV)
+  columns - whole columns per chunk, written to disk chunk by chunk with
+            bounded memory, optionally spread over worker processes
+
+Output is CSV by default; --format npy / parquet writes the typed columnar
+format from training/dataset_io.py instead. Every generated frame / chunk is
+checked against config/schema.py FEATURE_RANGES (config/validation.py, reject
+mode), so a simulator change that drifts out of range fails here, not later.
+
 Run from project root:
     python scripts/generate_dataset.py
+    python scripts/generate_dataset.py --engine columns --n-per-class 1000000 --workers 4
+    python scripts/generate_dataset.py --engine columns --n-per-class 1000000 --format npy
+    python scripts/generate_dataset.py --engine columns --profile generate.pstats
 """
 
+import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
@@ -24,8 +40,25 @@ from config.schema import (
     RISK_LEVELS,
     RAW_DATA_DIR,
 )
-from simulation.terrain_simulator import generate_terrain_row
-from simulation.weather_simulator import generate_weather_row
+from config.validation import validate_frame
+from prediction.profiling import add_profile_argument, profile_to
+from simulation.terrain_simulator import generate_terrain_row, generate_terrain_columns
+from simulation.weather_simulator import generate_weather_row, generate_weather_columns
+from training.dataset_io import (
+    DATASET_FORMATS,
+    FORMAT_SUFFIX,
+    NpyDatasetWriter,
+    ParquetDatasetWriter,
+    write_dataset,
+)
+
+# Rows per chunk for the columns engine (bounds peak memory)
+DEFAULT_CHUNK_ROWS = 300_000
+
+
+def risk_bias_for(risk_level: str) -> str:
+    """Map label to risk_bias for simulators."""
+    return "high_risk" if risk_level == "High_Risk" else ("safe" if risk_level == "Safe" else "neutral")
 
 
 def generate_one_sample(rng: np.random.Generator, risk_level: str) -> dict:
@@ -33,8 +66,7 @@ def generate_one_sample(rng: np.random.Generator, risk_level: str) -> dict:
     Generate one trekking segment with all features and the given risk_level.
     risk_level is used as bias when calling terrain and weather simulators.
     """
-    # Map label to risk_bias for simulators
-    risk_bias = "high_risk" if risk_level == "High_Risk" else ("safe" if risk_level == "Safe" else "neutral")
+    risk_bias = risk_bias_for(risk_level)
     terrain = generate_terrain_row(rng, risk_bias)
     weather = generate_weather_row(rng, risk_bias)
     row = {**terrain, **weather, TARGET_COLUMN: risk_level}
@@ -56,22 +88,142 @@ def generate_synthetic_dataset(
     df = pd.DataFrame(rows)
     # Ensure column order: features first, then target
     columns = FEATURE_COLUMNS + [TARGET_COLUMN]
-    return df[columns]
+    df, _ = validate_frame(df[columns], "reject")
+    return df
+
+
+# --- Columns engine ---
+
+def generate_synthetic_chunk(seed_seq: np.random.SeedSequence, n_per_class: int) -> pd.DataFrame:
+    """
+    Generate one balanced chunk (n_per_class rows per risk level) column-wise.
+    The chunk depends only on its seed, not on which process generates it.
+    """
+    rng = np.random.default_rng(seed_seq)
+    parts = []
+    for risk in RISK_LEVELS:
+        risk_bias = risk_bias_for(risk)
+        columns = {
+            **generate_terrain_columns(rng, n_per_class, risk_bias),
+            **generate_weather_columns(rng, n_per_class, risk_bias),
+        }
+        part = pd.DataFrame({col: columns[col] for col in FEATURE_COLUMNS})
+        part[TARGET_COLUMN] = risk
+        parts.append(part)
+    chunk, _ = validate_frame(pd.concat(parts, ignore_index=True), "reject")
+    return chunk
+
+
+def chunk_plan(n_per_class: int, seed: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> list:
+    """
+    Split the dataset into chunks: list of (SeedSequence, n_per_class_in_chunk).
+    Each chunk gets its own child seed spawned from `seed`, so the same seed
+    always produces the same dataset, whatever the number of workers.
+    """
+    per_chunk = max(1, chunk_rows // len(RISK_LEVELS))
+    sizes = [per_chunk] * (n_per_class // per_chunk)
+    if n_per_class % per_chunk:
+        sizes.append(n_per_class % per_chunk)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+
+def _chunk_csv(seed_seq: np.random.SeedSequence, n_per_class: int) -> str:
+    """Generate a chunk and format it as CSV text (no header) in the worker."""
+    return generate_synthetic_chunk(seed_seq, n_per_class).to_csv(header=False, index=False)
+
+
+def iter_synthetic_chunks(
+    n_per_class: int,
+    seed: int = 42,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+    render=generate_synthetic_chunk,
+):
+    """
+    Yield render(seed_seq, size) for every chunk, in order. With workers > 1,
+    chunks are produced in a process pool, at most 2 * workers in flight.
+    """
+    plan = chunk_plan(n_per_class, seed, chunk_rows)
+    if workers <= 1:
+        for seed_seq, size in plan:
+            yield render(seed_seq, size)
+        return
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for seed_seq, size in plan:
+            pending.append(pool.submit(render, seed_seq, size))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for fut in pending:
+            yield fut.result()
+
+
+def write_synthetic_dataset(
+    out_path: str,
+    n_per_class: int,
+    seed: int = 42,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+    fmt: str = "csv",
+) -> pd.Series:
+    """
+    Stream the columns-engine dataset to disk chunk by chunk.
+    For CSV, workers generate and format chunks and this process only appends
+    them in order; npy / parquet chunks are converted to schema dtypes here.
+    Output is written to a temporary path and renamed when complete.
+    Returns risk level counts.
+    """
+    if fmt == "csv":
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            f.write(",".join(FEATURE_COLUMNS + [TARGET_COLUMN]) + "\n")
+            for text in iter_synthetic_chunks(n_per_class, seed, chunk_rows, workers, render=_chunk_csv):
+                f.write(text)
+        os.replace(tmp_path, out_path)
+    else:
+        if fmt == "npy":
+            writer = NpyDatasetWriter(out_path, n_per_class * len(RISK_LEVELS))
+        else:
+            writer = ParquetDatasetWriter(out_path)
+        for chunk in iter_synthetic_chunks(n_per_class, seed, chunk_rows, workers):
+            writer.write(chunk)
+        writer.close()
+    return pd.Series(n_per_class, index=pd.Index(RISK_LEVELS, name=TARGET_COLUMN))
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic trekking dataset.")
+    parser.add_argument("--engine", choices=["rows", "columns"], default="rows")
     # Default: 200 samples per class = 600 rows total
-    n_per_class = 200
-    seed = 42
-    df = generate_synthetic_dataset(n_per_class=n_per_class, seed=seed)
-
-    raw_dir = os.path.join(PROJECT_ROOT, RAW_DATA_DIR)
-    os.makedirs(raw_dir, exist_ok=True)
-    out_path = os.path.join(raw_dir, "trekking_synthetic.csv")
-    df.to_csv(out_path, index=False)
-    print(f"Generated {len(df)} samples. Saved to {out_path}")
-    print("Risk level counts:")
-    print(df[TARGET_COLUMN].value_counts().to_string())
+    parser.add_argument("--n-per-class", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows per chunk (columns engine)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (columns engine)")
+    parser.add_argument("--format", choices=DATASET_FORMATS, default="csv",
+                        help="csv, or typed columnar npy / parquet")
+    parser.add_argument("--out", default=None, help="output path")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_to(args.profile):
+        raw_dir = os.path.join(PROJECT_ROOT, RAW_DATA_DIR)
+        os.makedirs(raw_dir, exist_ok=True)
+        out_path = args.out or os.path.join(raw_dir, "trekking_synthetic" + FORMAT_SUFFIX[args.format])
+        if args.engine == "rows":
+            df = generate_synthetic_dataset(n_per_class=args.n_per_class, seed=args.seed)
+            write_dataset(df, out_path, args.format)
+            counts = df[TARGET_COLUMN].value_counts()
+        else:
+            counts = write_synthetic_dataset(
+                out_path, args.n_per_class, seed=args.seed,
+                chunk_rows=args.chunk_rows, workers=args.workers, fmt=args.format,
+            )
+        print(f"Generated {int(counts.sum())} samples. Saved to {out_path}")
+        print("Risk level counts:")
+        print(counts.to_string())
 
 
 if __name__ == "__main__":
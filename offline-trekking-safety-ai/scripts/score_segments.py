@@ -0,0 +1,252 @@
+"""
+Bulk offline scoring of segment files (CSV or Parquet).
+
+Streams the input in chunks of chunk_rows and fans them out to a process pool;
+each worker loads the model once (pool initializer) and scores its chunk with
+prediction.explain.predict_explain_batch. Output keeps the input columns and
+adds risk_level, one p_<class> column per class and reasons ("; "-separated).
+Every chunk is checked against the feature schema in one vectorised pass
+(config/validation.py): --validation clip (default) scores out-of-range values
+as their nearest in-range value, reject stops at the first chunk with a bad
+row, flag scores values as given and adds a schema_violations column.
+
+Each scored chunk is written by its worker as a numbered part file (temp file,
+then rename, so a part exists only when complete) in `<output>.parts/`, which
+also holds a checkpoint (input file size and mtime, chunk size, model version).
+A rerun with the same arguments skips the parts already written; when all
+chunks are done the parts are joined in input order into the output file and
+the parts directory is removed. The output format follows its suffix
+(.parquet needs pyarrow).
+
+Run from project root:
+    python scripts/score_segments.py segments.csv scored.csv
+    python scripts/score_segments.py region.parquet scored.parquet --workers 8 --chunk-rows 200000
+    python scripts/score_segments.py segments.csv audited.csv --validation flag
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import TARGET_COLUMN
+from config.validation import VALIDATION_MODES, SchemaValidationError, get_validator
+from prediction.profiling import add_profile_argument, profile_to
+
+DEFAULT_CHUNK_ROWS = 100_000
+CHECKPOINT_FILENAME = "checkpoint.json"
+REASON_SEPARATOR = "; "
+
+
+def output_format(path: str) -> str:
+    return "parquet" if path.endswith(".parquet") else "csv"
+
+
+def iter_input_chunks(path: str, chunk_rows: int, skip_chunks: int = 0):
+    """Yield DataFrames of up to chunk_rows rows, after skipping the first skip_chunks chunks."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet input needs pyarrow: pip install pyarrow") from None
+        for i, batch in enumerate(pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)):
+            if i >= skip_chunks:
+                yield batch.to_pandas()
+        return
+    skip = range(1, 1 + skip_chunks * chunk_rows) if skip_chunks else None
+    yield from pd.read_csv(path, chunksize=chunk_rows, skiprows=skip)
+
+
+def empty_input_frame(path: str) -> pd.DataFrame:
+    """Zero-row DataFrame with the input's columns (for inputs that have no rows)."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).empty_table().to_pandas()
+    return pd.read_csv(path, nrows=0)
+
+
+def score_frame(df: pd.DataFrame, validation: str = "clip") -> pd.DataFrame:
+    """
+    Input columns plus risk_level, p_<class> and reasons (and schema_violations
+    in flag mode). Rows the validation mode rejects raise SchemaValidationError.
+    """
+    from prediction.explain import predict_explain_batch
+
+    X, report = get_validator().validate(df, validation)
+    labels, proba, classes, reasons = predict_explain_batch(X)
+    out = df.drop(columns=[TARGET_COLUMN], errors="ignore")
+    out[TARGET_COLUMN] = labels.astype(str)
+    if proba is not None:
+        for j, cls in enumerate(classes):
+            out[f"p_{cls}"] = proba[:, j]
+    out["reasons"] = [REASON_SEPARATOR.join(r) for r in reasons]
+    if validation == "flag":
+        violations = [""] * len(out)
+        for i in report.invalid.nonzero()[0].tolist():
+            violations[i] = REASON_SEPARATOR.join(report.row_problems(i))
+        out["schema_violations"] = violations
+    return out
+
+
+def part_path(parts_dir: str, index: int, fmt: str) -> str:
+    return os.path.join(parts_dir, f"part-{index:06d}.{fmt}")
+
+
+def write_part(df: pd.DataFrame, parts_dir: str, index: int, fmt: str, validation: str = "clip") -> int:
+    """Score one chunk and write it as part `index` (only part 0 has the CSV header). Returns its row count."""
+    try:
+        scored = score_frame(df, validation)
+    except SchemaValidationError as e:
+        raise ValueError(f"chunk {index}: {e}") from None
+    path = part_path(parts_dir, index, fmt)
+    if fmt == "parquet":
+        scored.to_parquet(path + ".tmp", index=False)
+    else:
+        scored.to_csv(path + ".tmp", header=index == 0, index=False)
+    os.replace(path + ".tmp", path)
+    return len(scored)
+
+
+def _init_worker() -> None:
+    """Load the model once per worker process."""
+    from prediction.registry import get_registry
+
+    get_registry().get()
+
+
+def completed_parts(parts_dir: str, fmt: str) -> int:
+    """Number of consecutive finished parts from the first one."""
+    n = 0
+    while os.path.exists(part_path(parts_dir, n, fmt)):
+        n += 1
+    return n
+
+
+def open_checkpoint(input_path: str, output_path: str, chunk_rows: int, restart: bool = False,
+                    validation: str = "clip") -> tuple:
+    """
+    (parts directory, chunks already scored). Raises ValueError when existing
+    parts come from a different input, chunk size, model or validation mode
+    (use restart).
+    """
+    from prediction.registry import get_registry
+
+    stat = os.stat(input_path)
+    expected = {
+        "input": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunk_rows": chunk_rows,
+        "model_version": get_registry().get().version,
+        "validation": validation,
+    }
+    parts_dir = output_path + ".parts"
+    checkpoint = os.path.join(parts_dir, CHECKPOINT_FILENAME)
+    if restart:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            found = json.load(f)
+        if found != expected:
+            changed = sorted(k for k in expected if found.get(k) != expected[k])
+            raise ValueError(f"Checkpoint in {parts_dir} does not match ({', '.join(changed)} changed); "
+                             "rerun with --restart")
+        return parts_dir, completed_parts(parts_dir, output_format(output_path))
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(checkpoint + ".tmp", "w") as f:
+        json.dump(expected, f, indent=2)
+    os.replace(checkpoint + ".tmp", checkpoint)
+    return parts_dir, 0
+
+
+def join_parts(parts_dir: str, output_path: str, n_parts: int) -> None:
+    """Concatenate the parts in order into output_path (temp file, then rename)."""
+    fmt = output_format(output_path)
+    tmp = output_path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = None
+        for i in range(n_parts):
+            table = pq.read_table(part_path(parts_dir, i, fmt))
+            writer = writer or pq.ParquetWriter(tmp, table.schema)
+            # CSV chunks can infer a column as int in one chunk and float in another
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    else:
+        with open(tmp, "wb") as out:
+            for i in range(n_parts):
+                with open(part_path(parts_dir, i, fmt), "rb") as part:
+                    shutil.copyfileobj(part, out)
+    os.replace(tmp, output_path)
+    shutil.rmtree(parts_dir)
+
+
+def score_file(input_path: str, output_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, workers: int = 1,
+               restart: bool = False, validation: str = "clip") -> dict:
+    """Score input_path into output_path, resuming from earlier parts. Returns a summary."""
+    t0 = time.perf_counter()
+    fmt = output_format(output_path)
+    parts_dir, done = open_checkpoint(input_path, output_path, chunk_rows, restart, validation)
+    chunks = enumerate(iter_input_chunks(input_path, chunk_rows, done), start=done)
+    rows = 0
+    if workers <= 1:
+        for i, df in chunks:
+            rows += write_part(df, parts_dir, i, fmt, validation)
+    else:
+        window = 2 * workers
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = []
+            for i, df in chunks:
+                pending.append(pool.submit(write_part, df, parts_dir, i, fmt, validation))
+                if len(pending) >= window:
+                    rows += pending.pop(0).result()
+            for fut in pending:
+                rows += fut.result()
+    n_parts = completed_parts(parts_dir, fmt)
+    if n_parts == 0:
+        # No rows at all: still write one empty part so the output has its header / schema
+        write_part(empty_input_frame(input_path), parts_dir, 0, fmt, validation)
+        n_parts = 1
+    join_parts(parts_dir, output_path, n_parts)
+    seconds = time.perf_counter() - t0
+    return {"chunks": n_parts, "resumed_chunks": done, "rows_scored": rows, "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds else 0.0, "output": output_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV / Parquet file of segments in bulk.")
+    parser.add_argument("input", help="segments in FEATURE_COLUMNS layout (.csv or .parquet)")
+    parser.add_argument("output", help="scored output (.csv or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--restart", action="store_true", help="discard parts from an earlier run")
+    parser.add_argument("--validation", choices=VALIDATION_MODES, default="clip",
+                        help="feature values outside the schema: clip into range (default), "
+                             "reject the file, or flag them in a schema_violations column")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_to(args.profile):
+        try:
+            summary = score_file(args.input, args.output, args.chunk_rows, args.workers, args.restart,
+                                 args.validation)
+        except (FileNotFoundError, ImportError, ValueError) as e:
+            sys.exit(f"Error: {e}")
+        resumed = f" ({summary['resumed_chunks']} chunks from an earlier run)" if summary["resumed_chunks"] else ""
+        print(f"Scored {summary['rows_scored']:,} rows in {summary['seconds']:.2f} s "
+              f"({summary['rows_per_second']:,.0f} rows/s, {args.workers} workers){resumed} -> {summary['output']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Monte Carlo risk forecast along a trek (offline).
+
+Rolls out n_paths correlated weather trajectories over the trek and scores
+every (trajectory, segment, timestep) cell with the model:
+
+- weather: weather_severity and visibility_km follow a bivariate AR(1)
+  process in a latent Gaussian space (correlation time tau_hours, bad weather
+  and low visibility correlated by `rho`), mapped onto the marginal
+  distributions of the weather simulator (generate_weather_columns), so the
+  long-run mix of conditions is exactly what the simulator generates. An
+  observed starting state can be given.
+- terrain: slope / altitude change per segment from a GPX / GeoJSON track
+  (geo.route_ingest), or a synthetic route from the terrain simulator.
+- scoring: the forest is constant between its visibility split thresholds and
+  severity takes five values, so one batched model call over
+  (segment x severity x visibility interval) gives the risk of every cell
+  exactly; trajectories then only index into that grid.
+
+Trajectories are simulated in chunks (one SeedSequence each, so results do
+not depend on the number of workers) and chunks run in a process pool.
+
+Result per time window: probability that the hiker following the plan (at
+speed_kmh from the start) meets High_Risk during the window, the probability
+of having met it by the end of the window, and per segment the probability of
+being High_Risk at some point in the window.
+
+Run from project root:
+    python simulation/forecast.py --route maps/my_trek.gpx --paths 10000 --hours 12
+    python simulation/forecast.py --segments 150 --start-severity 3 --start-visibility 4 --json forecast.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, RISK_LEVELS
+from simulation.terrain_simulator import generate_terrain_columns
+from simulation.weather_simulator import generate_weather_columns
+
+HIGH_RISK = RISK_LEVELS[-1]
+DEFAULT_PATHS = 10_000
+DEFAULT_HOURS = 12.0
+DEFAULT_STEP_MIN = 15.0
+DEFAULT_WINDOW_HOURS = 1.0
+DEFAULT_SPEED_KMH = 3.0
+DEFAULT_TAU_HOURS = 3.0
+DEFAULT_RHO = -0.6
+DEFAULT_CHUNK_PATHS = 1000
+
+# Standard normal CDF on a fine grid; np.interp gives Phi and its inverse without scipy
+_Z_GRID = np.linspace(-8.0, 8.0, 4001)
+_PHI_GRID = np.array([0.5 * math.erfc(-z / math.sqrt(2.0)) for z in _Z_GRID])
+_QUANTILE_POINTS = 4096
+
+
+def normal_cdf(z) -> np.ndarray:
+    return np.interp(z, _Z_GRID, _PHI_GRID)
+
+
+def normal_ppf(p) -> np.ndarray:
+    return np.interp(p, _PHI_GRID, _Z_GRID)
+
+
+# --- Weather model ---
+
+def weather_marginals(risk_bias: str = "neutral", seed: int = 0, n: int = 200_000) -> dict:
+    """Quantile tables (uniform -> value) of the weather simulator's columns."""
+    sample = generate_weather_columns(np.random.default_rng(seed), n, risk_bias)
+    probs = (np.arange(_QUANTILE_POINTS) + 0.5) / _QUANTILE_POINTS
+    return {
+        name: np.quantile(np.asarray(values, dtype=np.float64), probs, method="inverted_cdf")
+        for name, values in sample.items()
+    }
+
+
+def _from_uniform(table: np.ndarray, u: np.ndarray) -> np.ndarray:
+    return table[np.minimum((u * len(table)).astype(np.intp), len(table) - 1)]
+
+
+def _latent_start(table: np.ndarray, value: float) -> float:
+    """Latent value whose mapped weather equals `value` (middle of its quantile range)."""
+    lo, hi = np.mean(table < value), np.mean(table <= value)
+    return float(normal_ppf(np.clip((lo + hi) / 2, 1e-4, 1 - 1e-4)))
+
+
+def simulate_weather(rng, n_paths: int, n_steps: int, marginals: dict, phi: float, rho: float,
+                     start: dict = None) -> tuple:
+    """
+    (weather_severity, visibility_km) arrays of shape (n_paths, n_steps).
+    Latent z_t = phi * z_{t-1} + sqrt(1 - phi^2) * e_t with e_t ~ N(0, [[1, rho], [rho, 1]]).
+    """
+    chol = np.linalg.cholesky(np.array([[1.0, rho], [rho, 1.0]]))
+    z = rng.standard_normal((n_paths, 2)) @ chol.T
+    start = start or {}
+    for j, name in enumerate(("weather_severity", "visibility_km")):
+        if start.get(name) is not None:
+            z[:, j] = _latent_start(marginals[name], start[name])
+    latent = np.empty((n_steps, n_paths, 2))
+    latent[0] = z
+    scale = math.sqrt(1.0 - phi * phi)
+    for t in range(1, n_steps):
+        z = phi * z + scale * (rng.standard_normal((n_paths, 2)) @ chol.T)
+        latent[t] = z
+    u = normal_cdf(latent)
+    severity = _from_uniform(marginals["weather_severity"], u[..., 0]).T
+    visibility = _from_uniform(marginals["visibility_km"], u[..., 1]).T
+    return severity, visibility
+
+
+# --- Route and risk grid ---
+
+def route_segments(track_path: str = None, n_segments: int = 100, terrain_bias: str = "neutral",
+                   segment_length_m: float = 200.0, conditions: dict = None, seed: int = 0) -> dict:
+    """
+    Per-segment terrain columns (slope_angle, altitude_change, trail_difficulty,
+    path_width_m) and start_m, from a track file or the terrain simulator.
+    trail_difficulty / path_width_m in `conditions` apply to every segment on
+    either source (a track file has no such columns: defaults fill in).
+    """
+    if track_path:
+        from geo.route_ingest import DEFAULT_CONDITIONS, iter_segments, iter_track_points
+
+        conds = {**DEFAULT_CONDITIONS, **(conditions or {})}
+        segs = list(iter_segments(iter_track_points(track_path), segment_length_m))
+        if not segs:
+            raise ValueError(f"No segments in {track_path}")
+        return {
+            "slope_angle": np.array([s.slope_angle for s in segs]),
+            "altitude_change": np.array([s.altitude_change for s in segs]),
+            "trail_difficulty": np.full(len(segs), conds["trail_difficulty"], dtype=np.float64),
+            "path_width_m": np.full(len(segs), conds["path_width_m"], dtype=np.float64),
+            "start_m": np.array([s.start_m for s in segs]),
+        }
+    terrain = generate_terrain_columns(np.random.default_rng(seed), n_segments, terrain_bias)
+    columns = {k: np.asarray(v, dtype=np.float64) for k, v in terrain.items()}
+    for name in ("trail_difficulty", "path_width_m"):
+        if (conditions or {}).get(name) is not None:
+            columns[name] = np.full(n_segments, conditions[name], dtype=np.float64)
+    return {**columns, "start_m": np.arange(n_segments) * segment_length_m}
+
+
+def risk_grid(segments: dict, severities: np.ndarray) -> tuple:
+    """
+    High_Risk flag for every (segment, severity, visibility interval), from one
+    batched model call; plus the visibility split thresholds that define the
+    intervals. Exact because the forest is constant inside each interval.
+    """
+    from prediction.lookup_table import interval_representatives, split_edges
+    from prediction.predictor import predict_risk_batch
+    from prediction.registry import get_registry
+
+    compiled = get_registry().get().compiled
+    if compiled is None:
+        raise ValueError("Forecasting needs a tree model (compiled forest)")
+    vis_edges = split_edges(compiled)[compiled.features.index("visibility_km")]
+    vis_values = interval_representatives(vis_edges).astype(np.float64)
+    n_seg = len(segments["start_m"])
+    s_idx, w_idx, v_idx = np.meshgrid(np.arange(n_seg), np.arange(len(severities)), np.arange(len(vis_values)),
+                                      indexing="ij")
+    columns = {name: segments[name][s_idx.ravel()] for name in ("slope_angle", "altitude_change",
+                                                                "trail_difficulty", "path_width_m")}
+    columns["weather_severity"] = severities[w_idx.ravel()]
+    columns["visibility_km"] = vis_values[v_idx.ravel()]
+    labels, _, _ = predict_risk_batch({k: columns[k] for k in FEATURE_COLUMNS})
+    high = (labels.astype(str) == HIGH_RISK).reshape(n_seg, len(severities), len(vis_values))
+    return high, vis_edges
+
+
+def hiker_plan(start_m: np.ndarray, n_steps: int, step_hours: float, speed_kmh: float) -> np.ndarray:
+    """Segment the hiker is on at each timestep, -1 once the route is finished."""
+    distance = np.arange(n_steps) * step_hours * speed_kmh * 1000.0
+    seg = np.searchsorted(start_m, distance, side="right") - 1
+    route_end = start_m[-1] + (start_m[-1] - start_m[-2] if len(start_m) > 1 else 200.0)
+    return np.where(distance < route_end, seg, -1)
+
+
+# --- Monte Carlo ---
+
+def _simulate_chunk(seed_seq, n_paths: int, params: dict) -> dict:
+    """Counts for one chunk of trajectories (runs in a worker process)."""
+    rng = np.random.default_rng(seed_seq)
+    severity, visibility = simulate_weather(
+        rng, n_paths, params["n_steps"], params["marginals"], params["phi"], params["rho"], params["start"]
+    )
+    sev_idx = np.searchsorted(params["severities"], severity)
+    # Same float32 comparison as the forest: interval = number of thresholds below the value
+    vis_idx = np.searchsorted(params["vis_edges"], visibility.astype(np.float32).astype(np.float64), side="left")
+    high = params["high"]  # (segments, severities, visibility intervals)
+    # (paths, steps, segments): High_Risk for every cell
+    cells = high[:, sev_idx, vis_idx].transpose(1, 2, 0)
+    n_windows, per_window = params["n_windows"], params["steps_per_window"]
+    by_window = cells[:, : n_windows * per_window].reshape(n_paths, n_windows, per_window, -1).any(axis=2)
+
+    plan = params["plan"]
+    on_route = plan >= 0
+    plan_high = np.zeros((n_paths, len(plan)), dtype=bool)
+    plan_high[:, on_route] = cells[:, np.flatnonzero(on_route), plan[on_route]]
+    plan_window = plan_high[:, : n_windows * per_window].reshape(n_paths, n_windows, per_window).any(axis=2)
+    return {
+        "segment_high": by_window.sum(axis=0),
+        "plan_high": plan_window.sum(axis=0),
+        "plan_reached": np.logical_or.accumulate(plan_window, axis=1).sum(axis=0),
+    }
+
+
+def forecast(segments: dict, n_paths: int = DEFAULT_PATHS, hours: float = DEFAULT_HOURS,
+             step_min: float = DEFAULT_STEP_MIN, window_hours: float = DEFAULT_WINDOW_HOURS,
+             speed_kmh: float = DEFAULT_SPEED_KMH, tau_hours: float = DEFAULT_TAU_HOURS,
+             rho: float = DEFAULT_RHO, weather_bias: str = "neutral", start: dict = None,
+             seed: int = 42, workers: int = 1, chunk_paths: int = DEFAULT_CHUNK_PATHS) -> dict:
+    """Run the Monte Carlo forecast; returns per-window probabilities (see module docstring)."""
+    t0 = time.perf_counter()
+    step_hours = step_min / 60.0
+    steps_per_window = max(1, int(round(window_hours / step_hours)))
+    n_windows = max(1, int(math.ceil(hours / (steps_per_window * step_hours))))
+    n_steps = n_windows * steps_per_window
+    marginals = weather_marginals(weather_bias)
+    severities = np.unique(marginals["weather_severity"])
+    high, vis_edges = risk_grid(segments, severities)
+    params = {
+        "n_steps": n_steps,
+        "marginals": marginals,
+        "phi": math.exp(-step_hours / tau_hours),
+        "rho": rho,
+        "start": start,
+        "severities": severities,
+        "vis_edges": vis_edges,
+        "high": high,
+        "plan": hiker_plan(segments["start_m"], n_steps, step_hours, speed_kmh),
+        "n_windows": n_windows,
+        "steps_per_window": steps_per_window,
+    }
+    sizes = [min(chunk_paths, n_paths - i) for i in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers <= 1:
+        parts = [_simulate_chunk(s, n, params) for s, n in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, seeds, sizes, [params] * len(sizes)))
+    totals = {k: sum(p[k] for p in parts) for k in parts[0]}
+
+    window_h = steps_per_window * step_hours
+    return {
+        "paths": n_paths,
+        "segments": int(len(segments["start_m"])),
+        "cells_scored": n_paths * n_steps * int(len(segments["start_m"])),
+        "grid_rows_scored": int(high.size),
+        "seconds": time.perf_counter() - t0,
+        "windows": [
+            {
+                "start_h": w * window_h,
+                "end_h": (w + 1) * window_h,
+                "p_high_on_plan": float(totals["plan_high"][w] / n_paths),
+                "p_high_reached_by_end": float(totals["plan_reached"][w] / n_paths),
+                "p_high_by_segment": (totals["segment_high"][w] / n_paths).round(4).tolist(),
+            }
+            for w in range(n_windows)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo risk forecast along a trek.")
+    parser.add_argument("--route", help="GPX / GeoJSON track (default: synthetic route from the terrain simulator)")
+    parser.add_argument("--segments", type=int, default=100, help="segments of the synthetic route")
+    parser.add_argument("--terrain-bias", default="neutral", choices=["safe", "neutral", "high_risk"])
+    parser.add_argument("--weather-bias", default="neutral", choices=["safe", "neutral", "high_risk"])
+    parser.add_argument("--trail-difficulty", type=int, default=None,
+                        help="for every segment (default: simulated, or 2 on a --route track)")
+    parser.add_argument("--path-width", type=float, default=None,
+                        help="for every segment (default: simulated, or 2.0 on a --route track)")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS)
+    parser.add_argument("--step-min", type=float, default=DEFAULT_STEP_MIN)
+    parser.add_argument("--window-hours", type=float, default=DEFAULT_WINDOW_HOURS)
+    parser.add_argument("--speed-kmh", type=float, default=DEFAULT_SPEED_KMH)
+    parser.add_argument("--tau-hours", type=float, default=DEFAULT_TAU_HOURS, help="weather correlation time")
+    parser.add_argument("--start-severity", type=int, default=None, help="observed weather severity now")
+    parser.add_argument("--start-visibility", type=float, default=None, help="observed visibility (km) now")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="write the full result (per-segment probabilities) here")
+    args = parser.parse_args()
+
+    try:
+        conditions = {k: v for k, v in (("trail_difficulty", args.trail_difficulty),
+                                        ("path_width_m", args.path_width)) if v is not None}
+        segments = route_segments(args.route, args.segments, args.terrain_bias,
+                                  conditions=conditions, seed=args.seed)
+        result = forecast(
+            segments, args.paths, args.hours, args.step_min, args.window_hours, args.speed_kmh,
+            args.tau_hours, weather_bias=args.weather_bias,
+            start={"weather_severity": args.start_severity, "visibility_km": args.start_visibility},
+            seed=args.seed, workers=args.workers,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    print(f"{result['paths']} paths x {result['segments']} segments: {result['cells_scored']:,} cells "
+          f"({result['grid_rows_scored']:,} distinct model rows) in {result['seconds']:.2f} s")
+    print(f"{'window':>13} {'P(High on plan)':>16} {'P(reached by end)':>18} {'max segment P':>14}")
+    for w in result["windows"]:
+        print(f"{w['start_h']:5.1f}-{w['end_h']:5.1f} h {w['p_high_on_plan']:>16.3f} "
+              f"{w['p_high_reached_by_end']:>18.3f} {max(w['p_high_by_segment']):>14.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print("Forecast saved to", args.json)
+
+
+if __name__ == "__main__":
+    main()
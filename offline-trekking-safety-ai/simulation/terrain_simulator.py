@@ -64,3 +64,56 @@ def generate_terrain_row(rng: np.random.Generator, risk_bias: str = "neutral") -
         "trail_difficulty": generate_trail_difficulty(rng, risk_bias),
         "path_width_m": generate_path_width(rng, risk_bias),
     }
+
+
+# --- Column generators: same distributions as above, `size` draws per call ---
+
+def generate_slope_angles(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_slope_angle."""
+    if risk_bias == "safe":
+        return rng.uniform(0, 15, size)
+    if risk_bias == "high_risk":
+        return rng.uniform(25, 45, size)
+    return rng.uniform(0, 45, size)
+
+
+def generate_altitude_changes(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_altitude_change."""
+    if risk_bias == "safe":
+        return rng.uniform(-200, 200, size)
+    if risk_bias == "high_risk":
+        # Large gain or drop, sign chosen per row
+        magnitude = rng.uniform(300, 500, size)
+        return np.where(rng.random(size) > 0.5, magnitude, -magnitude)
+    return rng.uniform(-500, 500, size)
+
+
+def generate_trail_difficulties(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_trail_difficulty."""
+    if risk_bias == "safe":
+        return rng.integers(1, 3, size)
+    if risk_bias == "high_risk":
+        return rng.integers(4, 6, size)
+    return rng.integers(1, 6, size)
+
+
+def generate_path_widths(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_path_width."""
+    if risk_bias == "safe":
+        return rng.uniform(2.0, 5.0, size)
+    if risk_bias == "high_risk":
+        return rng.uniform(0.5, 1.5, size)
+    return rng.uniform(0.5, 5.0, size)
+
+
+def generate_terrain_columns(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> dict:
+    """
+    Generate `size` rows of terrain features at once, as a dict of arrays.
+    Same distributions as generate_terrain_row (not the same random stream).
+    """
+    return {
+        "slope_angle": generate_slope_angles(rng, size, risk_bias),
+        "altitude_change": generate_altitude_changes(rng, size, risk_bias),
+        "trail_difficulty": generate_trail_difficulties(rng, size, risk_bias),
+        "path_width_m": generate_path_widths(rng, size, risk_bias),
+    }
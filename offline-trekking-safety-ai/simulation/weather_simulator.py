@@ -38,3 +38,31 @@ def generate_weather_row(rng: np.random.Generator, risk_bias: str = "neutral") -
         "weather_severity": generate_weather_severity(rng, risk_bias),
         "visibility_km": generate_visibility_km(rng, risk_bias),
     }
+
+
+# --- Column generators: same distributions as above, `size` draws per call ---
+
+def generate_weather_severities(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_weather_severity."""
+    if risk_bias == "safe":
+        return rng.integers(1, 3, size)
+    if risk_bias == "high_risk":
+        return rng.integers(4, 6, size)
+    return rng.integers(1, 6, size)
+
+
+def generate_visibilities_km(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> np.ndarray:
+    """Array version of generate_visibility_km."""
+    if risk_bias == "safe":
+        return rng.uniform(5.0, 20.0, size)
+    if risk_bias == "high_risk":
+        return rng.uniform(0.1, 2.0, size)
+    return rng.uniform(0.1, 20.0, size)
+
+
+def generate_weather_columns(rng: np.random.Generator, size: int, risk_bias: str = "neutral") -> dict:
+    """Generate `size` rows of weather features at once, as a dict of arrays."""
+    return {
+        "weather_severity": generate_weather_severities(rng, size, risk_bias),
+        "visibility_km": generate_visibilities_km(rng, size, risk_bias),
+    }
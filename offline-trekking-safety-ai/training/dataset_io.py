@@ -0,0 +1,156 @@
+"""
+Dataset storage formats for training (offline).
+
+Besides CSV, the dataset can be stored column-wise with the dtypes from
+config/schema.py (float32 features, int8 1-5 scales, int8 risk_level codes):
+
+  npy     - a directory with one .npy file per column plus meta.json;
+            loaded with np.load(mmap_mode="r"), so nothing is parsed or copied
+  parquet - a single Parquet file (needs the optional pyarrow package)
+
+read_dataset() picks the reader from the path.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import (
+    FEATURE_COLUMNS,
+    FEATURE_DTYPES,
+    TARGET_COLUMN,
+    TARGET_CODE_DTYPE,
+    RISK_LEVELS,
+)
+
+DATASET_FORMATS = ("csv", "npy", "parquet")
+NPY_META_FILENAME = "meta.json"
+FORMAT_SUFFIX = {"csv": ".csv", "npy": ".npy", "parquet": ".parquet"}
+
+
+def typed_columns(df: pd.DataFrame) -> dict:
+    """Convert a dataset frame to schema dtypes: column name -> NumPy array."""
+    columns = {col: df[col].to_numpy(dtype=FEATURE_DTYPES[col]) for col in FEATURE_COLUMNS}
+    codes = pd.Categorical(df[TARGET_COLUMN], categories=RISK_LEVELS).codes
+    if (codes < 0).any():
+        raise ValueError(f"Unknown {TARGET_COLUMN} values (expected one of {RISK_LEVELS})")
+    columns[TARGET_COLUMN] = codes.astype(TARGET_CODE_DTYPE)
+    return columns
+
+
+class NpyDatasetWriter:
+    """
+    Write a dataset of known length as one preallocated .npy per column,
+    chunk by chunk. Files are written into `<path>.tmp` and renamed on close().
+    """
+
+    def __init__(self, path: str, n_rows: int):
+        self.path = path
+        self.n_rows = n_rows
+        self.offset = 0
+        self._tmp = path + ".tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._arrays = {}
+        for col in FEATURE_COLUMNS + [TARGET_COLUMN]:
+            dtype = FEATURE_DTYPES.get(col, TARGET_CODE_DTYPE)
+            self._arrays[col] = np.lib.format.open_memmap(
+                os.path.join(self._tmp, col + ".npy"), mode="w+", dtype=dtype, shape=(n_rows,)
+            )
+
+    def write(self, df: pd.DataFrame) -> None:
+        end = self.offset + len(df)
+        if end > self.n_rows:
+            raise ValueError(f"Writer sized for {self.n_rows} rows, got {end}")
+        for col, values in typed_columns(df).items():
+            self._arrays[col][self.offset:end] = values
+        self.offset = end
+
+    def close(self) -> None:
+        if self.offset != self.n_rows:
+            raise ValueError(f"Expected {self.n_rows} rows, wrote {self.offset}")
+        for arr in self._arrays.values():
+            arr.flush()
+        self._arrays = {}
+        meta = {
+            "rows": self.n_rows,
+            "features": FEATURE_COLUMNS,
+            "dtypes": FEATURE_DTYPES,
+            "target": TARGET_COLUMN,
+            "target_categories": RISK_LEVELS,
+        }
+        with open(os.path.join(self._tmp, NPY_META_FILENAME), "w") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+
+
+class ParquetDatasetWriter:
+    """Write a dataset to Parquet one row group per chunk (requires pyarrow)."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from None
+        self._pa = pa
+        self.path = path
+        self._tmp = path + ".tmp"
+        fields = [pa.field(col, pa.from_numpy_dtype(np.dtype(FEATURE_DTYPES[col]))) for col in FEATURE_COLUMNS]
+        fields.append(pa.field(TARGET_COLUMN, pa.dictionary(pa.int8(), pa.string())))
+        self._schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(self._tmp, self._schema)
+
+    def write(self, df: pd.DataFrame) -> None:
+        pa = self._pa
+        columns = typed_columns(df)
+        arrays = [pa.array(columns[col]) for col in FEATURE_COLUMNS]
+        arrays.append(pa.DictionaryArray.from_arrays(pa.array(columns[TARGET_COLUMN]), pa.array(RISK_LEVELS)))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+
+
+def write_dataset(df: pd.DataFrame, path: str, fmt: str = "csv") -> str:
+    """Write a whole in-memory dataset in the given format."""
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return path
+    writer = NpyDatasetWriter(path, len(df)) if fmt == "npy" else ParquetDatasetWriter(path)
+    writer.write(df)
+    writer.close()
+    return path
+
+
+def load_npy_dataset(path: str, mmap: bool = True) -> pd.DataFrame:
+    """
+    Load an npy dataset directory. With mmap=True every column (including the
+    risk_level codes) is a read-only view of the memory-mapped file.
+    """
+    with open(os.path.join(path, NPY_META_FILENAME)) as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    columns = {col: np.load(os.path.join(path, col + ".npy"), mmap_mode=mode) for col in meta["features"]}
+    codes = np.load(os.path.join(path, meta["target"] + ".npy"), mmap_mode=mode)
+    target = pd.Categorical.from_codes(codes, categories=meta["target_categories"])
+    columns[meta["target"]] = pd.Series(target, copy=False)
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    """Read a dataset written in any supported format (chosen by path)."""
+    if os.path.isdir(path):
+        return load_npy_dataset(path)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_csv(path)
@@ -0,0 +1,188 @@
+"""
+Incremental model updates from newly logged segments (offline).
+
+Instead of refitting on the whole dataset, grow_forest() fits a few new trees
+on the new labelled segments plus a replay sample of stored rows (so the new
+trees still see every class and earlier conditions) and adds them to the saved
+RandomForest with sklearn's warm_start. With max_trees the oldest trees are
+dropped, so the forest (and prediction latency) stays bounded.
+
+update_model() also appends the new rows to the stored dataset and saves the
+model through train_model.save_model: temp file + rename, so a running server
+(prediction.registry) swaps to it atomically, plus a lineage record (kind
+"incremental", parent version, rows added) in model/lineage.json.
+Run training/train_model.py now and then for a full refit on everything.
+
+Run from project root:
+    python training/incremental.py logged_segments.csv
+    python training/incremental.py logged_segments.csv --trees 10 --max-trees 100
+    python training/incremental.py logged_segments.csv --validation clip
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+# Project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import (
+    FEATURE_COLUMNS,
+    TARGET_COLUMN,
+    RISK_LEVELS,
+    RAW_DATA_DIR,
+    MODEL_DIR,
+    DEFAULT_MODEL_FILENAME,
+)
+from config.validation import VALIDATION_MODES, validate_frame
+from prediction.profiling import add_profile_argument, profile_to
+from training.dataset_io import DATASET_FORMATS, FORMAT_SUFFIX, read_dataset, write_dataset
+from training.train_model import read_lineage, save_model
+
+DEFAULT_NEW_TREES = 10
+DEFAULT_REPLAY_RATIO = 1.0
+
+
+def dataset_path(fmt: str = "csv") -> str:
+    return os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic" + FORMAT_SUFFIX[fmt])
+
+
+def validate_segments(df: pd.DataFrame, validation: str = "reject") -> pd.DataFrame:
+    """
+    Schema columns of logged segments; raises ValueError for missing columns,
+    unknown labels or (per the validation mode, see config/validation.py)
+    feature values outside FEATURE_RANGES.
+    """
+    missing = [c for c in FEATURE_COLUMNS + [TARGET_COLUMN] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns in new segments: {missing}")
+    unknown = sorted(set(df[TARGET_COLUMN].astype(str)) - set(RISK_LEVELS))
+    if unknown:
+        raise ValueError(f"Unknown {TARGET_COLUMN} values {unknown} (expected one of {RISK_LEVELS})")
+    df, report = validate_frame(df[FEATURE_COLUMNS + [TARGET_COLUMN]], validation)
+    if not report.ok:
+        print(f"Feature schema ({validation}): {report.summary()}", file=sys.stderr)
+    return df.reset_index(drop=True)
+
+
+def append_segments(new: pd.DataFrame, path: str, fmt: str = "csv") -> None:
+    """Append rows to the stored dataset: in place for CSV, rewritten (temp + rename) otherwise."""
+    if fmt == "csv":
+        new.to_csv(path, mode="a", header=False, index=False)
+        return
+    combined = pd.concat([read_dataset(path), new], ignore_index=True)
+    write_dataset(combined, path, fmt)
+
+
+def grow_forest(clf, X, y, n_new_trees: int = DEFAULT_NEW_TREES, max_trees: int = None,
+                random_state: int = None):
+    """
+    Fit n_new_trees on (X, y) and add them to clf in place (warm_start).
+    Every class the forest knows must appear in y, and no others, so the new
+    trees' probabilities line up with the old ones. With max_trees, the oldest
+    trees beyond that count are dropped. Returns clf.
+    """
+    if not isinstance(clf, RandomForestClassifier):
+        raise ValueError(
+            f"Incremental updates need a RandomForestClassifier, not {type(clf).__name__}; "
+            "run training/train_model.py for a full refit"
+        )
+    known, seen = set(map(str, clf.classes_)), set(map(str, np.unique(y)))
+    if known != seen:
+        raise ValueError(
+            f"Update rows must cover exactly the model's classes {sorted(known)}, got {sorted(seen)}; "
+            "use a larger replay sample"
+        )
+    params = {"warm_start": True, "n_estimators": len(clf.estimators_) + n_new_trees}
+    if random_state is not None:
+        # A fresh seed per update, so new trees never repeat an earlier update's bootstrap draws
+        params["random_state"] = random_state
+    clf.set_params(**params)
+    clf.fit(X, y)
+    clf.set_params(warm_start=False)
+    if max_trees and len(clf.estimators_) > max_trees:
+        clf.estimators_ = clf.estimators_[-max_trees:]
+        clf.n_estimators = max_trees
+    return clf
+
+
+def update_model(new: pd.DataFrame, n_new_trees: int = DEFAULT_NEW_TREES, max_trees: int = None,
+                 replay_ratio: float = DEFAULT_REPLAY_RATIO, fmt: str = "csv", append: bool = True,
+                 validation: str = "reject") -> dict:
+    """
+    Grow the saved model with new labelled segments, save the model (atomic
+    swap + lineage record), then append the segments to the stored dataset, so
+    a failed save does not leave them stored (and replayed) with no model
+    trained on them. Returns the record.
+    """
+    new = validate_segments(new, validation)
+    data_path = dataset_path(fmt)
+    if not os.path.exists(data_path):
+        raise FileNotFoundError("Dataset not found. Run scripts/generate_dataset.py first.")
+    stored = read_dataset(data_path)
+    with open(os.path.join(PROJECT_ROOT, MODEL_DIR, DEFAULT_MODEL_FILENAME), "rb") as f:
+        clf = pickle.load(f)["model"]
+
+    update_number = len(read_lineage())
+    n_replay = min(len(stored), int(round(replay_ratio * len(new))))
+    replay = stored.sample(n=n_replay, random_state=update_number) if n_replay else stored.iloc[:0]
+    train = pd.concat([new, replay[FEATURE_COLUMNS + [TARGET_COLUMN]]], ignore_index=True)
+    train[TARGET_COLUMN] = train[TARGET_COLUMN].astype(str)
+
+    accuracy_before = float(np.mean(clf.predict(new[FEATURE_COLUMNS]) == new[TARGET_COLUMN].astype(str)))
+    t0 = time.perf_counter()
+    grow_forest(clf, train[FEATURE_COLUMNS], train[TARGET_COLUMN], n_new_trees, max_trees,
+                random_state=update_number)
+    fit_seconds = time.perf_counter() - t0
+    accuracy_after = float(np.mean(clf.predict(new[FEATURE_COLUMNS]) == new[TARGET_COLUMN].astype(str)))
+
+    record = {
+        "rows_added": len(new),
+        "replay_rows": n_replay,
+        "rows_total": len(stored) + (len(new) if append else 0),
+        "trees_added": n_new_trees,
+        "fit_seconds": fit_seconds,
+        "new_rows_accuracy_before": accuracy_before,
+        "new_rows_accuracy_after": accuracy_after,
+    }
+    save_model(clf, train[FEATURE_COLUMNS], kind="incremental", lineage=record, y=train[TARGET_COLUMN])
+    if append:
+        append_segments(new, data_path, fmt)
+    return read_lineage()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the saved forest with newly logged segments.")
+    parser.add_argument("segments", help="CSV of new labelled segments (schema columns incl. risk_level)")
+    parser.add_argument("--trees", type=int, default=DEFAULT_NEW_TREES, help="trees to add (default 10)")
+    parser.add_argument("--max-trees", type=int, default=None, help="drop the oldest trees beyond this count")
+    parser.add_argument("--replay-ratio", type=float, default=DEFAULT_REPLAY_RATIO,
+                        help="stored rows sampled per new row for the new trees (default 1.0)")
+    parser.add_argument("--data-format", choices=DATASET_FORMATS, default="csv")
+    parser.add_argument("--no-append", action="store_true", help="do not add the rows to the stored dataset")
+    parser.add_argument("--validation", choices=VALIDATION_MODES, default="reject",
+                        help="rows outside the feature schema: stop (default), clip into range, or only report")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_to(args.profile):
+        try:
+            record = update_model(pd.read_csv(args.segments), args.trees, args.max_trees,
+                                  args.replay_ratio, args.data_format, append=not args.no_append,
+                                  validation=args.validation)
+        except (ValueError, FileNotFoundError) as e:
+            sys.exit(f"Error: {e}")
+        print(f"Model {record['version']} (parent {record['parent']}): {record['n_estimators']} trees, "
+              f"+{record['rows_added']} rows ({record['replay_rows']} replayed) in {record['fit_seconds']:.2f} s")
+        print(f"Accuracy on the new rows: {record['new_rows_accuracy_before']:.4f} -> "
+              f"{record['new_rows_accuracy_after']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Hyperparameter sweep for the risk model (offline).
+
+Grid or random search over model_type, n_estimators and max_depth. Candidates
+run in a process pool (one candidate per task, all cores by default) and are
+scored with stratified k-fold cross-validation. For every candidate the sweep
+records CV accuracy, fit time, pickled size and single-row inference latency
+(measured afterwards, one candidate at a time, through the compiled forest
+that serves predictions). Results go to model/sweep_leaderboard.csv and the
+Pareto-optimal model (accuracy vs latency) is saved as the served model.
+
+Run from project root:
+    python training/train_model.py --sweep grid
+    python training/train_model.py --sweep random --n-iter 12 --max-latency-ms 0.2
+"""
+
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import FEATURE_COLUMNS, TARGET_COLUMN, MODEL_DIR
+from prediction.compiled import compile_model
+from training.train_model import build_classifier, save_model
+
+SEARCH_SPACE = {
+    "model_type": ["random_forest", "decision_tree"],
+    "n_estimators": [10, 25, 50, 100, 200],
+    "max_depth": [4, 6, 8, 10, 14, None],
+}
+LEADERBOARD_FILENAME = "sweep_leaderboard.csv"
+
+
+def grid_candidates(space: dict = SEARCH_SPACE) -> list:
+    """Every combination in the search space (n_estimators is 1 for decision trees)."""
+    candidates = []
+    for model_type in space["model_type"]:
+        sizes = [1] if model_type == "decision_tree" else space["n_estimators"]
+        for n_estimators in sizes:
+            for max_depth in space["max_depth"]:
+                candidates.append(
+                    {"model_type": model_type, "n_estimators": n_estimators, "max_depth": max_depth}
+                )
+    return candidates
+
+
+def random_candidates(n_iter: int, seed: int = 42, space: dict = SEARCH_SPACE) -> list:
+    """n_iter distinct candidates drawn at random from the grid."""
+    grid = grid_candidates(space)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(n_iter, len(grid)), replace=False)
+    return [grid[i] for i in sorted(picks)]
+
+
+# Training data for pool workers, set once per process by _init_worker
+_X = None
+_y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def _evaluate(params: dict, folds: int, random_state: int) -> tuple:
+    """Cross-validate one candidate, then fit it on all data. Returns (record, pickled model)."""
+    skf = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    scores, fit_times = [], []
+    for train_idx, test_idx in skf.split(_X, _y):
+        clf = build_classifier(random_state=random_state, **params)
+        t0 = time.perf_counter()
+        clf.fit(_X[train_idx], _y[train_idx])
+        fit_times.append(time.perf_counter() - t0)
+        scores.append(float(np.mean(clf.predict(_X[test_idx]) == _y[test_idx])))
+    final = build_classifier(random_state=random_state, **params)
+    final.fit(_X, _y)
+    blob = pickle.dumps(final)
+    record = {
+        **params,
+        "cv_accuracy": float(np.mean(scores)),
+        "cv_accuracy_std": float(np.std(scores)),
+        "fit_seconds": float(np.mean(fit_times)),
+        "size_bytes": len(blob),
+    }
+    return record, blob
+
+
+def measure_latency_ms(clf, X: np.ndarray, repeat: int = 200) -> float:
+    """Median single-row latency in ms on the serving path (compiled forest)."""
+    try:
+        predict = compile_model(clf, FEATURE_COLUMNS).predict
+    except TypeError:
+        predict = clf.predict_proba
+    rows = X[: min(len(X), 50)]
+    times = []
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        t0 = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1e3)
+
+
+def pareto_mask(accuracy: np.ndarray, latency: np.ndarray) -> np.ndarray:
+    """True where no other candidate is at least as accurate and as fast (and better in one)."""
+    mask = np.ones(len(accuracy), dtype=bool)
+    for i in range(len(accuracy)):
+        dominated = (accuracy >= accuracy[i]) & (latency <= latency[i]) & (
+            (accuracy > accuracy[i]) | (latency < latency[i])
+        )
+        mask[i] = not dominated.any()
+    return mask
+
+
+def run_sweep(
+    df: pd.DataFrame,
+    search: str = "grid",
+    n_iter: int = 12,
+    folds: int = 5,
+    workers: int = None,
+    random_state: int = 42,
+    max_latency_ms: float = None,
+) -> pd.DataFrame:
+    """
+    Run the sweep, write the leaderboard and save the chosen model.
+    The chosen model is the most accurate Pareto-optimal candidate whose
+    latency is within max_latency_ms (if given). Returns the leaderboard.
+    """
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = df[TARGET_COLUMN].astype(str).to_numpy()
+    if search == "random":
+        candidates = random_candidates(n_iter, random_state)
+    else:
+        candidates = grid_candidates()
+    workers = workers or os.cpu_count() or 1
+    print(f"Sweeping {len(candidates)} candidates, {folds}-fold CV, {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        futures = [pool.submit(_evaluate, params, folds, random_state) for params in candidates]
+        results = [f.result() for f in futures]
+
+    # Latency is measured here, one model at a time, so workers don't skew it
+    records, models = [], []
+    for record, blob in results:
+        clf = pickle.loads(blob)
+        record["latency_ms"] = measure_latency_ms(clf, X)
+        records.append(record)
+        models.append(clf)
+
+    board = pd.DataFrame(records)
+    board["pareto"] = pareto_mask(board["cv_accuracy"].to_numpy(), board["latency_ms"].to_numpy())
+    eligible = board["pareto"].copy()
+    if max_latency_ms is not None:
+        eligible &= board["latency_ms"] <= max_latency_ms
+        if not eligible.any():
+            print(f"No candidate within {max_latency_ms} ms; using the fastest Pareto-optimal one")
+            eligible = board["pareto"] & (board["latency_ms"] == board.loc[board["pareto"], "latency_ms"].min())
+    best = board[eligible].sort_values(["cv_accuracy", "latency_ms"], ascending=[False, True]).index[0]
+    board["selected"] = board.index == best
+
+    board = board.sort_values(["cv_accuracy", "latency_ms"], ascending=[False, True])
+    out_path = os.path.join(PROJECT_ROOT, MODEL_DIR, LEADERBOARD_FILENAME)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    board.to_csv(out_path, index=False)
+    print(board.to_string(index=False))
+    print("Leaderboard saved to", out_path)
+
+    chosen = board.loc[best]
+    print(
+        f"Selected {chosen['model_type']} n_estimators={chosen['n_estimators']} "
+        f"max_depth={chosen['max_depth']}: cv_accuracy={chosen['cv_accuracy']:.4f}, "
+        f"latency={chosen['latency_ms']:.3f} ms"
+    )
+    save_model(models[best], df[FEATURE_COLUMNS], kind="sweep",
+               lineage={"rows": len(df), "cv_accuracy": float(chosen["cv_accuracy"])}, y=df[TARGET_COLUMN])
+    return board
@@ -3,14 +3,25 @@ Train risk classification model (Decision Tree or Random Forest).
 
 Reads processed data from data/processed/ (or raw from data/raw/),
 trains a lightweight classifier, and saves it to model/ for offline use.
+The dataset can be CSV or the typed columnar npy / parquet format
+(see training/dataset_io.py); npy is memory-mapped rather than parsed.
 
 Run from project root:
     python training/train_model.py
+    python training/train_model.py --data-format npy
+    python training/train_model.py --sweep grid      # see training/sweep.py
+    python training/incremental.py new_segments.csv  # grow the saved forest instead
+    python training/train_model.py --profile train.collapsed  # sampled flame graph
+    python training/train_model.py --validation clip   # repair out-of-range rows instead of stopping
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
 import pickle
+import time
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
@@ -28,20 +39,149 @@ from config.schema import (
     PROCESSED_DATA_DIR,
     MODEL_DIR,
     DEFAULT_MODEL_FILENAME,
+    LINEAGE_FILENAME,
 )
+from config.validation import VALIDATION_MODES, validate_frame
+from prediction.compiled import compile_model, check_matches_model, default_mapped_path, save_compiled, save_mapped
+from prediction.lookup_table import DEFAULT_MAX_CELLS, build_and_save as build_table_and_save
+from prediction.lookup_table import print_report as print_table_report
+from prediction.quantized import default_quantized_path, export_quantized
+from prediction.web_export import export_web_bundle
+from prediction.profiling import add_profile_argument, profile_to
+from training.dataset_io import DATASET_FORMATS, FORMAT_SUFFIX, read_dataset
 
 
-def load_data(use_processed: bool = False) -> pd.DataFrame:
-    """Load dataset from processed or raw folder."""
+def load_data(use_processed: bool = False, fmt: str = "csv", validation: str = "reject") -> pd.DataFrame:
+    """
+    Load dataset from processed or raw folder.
+    fmt: 'csv', 'npy' (memory-mapped, zero-copy) or 'parquet'.
+    validation: feature schema mode (config/validation.py); reject raises
+    SchemaValidationError for any row outside FEATURE_RANGES, clip repairs
+    them, flag only reports them.
+    """
+    suffix = FORMAT_SUFFIX[fmt]
     if use_processed:
-        path = os.path.join(PROJECT_ROOT, PROCESSED_DATA_DIR, "trekking_processed.csv")
+        path = os.path.join(PROJECT_ROOT, PROCESSED_DATA_DIR, "trekking_processed" + suffix)
     else:
-        path = os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic.csv")
-    if not os.path.isfile(path):
+        path = os.path.join(PROJECT_ROOT, RAW_DATA_DIR, "trekking_synthetic" + suffix)
+    if not os.path.exists(path):
         raise FileNotFoundError(
             "Dataset not found. Run scripts/generate_dataset.py first."
         )
-    return pd.read_csv(path)
+    df, report = validate_frame(read_dataset(path), validation)
+    if not report.ok:
+        print(f"Feature schema ({validation}): {report.summary()}", file=sys.stderr)
+    return df
+
+
+def build_classifier(
+    model_type: str = "random_forest",
+    n_estimators: int = 50,
+    max_depth=10,
+    random_state: int = 42,
+):
+    """Untrained classifier. model_type: 'random_forest' or 'decision_tree'."""
+    if model_type == "decision_tree":
+        return DecisionTreeClassifier(random_state=random_state, max_depth=max_depth)
+    return RandomForestClassifier(
+        n_estimators=n_estimators, random_state=random_state, max_depth=max_depth
+    )
+
+
+def default_lineage_path() -> str:
+    return os.path.join(PROJECT_ROOT, MODEL_DIR, LINEAGE_FILENAME)
+
+
+def read_lineage(path: str = None) -> list:
+    """Saved model versions, oldest first (empty if none recorded yet)."""
+    path = path or default_lineage_path()
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_lineage(entry: dict, path: str = None) -> None:
+    """Add one version record to model/lineage.json (temp file, then rename)."""
+    path = path or default_lineage_path()
+    lineage = read_lineage(path) + [entry]
+    with open(path + ".tmp", "w") as f:
+        json.dump(lineage, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def save_quantized(compiled, X, y, sha256: str) -> None:
+    """Re-export model/risk_model_quantized.bin for a new model (or remove it if it fails the check)."""
+    if y is None:
+        y = compiled.predict(X)[0]
+    try:
+        report = export_quantized(compiled, X, y, source_sha256=sha256)
+    except ValueError as e:
+        os.remove(default_quantized_path())
+        print(f"Quantized model removed (would describe the previous model): {e}")
+        return
+    print(f"Quantized model ({report['precision']} thresholds) saved to {default_quantized_path()}")
+
+
+def save_model(clf, X=None, kind: str = "full", lineage: dict = None, table_max_cells: int = None,
+               y=None) -> str:
+    """
+    Pickle the fitted model to model/ and write its compiled arrays next to it.
+    The pickle is written to a temp file and renamed only after every derived
+    file has been written (and, if X is given, the compiled model checked
+    against sklearn on it), so a running server (prediction.registry) never
+    reads a half-written model or one whose derived files failed.
+    Each save appends a version record (kind, parent version, extra `lineage`
+    fields) to model/lineage.json. With table_max_cells, the optional lookup
+    table (prediction.lookup_table) is built too if the grid is small enough.
+    A memory-mapped copy for multi-worker servers is refreshed if one exists,
+    and so is the quantized file (prediction.quantized), checked on (X, y) or,
+    without y, against the model's own labels; if no precision is within
+    tolerance the stale quantized file is removed.
+    The browser bundle (frontend/model/risk_model.json) is re-exported too.
+    """
+    out_dir = os.path.join(PROJECT_ROOT, MODEL_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, DEFAULT_MODEL_FILENAME)
+    parent = None
+    if os.path.exists(out_path):
+        with open(out_path, "rb") as f:
+            parent = hashlib.sha256(f.read()).hexdigest()[:12]
+    blob = pickle.dumps({"model": clf, "features": FEATURE_COLUMNS, "target": TARGET_COLUMN})
+    sha256 = hashlib.sha256(blob).hexdigest()
+    with open(out_path + ".tmp", "wb") as f:
+        f.write(blob)
+    try:
+        # Compile to flat node arrays for fast inference; must agree exactly with sklearn
+        compiled = compile_model(clf, FEATURE_COLUMNS)
+        if X is not None:
+            check_matches_model(compiled, clf, X)
+        # Tagged with the pickle's hash so loaders can skip unpickling (prediction.registry)
+        print("Compiled model saved to", save_compiled(compiled, source_sha256=sha256))
+        if os.path.isdir(default_mapped_path()):
+            print("Mapped model saved to", save_mapped(compiled, source_sha256=sha256))
+        if X is not None and os.path.isfile(default_quantized_path()):
+            save_quantized(compiled, X, y, sha256)
+        # Same forest for client-side inference in the web UI (frontend/model.js)
+        print("Web model saved to", export_web_bundle(compiled, source_sha256=sha256))
+        if table_max_cells:
+            print_table_report(build_table_and_save(compiled, sha256, X, table_max_cells))
+    except BaseException:
+        os.remove(out_path + ".tmp")
+        raise
+    # Last: the server only switches once everything derived from it is in place
+    os.replace(out_path + ".tmp", out_path)
+    print("Model saved to", out_path)
+    append_lineage({
+        "version": sha256[:12],
+        "parent": parent,
+        "kind": kind,
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model_type": type(clf).__name__,
+        "n_estimators": len(getattr(clf, "estimators_", [clf])),
+        **(lineage or {}),
+    })
+    return out_path
 
 
 def train_and_save(
@@ -49,39 +189,59 @@ def train_and_save(
     model_type: str = "random_forest",
     test_size: float = 0.2,
     random_state: int = 42,
+    n_estimators: int = 50,
+    max_depth=10,
+    table_max_cells: int = None,
 ) -> None:
     """
     Train classifier and save to model/.
     model_type: 'random_forest' or 'decision_tree'
+    table_max_cells: also build the lookup table if it has at most this many cells
     """
     X = df[FEATURE_COLUMNS]
     y = df[TARGET_COLUMN]
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y
     )
-    if model_type == "decision_tree":
-        clf = DecisionTreeClassifier(random_state=random_state, max_depth=10)
-    else:
-        clf = RandomForestClassifier(
-            n_estimators=50, random_state=random_state, max_depth=10
-        )
+    clf = build_classifier(model_type, n_estimators, max_depth, random_state)
     clf.fit(X_train, y_train)
     y_pred = clf.predict(X_test)
     print("Test set accuracy:", accuracy_score(y_test, y_pred))
     print(classification_report(y_test, y_pred))
-    out_dir = os.path.join(PROJECT_ROOT, MODEL_DIR)
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, DEFAULT_MODEL_FILENAME)
-    with open(out_path, "wb") as f:
-        pickle.dump(
-            {"model": clf, "features": FEATURE_COLUMNS, "target": TARGET_COLUMN}, f
-        )
-    print("Model saved to", out_path)
+    save_model(clf, X, lineage={"rows": len(df), "test_accuracy": float(accuracy_score(y_test, y_pred))},
+               table_max_cells=table_max_cells, y=y)
 
 
 def main():
-    df = load_data(use_processed=False)
-    train_and_save(df, model_type="random_forest")
+    parser = argparse.ArgumentParser(description="Train the risk classification model.")
+    parser.add_argument("--data-format", choices=DATASET_FORMATS, default="csv")
+    parser.add_argument("--sweep", choices=["grid", "random"],
+                        help="hyperparameter sweep with k-fold CV instead of a single fit")
+    parser.add_argument("--n-iter", type=int, default=12, help="candidates for --sweep random")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="sweep processes (default: all cores)")
+    parser.add_argument("--max-latency-ms", type=float, default=None,
+                        help="sweep: latency budget for the saved model")
+    parser.add_argument("--lookup-table", action="store_true",
+                        help="also precompute the model over its split grid (prediction/lookup_table.py)")
+    parser.add_argument("--table-max-cells", type=int, default=DEFAULT_MAX_CELLS,
+                        help="skip the lookup table above this many cells")
+    parser.add_argument("--validation", choices=VALIDATION_MODES, default="reject",
+                        help="rows outside the feature schema: stop (default), clip into range, or only report")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_to(args.profile):
+        try:
+            df = load_data(use_processed=False, fmt=args.data_format, validation=args.validation)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        if args.sweep:
+            from training.sweep import run_sweep
+            run_sweep(df, search=args.sweep, n_iter=args.n_iter, folds=args.folds,
+                      workers=args.workers, max_latency_ms=args.max_latency_ms)
+            return
+        train_and_save(df, model_type="random_forest",
+                       table_max_cells=args.table_max_cells if args.lookup_table else None)
 
 
 if __name__ == "__main__":